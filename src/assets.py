@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from build import save_manifest, remove_output
+
+ASSET_MANIFEST_PATH = ".assets-manifest.json"
+
+COPY_CHUNK = 1 << 30
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Copies within the kernel where it can: copy_file_range (which can also
+# reflink on filesystems that support it), then sendfile, then a plain
+# read/write loop
+def _copy_contents(src, dest, size):
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        in_fd = fsrc.fileno()
+        out_fd = fdest.fileno()
+        copied = 0
+        for copy in (_copy_file_range, _sendfile):
+            try:
+                copied = copy(in_fd, out_fd, copied, size)
+                return
+            except OSError:
+                pass
+        fsrc.seek(copied)
+        fdest.seek(copied)
+        shutil.copyfileobj(fsrc, fdest)
+
+def _copy_file_range(in_fd, out_fd, copied, size):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range not available")
+    while copied < size:
+        sent = os.copy_file_range(in_fd, out_fd, min(COPY_CHUNK, size - copied), copied, copied)
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+def _sendfile(in_fd, out_fd, copied, size):
+    while copied < size:
+        os.lseek(out_fd, copied, os.SEEK_SET)
+        sent = os.sendfile(out_fd, in_fd, copied, min(COPY_CHUNK, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+# Copies (or hardlinks) src to dest through a temporary file beside it, so
+# a server reading public/ never sees a half-written asset
+def copy_asset(src, dest, hardlink=False):
+    dest_dir = os.path.dirname(dest)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir or ".", prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        if hardlink:
+            try:
+                os.remove(tmp_path)
+                os.link(src, tmp_path)
+                os.replace(tmp_path, dest)
+                return
+            except OSError:
+                # e.g. static/ and public/ on different filesystems
+                pass
+
+        st = os.stat(src)
+        _copy_contents(src, tmp_path, st.st_size)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, st.st_mode & 0o777)
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_path, dest)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def find_assets(static_dir):
+    assets = {}
+    for dirpath, dirnames, filenames in os.walk(static_dir):
+        rel_dir = os.path.relpath(dirpath, static_dir)
+        prefix = "" if rel_dir == "." else rel_dir + os.sep
+        for filename in filenames:
+            assets[prefix + filename] = os.path.join(dirpath, filename)
+    return assets
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+# Mirrors static_dir into public_dir. A file is copied only when its size
+# or mtime differs from the manifest (or, with use_hash, when its content
+# hash does), and copies run on a thread pool since they are almost all
+# kernel time. Files this sync put in public_dir whose source is gone are
+# deleted; anything else in public_dir, like generated pages, is left alone.
+def sync_static(static_dir, public_dir, manifest_path=ASSET_MANIFEST_PATH,
+                use_hash=False, hardlink=False, workers=8):
+    if not os.path.isdir(static_dir):
+        raise FileNotFoundError(f"Static directory not found: {static_dir}")
+
+    old_files = load_manifest(manifest_path)["files"]
+    files = {}
+    copies = []
+    stats = {"copied": 0, "skipped": 0, "deleted": 0, "bytes_copied": 0}
+
+    for rel_path, src in find_assets(static_dir).items():
+        st = os.stat(src)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old_entry = old_files.get(rel_path)
+        dest = os.path.join(public_dir, rel_path)
+        unchanged = (
+            old_entry is not None
+            and old_entry["size"] == st.st_size
+            and old_entry["mtime_ns"] == st.st_mtime_ns
+            and os.path.exists(dest)
+        )
+        if use_hash:
+            if unchanged:
+                entry["hash"] = old_entry.get("hash") or hash_file(src)
+            else:
+                # Touched but identical files don't need copying
+                entry["hash"] = hash_file(src)
+                unchanged = (
+                    old_entry is not None
+                    and old_entry.get("hash") == entry["hash"]
+                    and os.path.exists(dest)
+                )
+
+        files[rel_path] = entry
+        if unchanged:
+            stats["skipped"] += 1
+        else:
+            copies.append((src, dest))
+            stats["copied"] += 1
+            stats["bytes_copied"] += st.st_size
+
+    if copies:
+        with ThreadPoolExecutor(workers) as executor:
+            # list() re-raises the first copy error, if any
+            list(executor.map(lambda job: copy_asset(*job, hardlink=hardlink), copies))
+
+    for rel_path in old_files:
+        if rel_path not in files:
+            remove_output(public_dir, rel_path)
+            stats["deleted"] += 1
+
+    save_manifest({"files": files}, manifest_path)
+    return stats
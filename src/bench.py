@@ -0,0 +1,533 @@
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import build
+import compress
+import htmlnode
+import imagesize
+import incremental
+import linkcheck
+import pageio
+import renderd
+import shards
+import spans
+import utils
+from htmlnode import ParentNode
+from renderclient import RenderClient
+from synthetic import synthetic_markdown
+
+
+def link_paragraph(link_count):
+    return " ".join(f"see [link {i}](https://example.com/{i}) and **b{i}**" for i in range(link_count))
+
+def time_call(func, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def bench_inline():
+    print(f"{'links':>8} {'seconds':>10} {'us/link':>10}")
+    for link_count in (1000, 2000, 4000, 8000, 16000):
+        text = link_paragraph(link_count)
+        elapsed = time_call(utils.text_to_textnodes, text)
+        print(f"{link_count:>8} {elapsed:>10.4f} {elapsed / link_count * 1e6:>10.2f}")
+
+def write_pages(content_dir, page_count):
+    for i in range(page_count):
+        page_dir = os.path.join(content_dir, f"section{i % 100}")
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, f"page{i}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Page {i}\n\nSome **text** with a [link](/page{i + 1}.html)\n\n- one\n- two\n")
+
+def bench_noop_build(page_count=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        public_dir = os.path.join(tmp, "public")
+        manifest_path = os.path.join(tmp, "manifest.json")
+        write_pages(content_dir, page_count)
+
+        start = time.perf_counter()
+        build.build_site(content_dir, public_dir, manifest_path=manifest_path)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build.build_site(content_dir, public_dir, manifest_path=manifest_path)
+        noop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for dirpath, _, filenames in os.walk(content_dir):
+            for filename in filenames:
+                os.stat(os.path.join(dirpath, filename))
+        stat_only = time.perf_counter() - start
+
+    print(f"{page_count} pages: full build {full:.2f}s, no-op rebuild {noop:.2f}s, stat only {stat_only:.2f}s")
+
+def bench_parallel_build(page_count=4000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        write_pages(content_dir, page_count)
+        print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            public_dir = os.path.join(tmp, f"public{workers}")
+            manifest_path = os.path.join(tmp, f"manifest{workers}.json")
+            start = time.perf_counter()
+            build.build_site(content_dir, public_dir, manifest_path=manifest_path, workers=workers)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x")
+    print(f"({os.cpu_count()} CPUs available)")
+
+# Wraps a page I/O function with a fixed delay, standing in for the
+# per-file round trips of a network filesystem
+def with_latency(func, latency):
+    def slow(*args):
+        time.sleep(latency)
+        return func(*args)
+    return slow
+
+# Serial full builds with page I/O inline and on a thread pool, on the local
+# filesystem and with simulated per-file latency
+def bench_io_build(page_count=4000):
+    original = pageio.read_file, pageio.write_file, pageio.open_page
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        write_pages(content_dir, page_count)
+        for latency in (0, 0.0005):
+            if latency:
+                pageio.read_file = build.read_file = with_latency(original[0], latency)
+                pageio.write_file = with_latency(original[1], latency)
+                pageio.open_page = build.open_page = with_latency(original[2], latency)
+            print(f"{latency * 1000:.1f} ms per file:")
+            try:
+                for io_threads in (0, 4, 8, 16):
+                    name = f"{latency}-{io_threads}"
+                    start = time.perf_counter()
+                    stats = build.build_site(content_dir, os.path.join(tmp, f"public{name}"),
+                                             manifest_path=os.path.join(tmp, f"manifest{name}.json"),
+                                             io_threads=io_threads)
+                    elapsed = time.perf_counter() - start
+                    line = f"  {io_threads:>3} I/O threads: {elapsed:.2f}s"
+                    if "io" in stats:
+                        io = stats["io"]
+                        line += (f" (render thread CPU {io['cpu_time']:.2f}s, waited {io['read_wait']:.2f}s "
+                                 f"on reads, {io['write_wait']:.2f}s on writes; {io['io_time']:.2f}s of I/O)")
+                    print(line)
+            finally:
+                pageio.read_file = build.read_file = original[0]
+                pageio.write_file = original[1]
+                pageio.open_page = build.open_page = original[2]
+
+# Pre-compressing a built site, serial and on a process pool, then a
+# no-op pass over the unchanged outputs
+def bench_compress(page_count=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        for i in range(page_count):
+            os.makedirs(os.path.join(content_dir, f"s{i % 20}"), exist_ok=True)
+            with open(os.path.join(content_dir, f"s{i % 20}", f"p{i}.md"), "w", encoding="utf-8") as f:
+                f.write(synthetic_markdown(20, seed=i))
+        public_dir = os.path.join(tmp, "public")
+        build.build_site(content_dir, public_dir, manifest_path=os.path.join(tmp, "manifest.json"))
+        for workers in sorted({1, 4, os.cpu_count() or 1}):
+            manifest_path = os.path.join(tmp, f"compress{workers}.json")
+            start = time.perf_counter()
+            stats = compress.compress_outputs(public_dir, manifest_path, workers=workers)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            compress.compress_outputs(public_dir, manifest_path, workers=workers)
+            noop = time.perf_counter() - start
+            print(f"{workers:>3} workers: {stats['compressed']} files in {elapsed:.2f}s, "
+                  f"{stats['bytes_in'] / 2**20:.1f} -> {stats['bytes_out'] / 2**20:.1f} MiB, "
+                  f"no-op pass {noop:.3f}s")
+
+# Cold builds (no output or manifest, as in CI) without the render cache,
+# filling it, and reading from it
+def bench_render_cache(page_count=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        for i in range(page_count):
+            os.makedirs(os.path.join(content_dir, f"s{i % 20}"), exist_ok=True)
+            with open(os.path.join(content_dir, f"s{i % 20}", f"p{i}.md"), "w", encoding="utf-8") as f:
+                f.write(synthetic_markdown(20, seed=i))
+        cache_path = os.path.join(tmp, "render.sqlite")
+        runs = iter(range(1000))
+
+        def cold_build(path):
+            # Fresh output, manifest and block cache every time
+            run = next(runs)
+            utils.configure_block_cache(utils.DEFAULT_BLOCK_CACHE_SIZE)
+            build.build_site(content_dir, os.path.join(tmp, f"public{run}"),
+                             manifest_path=os.path.join(tmp, f"manifest{run}.json"), render_cache_path=path)
+
+        def filling_build():
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            cold_build(cache_path)
+
+        print(f"{'no cache':>12}: {time_call(cold_build, None, repeat=3):.2f}s")
+        print(f"{'empty cache':>12}: {time_call(filling_build, repeat=3):.2f}s")
+        print(f"{'warm cache':>12}: {time_call(cold_build, cache_path, repeat=3):.2f}s")
+        print(f"cache file {os.path.getsize(cache_path) / 2**20:.1f} MiB")
+
+# Full builds with and without the search index, then rebuilding the index
+# after one page changes
+def bench_search(page_count=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        for i in range(page_count):
+            os.makedirs(os.path.join(content_dir, f"s{i % 20}"), exist_ok=True)
+            with open(os.path.join(content_dir, f"s{i % 20}", f"p{i}.md"), "w", encoding="utf-8") as f:
+                f.write(synthetic_markdown(20, seed=i))
+        for name, state_path in (("without index", None), ("with index", os.path.join(tmp, "search.json"))):
+            utils.configure_block_cache(utils.DEFAULT_BLOCK_CACHE_SIZE)
+            start = time.perf_counter()
+            stats = build.build_site(content_dir, os.path.join(tmp, name),
+                                     manifest_path=os.path.join(tmp, f"{name}.json"), search_state_path=state_path)
+            print(f"{name:>14}: {time.perf_counter() - start:.2f}s")
+        search = stats["search"]
+        print(f"index: {search['bytes'] / 2**20:.2f} MiB for {search['pages']} pages, "
+              f"{search['seconds']:.2f}s spent indexing")
+
+        with open(os.path.join(content_dir, "s0", "p0.md"), "a", encoding="utf-8") as f:
+            f.write("\n\nAn extra paragraph about zeppelins")
+        start = time.perf_counter()
+        stats = build.build_site(content_dir, os.path.join(tmp, "with index"),
+                                 manifest_path=os.path.join(tmp, "with index.json"), search_state_path=state_path)
+        print(f"one page changed: {time.perf_counter() - start:.3f}s, {stats['search']['seconds']:.3f}s indexing")
+
+# Unsharded build against N local shard processes plus the merge
+def bench_shards(page_count=4000):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        write_pages(content_dir, page_count)
+        start = time.perf_counter()
+        build.build_site(content_dir, os.path.join(tmp, "public"), manifest_path=os.path.join(tmp, "manifest.json"))
+        print(f"unsharded: {time.perf_counter() - start:.2f}s")
+        for count in (2, 4):
+            shard_dir = os.path.join(tmp, f"shards{count}")
+            start = time.perf_counter()
+            shards.build_all_shards(content_dir, shard_dir, count)
+            built = time.perf_counter() - start
+            stats = shards.merge_shards(shard_dir, os.path.join(tmp, f"merged{count}"),
+                                        os.path.join(tmp, f"merged{count}.json"), hardlink=True)
+            merged = time.perf_counter() - start - built
+            sizes = ", ".join(str(shard["pages"]) for shard in stats["shards"].values())
+            print(f"{count} shards: built in {built:.2f}s (pages per shard {sizes}), merged in {merged:.2f}s")
+    print(f"({os.cpu_count()} CPUs available)")
+
+# Per-document cost of rendering one page: a fresh process that imports
+# the generator, the client as a fresh process, and a round trip on an
+# open connection to the daemon
+def bench_daemon(requests=500, block_count=400):
+    markdown = synthetic_markdown(block_count, images=1)
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        page_path = os.path.join(tmp, "page.md")
+        with open(page_path, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        socket_path = os.path.join(tmp, "render.sock")
+        server = renderd.serve(socket_path)
+        try:
+            commands = (
+                ("interpreter only", [sys.executable, "-c", "pass"]),
+                ("cold CLI render", [sys.executable, "-c",
+                                 "import sys, main, utils; sys.stdout.write(utils.markdown_to_html(open(sys.argv[1]).read()))",
+                                 page_path]),
+                ("client process", [sys.executable, "renderclient.py", "--socket", socket_path, page_path]),
+            )
+            for name, command in commands:
+                elapsed = time_call(lambda: subprocess.run(command, cwd=src_dir, capture_output=True, check=True))
+                print(f"{name:>16}: {elapsed * 1000:.1f}ms")
+            with RenderClient(socket_path) as client:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.render(markdown)
+                elapsed = time.perf_counter() - start
+                stats = client.stats()
+            print(f"{'open connection':>16}: {elapsed / requests * 1000:.2f}ms per request "
+                  f"(in daemon: mean {stats['mean_ms']:.2f}ms, p99 <={stats['p99_ms']}ms)")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+# One keystroke in the middle of a large document: parsing the whole
+# document again against applying the edit to an IncrementalDocument
+def bench_incremental(block_count=4000, keystrokes=200):
+    markdown = synthetic_markdown(block_count, images=1)
+    print(f"{len(markdown) / 2**20:.1f} MiB of markdown, {block_count} blocks")
+    offset = markdown.index("\n\n", len(markdown) // 2)
+    full = time_call(lambda: utils.markdown_to_html_node(markdown), repeat=3)
+    print(f"full parse: {full * 1000:.1f}ms per keystroke")
+
+    doc = incremental.IncrementalDocument(markdown)
+    start = time.perf_counter()
+    for i in range(keystrokes):
+        doc.apply_edit(offset + i, 0, "x")
+    edit = (time.perf_counter() - start) / keystrokes
+    start = time.perf_counter()
+    for _ in range(keystrokes):
+        doc.to_html()
+    joined = (time.perf_counter() - start) / keystrokes
+    print(f"incremental: {edit * 1000:.3f}ms per keystroke ({full / edit:.0f}x), "
+          f"{doc.parsed} block parsed; whole page HTML joined in {joined * 1000:.3f}ms")
+
+# Build time with and without collecting links, and the time to check
+# them all afterwards. Pages link to each other (relative and absolute,
+# some to headings) and to a few targets that don't exist.
+def bench_links(page_count=4000, links_per_page=250):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        for i in range(page_count):
+            page_dir = os.path.join(content_dir, f"section{i % 100}")
+            os.makedirs(page_dir, exist_ok=True)
+            lines = [f"# Page {i}", "## Details"]
+            for j in range(links_per_page):
+                target = rng.randrange(page_count)
+                match j % 4:
+                    case 0:
+                        url = f"/section{target % 100}/page{target}.html"
+                    case 1:
+                        url = f"../section{target % 100}/page{target}#details"
+                    case 2:
+                        url = f"/section{target % 100}/page{target + page_count // 100}.html"
+                    case 3:
+                        url = "#details"
+                lines.append(f"Paragraph {j} with a [link {j}]({url}) in it.")
+            with open(os.path.join(page_dir, f"page{i}.md"), "w", encoding="utf-8") as f:
+                f.write("\n\n".join(lines))
+
+        for collect in (False, True):
+            manifest_path = os.path.join(tmp, f"manifest-{collect}.json")
+            start = time.perf_counter()
+            stats = build.build_site(content_dir, os.path.join(tmp, f"public-{collect}"),
+                                     manifest_path=manifest_path, collect_links=collect)
+            print(f"build {'collecting links' if collect else 'without links':>16}: "
+                  f"{time.perf_counter() - start:.2f}s")
+        print(f"collected {stats['links']['collected']} links in {stats['links']['seconds']:.2f}s")
+        start = time.perf_counter()
+        pages = build.load_manifest(manifest_path)["pages"]
+        loaded = time.perf_counter() - start
+        report = linkcheck.check_links(os.path.join(tmp, "public-True"), pages)
+        print(f"checked {report['links']} links in {report['seconds']:.2f}s (+{loaded:.2f}s loading the manifest), "
+              f"{len(report['broken'])} broken")
+
+# Sizing a directory of large images: reading each whole against reading
+# only its header (serially and on threads, on the local filesystem and
+# with simulated per-file latency), then a rescan answered by the cache
+def bench_images(image_count=2000, image_bytes=256 << 10):
+    headers = (
+        b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 800, 600),
+        b"GIF89a" + struct.pack("<HH", 800, 600),
+        b"\xff\xd8\xff\xc0" + struct.pack(">HBHH", 17, 8, 600, 800),
+    )
+    original = imagesize.read_image_size
+    with tempfile.TemporaryDirectory() as tmp:
+        static_dir = os.path.join(tmp, "static")
+        os.makedirs(static_dir)
+        filler = os.urandom(image_bytes)
+        for i in range(image_count):
+            extension = (".png", ".gif", ".jpg")[i % 3]
+            with open(os.path.join(static_dir, f"image{i}{extension}"), "wb") as f:
+                f.write(headers[i % 3] + filler)
+
+        start = time.perf_counter()
+        for path in imagesize.find_images(static_dir).values():
+            with open(path, "rb") as f:
+                f.read()
+        print(f"reading every image whole: {time.perf_counter() - start:.3f}s")
+        for latency in (0, 0.0005):
+            if latency:
+                imagesize.read_image_size = with_latency(original, latency)
+            try:
+                for workers in (1, 8):
+                    cache_path = os.path.join(tmp, f"cache-{latency}-{workers}.json")
+                    _, stats = imagesize.scan_image_sizes(static_dir, cache_path, workers)
+                    print(f"{latency * 1000:.1f} ms per file, {workers} threads: headers of "
+                          f"{stats['read']} images in {stats['seconds']:.3f}s")
+            finally:
+                imagesize.read_image_size = original
+        _, stats = imagesize.scan_image_sizes(static_dir, cache_path)
+        print(f"rescan: {stats['cached']} from cache, {stats['read']} read, in {stats['seconds']:.3f}s")
+
+def large_document(block_count):
+    blocks = []
+    for i in range(block_count):
+        match i % 4:
+            case 0:
+                blocks.append(f"## Section {i}")
+            case 1:
+                blocks.append(f"Paragraph {i} with **bold**, _italic_, `code` and a [link](/p{i}).")
+            case 2:
+                blocks.append("\n".join(f"- item {j} with **emphasis**" for j in range(5)))
+            case 3:
+                blocks.append(f"> quoted _text_ number {i}")
+    return "\n\n".join(blocks)
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        count += 1
+        if isinstance(item, ParentNode):
+            stack.extend(item.children)
+    return count
+
+def bench_memory(block_count=40000):
+    markdown = large_document(block_count)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    text_nodes = [utils.text_to_textnodes(f"word **b{i}** and [l](/u{i})") for i in range(block_count)]
+    after = tracemalloc.get_traced_memory()[0]
+    text_node_count = sum(len(nodes) for nodes in text_nodes)
+    del text_nodes
+    tracemalloc.stop()
+    print(f"TextNode: {text_node_count} nodes, {(after - before) / text_node_count:.1f} bytes/node (incl. text)")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    root = utils.markdown_to_html_node(markdown)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    node_count = count_nodes(root)
+    print(f"HTMLNode tree: {node_count} nodes, {(current - before) / node_count:.1f} bytes/node (incl. text), "
+          f"peak {(peak - before) / 2**20:.1f} MiB for {len(markdown) / 2**20:.1f} MiB of markdown")
+
+def render_time(markdown, repeat=5):
+    return time_call(lambda: utils.markdown_to_html_node(markdown).to_html(), repeat=repeat)
+
+# Render time of a text-heavy page with escaping as shipped, against the
+# same render with the escape functions swapped for identity
+def bench_escape(block_count=4000):
+    clean = synthetic_markdown(block_count, inline_density=0.02, words=60)
+    dirty = clean.replace(" and ", " & ").replace(" into ", " <into> ")
+    for name, markdown in (("clean text", clean), ("text needing escapes", dirty)):
+        escaped = render_time(markdown)
+        escape_text, escape_attribute = htmlnode.escape_text, htmlnode.escape_attribute
+        htmlnode.escape_text = htmlnode.escape_attribute = lambda text: text
+        try:
+            unescaped = render_time(markdown)
+        finally:
+            htmlnode.escape_text, htmlnode.escape_attribute = escape_text, escape_attribute
+        print(f"{name:>22}: {unescaped:.3f}s unescaped, {escaped:.3f}s escaped "
+              f"({(escaped / unescaped - 1) * 100:+.1f}%)")
+
+# Peak memory and number of live allocations while parsing and rendering
+def traced(func):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    live_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return result, live_blocks, peak
+
+def bench_spans(block_count=20000):
+    markdown = synthetic_markdown(block_count, images=1)
+    print(f"{len(markdown) / 2**20:.1f} MiB of markdown, {block_count} blocks")
+
+    tree, tree_blocks, tree_peak = traced(lambda: utils.markdown_to_html_node(markdown))
+    parsed, span_blocks, span_peak = traced(lambda: spans.parse_spans(markdown))
+    print(f"{'parse':>8}: node tree {tree_blocks} live allocations, peak {tree_peak / 2**20:.1f} MiB; "
+          f"spans {span_blocks} live allocations, peak {span_peak / 2**20:.1f} MiB")
+
+    _, _, tree_peak = traced(lambda: tree.to_html())
+    _, _, span_peak = traced(lambda: "".join(spans.iter_span_html(parsed)))
+    print(f"{'render':>8}: node tree peak {tree_peak / 2**20:.1f} MiB; spans peak {span_peak / 2**20:.1f} MiB")
+
+    tree_time = time_call(lambda: utils.markdown_to_html_node(markdown).to_html(), repeat=3)
+    span_time = time_call(lambda: spans.markdown_to_html_spans(markdown), repeat=3)
+    print(f"{'time':>8}: node tree {tree_time:.3f}s, spans {span_time:.3f}s")
+
+# The direct emitter against building and serializing the node tree
+def bench_emitter(block_count=20000):
+    markdown = synthetic_markdown(block_count, images=1)
+    print(f"{len(markdown) / 2**20:.1f} MiB of markdown, {block_count} blocks")
+
+    tree_time = time_call(lambda: utils.markdown_to_html_node(markdown).to_html(), repeat=3)
+    direct_time = time_call(lambda: utils.markdown_to_html(markdown), repeat=3)
+    _, _, tree_peak = traced(lambda: utils.markdown_to_html_node(markdown).to_html())
+    _, _, direct_peak = traced(lambda: utils.markdown_to_html(markdown))
+    megabytes = len(markdown) / 2**20
+    print(f"node tree: {tree_time:.3f}s ({megabytes / tree_time:.1f} MiB/s), peak {tree_peak / 2**20:.1f} MiB")
+    print(f"   direct: {direct_time:.3f}s ({megabytes / direct_time:.1f} MiB/s), peak {direct_peak / 2**20:.1f} MiB")
+
+_RSS_CHILD = """
+import resource, sys, build
+threshold = None if sys.argv[4] == "none" else int(sys.argv[4])
+build.build_site(sys.argv[1], sys.argv[2], manifest_path=sys.argv[3], block_cache_size=64, mmap_threshold=threshold)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+# Peak RSS of a child process building one large page, read whole vs mapped
+def bench_mmap(size_mb=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = os.path.join(tmp, "content")
+        os.makedirs(content_dir)
+        chunk = synthetic_markdown(2000, images=1)
+        with open(os.path.join(content_dir, "reference.md"), "w", encoding="utf-8") as f:
+            written = 0
+            while written < size_mb << 20:
+                f.write(chunk)
+                f.write("\n\n")
+                written += len(chunk) + 2
+        print(f"{written / 2**20:.0f} MiB source")
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        for name, threshold in (("read", "none"), ("mmap", "1")):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", _RSS_CHILD, content_dir, os.path.join(tmp, name),
+                 os.path.join(tmp, f"{name}.json"), threshold],
+                cwd=src_dir, capture_output=True, text=True, check=True,
+            ).stdout
+            elapsed = time.perf_counter() - start
+            print(f"{name:>6}: peak RSS {int(output) / 1024:.0f} MiB, {elapsed:.1f}s")
+
+
+BENCHMARKS = {
+    "inline": bench_inline,
+    "noop_build": bench_noop_build,
+    "parallel_build": bench_parallel_build,
+    "io_build": bench_io_build,
+    "memory": bench_memory,
+    "escape": bench_escape,
+    "spans": bench_spans,
+    "mmap": bench_mmap,
+    "emitter": bench_emitter,
+    "compress": bench_compress,
+    "render_cache": bench_render_cache,
+    "search": bench_search,
+    "shards": bench_shards,
+    "daemon": bench_daemon,
+    "incremental": bench_incremental,
+    "links": bench_links,
+    "images": bench_images,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import utils
+from blocknode import BlockType
+from synthetic import synthetic_markdown, parse_mix
+
+STAGES = (
+    "markdown_to_blocks",
+    "block_to_block_type",
+    "text_to_textnodes",
+    "text_node_to_html_node",
+    "tree_construction",
+    "to_html",
+)
+
+
+def time_stage(func, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+# Times every stage of the pipeline on its own, each fed the previous
+# stage's output. Tree construction is whatever markdown_to_html_node
+# spends on top of the parsing stages it runs internally.
+def run_stages(markdown, repeat):
+    timings = {}
+
+    timings["markdown_to_blocks"], blocks = time_stage(lambda: utils.markdown_to_blocks(markdown), repeat)
+    timings["block_to_block_type"], block_types = time_stage(
+        lambda: [utils.block_to_block_type(block) for block in blocks], repeat)
+
+    inline_texts = []
+    for block, block_type in zip(blocks, block_types):
+        if block_type != BlockType.CODE:
+            inline_texts.extend(utils.block_to_inline_texts(block, block_type))
+    timings["text_to_textnodes"], text_nodes = time_stage(
+        lambda: [utils.text_to_textnodes(text) for text in inline_texts], repeat)
+    flat_nodes = [node for nodes in text_nodes for node in nodes]
+    timings["text_node_to_html_node"], _ = time_stage(
+        lambda: [utils.text_node_to_html_node(node) for node in flat_nodes], repeat)
+
+    full_times, root = time_stage(lambda: utils.markdown_to_html_node(markdown), repeat)
+    parse_time = sum(min(timings[stage]) for stage in STAGES[:4])
+    timings["tree_construction"] = [max(0.0, t - parse_time) for t in full_times]
+
+    timings["to_html"], html = time_stage(root.to_html, repeat)
+
+    results = {}
+    for stage in STAGES:
+        results[stage] = {
+            "best": min(timings[stage]),
+            "median": statistics.median(timings[stage]),
+        }
+    total_best = sum(result["best"] for result in results.values())
+    return results, {
+        "blocks": len(blocks),
+        "text_nodes": len(flat_nodes),
+        "bytes_in": len(markdown.encode("utf-8")),
+        "bytes_out": len(html.encode("utf-8")),
+        "total_best": total_best,
+        "mb_per_s": len(markdown.encode("utf-8")) / 2**20 / total_best,
+    }
+
+def run(args):
+    mix = parse_mix(args.mix) if args.mix else None
+    markdown = synthetic_markdown(args.blocks, mix, args.inline_density, args.links, args.images,
+                                  args.words, args.seed)
+    stages, totals = run_stages(markdown, args.repeat)
+
+    report = {
+        "params": {
+            "blocks": args.blocks,
+            "mix": args.mix,
+            "inline_density": args.inline_density,
+            "links": args.links,
+            "images": args.images,
+            "words": args.words,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": stages,
+        "totals": totals,
+    }
+
+    for stage in STAGES:
+        print(f"{stage:>24} {stages[stage]['best'] * 1000:>10.2f} ms  (median {stages[stage]['median'] * 1000:.2f})")
+    print(f"{'total':>24} {totals['total_best'] * 1000:>10.2f} ms  {totals['mb_per_s']:.2f} MiB/s, "
+          f"{totals['blocks']} blocks, {totals['text_nodes']} text nodes")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+# Compares the best time of each stage between two reports. Returns the
+# stages that got slower by more than threshold (0.1 = 10%).
+def find_regressions(baseline, current, threshold):
+    regressions = []
+    for stage in STAGES:
+        old = baseline["stages"].get(stage)
+        new = current["stages"].get(stage)
+        if old is None or new is None or old["best"] == 0:
+            continue
+        change = new["best"] / old["best"] - 1
+        if change > threshold:
+            regressions.append((stage, change))
+    return regressions
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    if baseline["params"] != current["params"]:
+        print("Warning: reports were produced with different parameters")
+
+    for stage in STAGES:
+        old = baseline["stages"][stage]["best"]
+        new = current["stages"][stage]["best"]
+        change = (new / old - 1) * 100 if old else 0.0
+        print(f"{stage:>24} {old * 1000:>10.2f} ms -> {new * 1000:>10.2f} ms  {change:+6.1f}%")
+
+    regressions = find_regressions(baseline, current, args.threshold)
+    for stage, change in regressions:
+        print(f"REGRESSION: {stage} is {change * 100:.1f}% slower")
+    return 1 if regressions else 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmarks on synthetic markdown.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="time each pipeline stage")
+    run_parser.add_argument("--blocks", type=int, default=5000)
+    run_parser.add_argument("--mix", default=None, help="block weights, e.g. p=5,hdg=1,code=1,quoteblock=1,ul=1,ol=1")
+    run_parser.add_argument("--inline-density", type=float, default=0.1, help="fraction of words with emphasis/code")
+    run_parser.add_argument("--links", type=int, default=1, help="links per paragraph")
+    run_parser.add_argument("--images", type=int, default=0, help="images per paragraph")
+    run_parser.add_argument("--words", type=int, default=30, help="words per paragraph")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--out", default=None, help="write the JSON report here")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown (0.1 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+import hashlib
+import json
+import multiprocessing.util
+import os
+import posixpath
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
+
+import mmapinput
+import profiling
+from pageio import PageIO, open_page, read_file
+from linkcheck import PageLinks
+from rendercache import RenderCache, DEFAULT_RENDER_CACHE_SIZE
+from searchindex import PageDocument, SearchIndex
+from htmlnode import escape_text
+from template import Template, DEFAULT_TEMPLATE
+from utils import (markdown_to_html, markdown_to_blocks, extract_title, configure_block_cache,
+                   iter_blocks_html, set_image_sizes, image_size, image_url, size_relative_images)
+
+# Bump whenever a change to the generator changes its output, so the next
+# build regenerates every page instead of trusting the manifest.
+GENERATOR_VERSION = "4"
+
+MANIFEST_PATH = ".build-manifest.json"
+
+# Sources at least this big are memory-mapped and streamed block by block
+# rather than read whole
+MMAP_THRESHOLD = 64 << 20
+
+# Placeholders a page template may use
+PAGE_VALUES = {"Title", "Content"}
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def find_markdown_files(content_dir):
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(content_dir):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, content_dir)
+        prefix = "" if rel_dir == "." else rel_dir + os.sep
+        for filename in sorted(filenames):
+            if filename.endswith(".md"):
+                sources.append(prefix + filename)
+    return sources
+
+def output_path_for(source):
+    return source[:-len(".md")] + ".html"
+
+# Which of count shards (numbered from 1) builds source. It depends only on
+# the path, so every node of a sharded build agrees on it without talking
+# to the others.
+def shard_of(source, count):
+    digest = hashlib.sha1(source.replace(os.sep, "/").encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"generator_version": None, "template_hash": None, "pages": {}}
+
+def save_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(manifest, separators=(",", ":")))
+    os.replace(tmp_path, manifest_path)
+
+# The template is compiled once per build. Its hash is part of the
+# manifest so that editing it invalidates every page built from it.
+def load_template(template_path):
+    if template_path is None:
+        return DEFAULT_TEMPLATE, ""
+    with open(template_path, "rb") as f:
+        data = f.read()
+    template = Template(data.decode("utf-8"))
+    unknown = template.names() - PAGE_VALUES
+    if unknown:
+        raise ValueError(f"Unknown placeholder(s) in {template_path}: {', '.join(sorted(unknown))}")
+    return template, hash_bytes(data)
+
+# Images as the renderer writes them, with the width and height it gave
+# them if it had their size
+_IMG = re.compile(r'<img src="([^"]*)"[^>]*?(?: width="(\d+)" height="(\d+)")?></img>')
+
+# Adds the size written into each image of a piece of content HTML to
+# images, by URL, as [width, height] or None. Image sizes are part of what
+# a page is built from, so the manifest keeps these per page. Relative
+# srcs are resolved against page_dir, or kept as they are without one.
+def content_images(html, images, page_dir=None):
+    if "<img" in html:
+        for src, width, height in _IMG.findall(html):
+            if "&" in src:
+                src = unescape(src)
+            if page_dir is not None:
+                src = image_url(src, page_dir)
+            images[src] = [int(width), int(height)] if width else None
+    return images
+
+# Whether any of a page's images has a different size now than the one
+# written into it
+def images_changed(images):
+    for src, size in images.items():
+        current = image_size(src)
+        if size != (None if current is None else list(current)):
+            return True
+    return False
+
+def observe_images(chunks, images, page_dir):
+    for chunk in chunks:
+        content_images(chunk, images, page_dir)
+        yield chunk
+
+# The render cache open in this process, if the build uses one
+_render_cache = None
+
+def open_render_cache(path, max_bytes=DEFAULT_RENDER_CACHE_SIZE, version=GENERATOR_VERSION):
+    global _render_cache
+    _render_cache = None if path is None else RenderCache(path, version, max_bytes)
+    return _render_cache
+
+def close_render_cache():
+    global _render_cache
+    if _render_cache is not None:
+        _render_cache.close()
+    _render_cache = None
+
+# Whether page jobs in this process collect a PageDocument for the search
+# index, and PageLinks for the link checker
+_index_pages = False
+_collect_links = False
+
+# The page's content HTML, from the render cache when the same source was
+# rendered before (by this build or an earlier one) with its images the
+# sizes they are now. document, if given, takes its text from the blocks as
+# they are rendered; links, if given, takes its links from the content.
+# Relative images are left unsized, for render_page to size.
+def render_content(markdown, source_hash, document=None, links=None):
+    cache = None if source_hash is None else _render_cache
+    content = None if cache is None else cache.get(source_hash)
+    if content is not None:
+        cached_images = content_images(content, {})
+        if not images_changed(cached_images):
+            if document is not None:
+                document.add_blocks(markdown_to_blocks(markdown))
+            if links is not None:
+                links.add_html(content)
+            return content
+
+    if document is None:
+        content = markdown_to_html(markdown, cache_blocks=True)
+    else:
+        blocks = document.observe(markdown_to_blocks(markdown))
+        content = "".join(iter_blocks_html(blocks, cache_blocks=True))
+    if links is not None:
+        links.add_html(content)
+    if cache is not None:
+        cache.put(source_hash, content)
+    return content
+
+# Renders a page into dest_path, streaming the template straight into the
+# file so the whole page never exists as one string. With io the page is
+# rendered to bytes instead and queued on io to be written behind. Relative
+# images are sized against page_dir, the page's directory on the site, and
+# images gets the sizes written (see content_images). Returns the size of
+# the output.
+def render_page(markdown, template, fallback_title, dest_path, source_hash=None, document=None, links=None,
+                io=None, images=None, page_dir="/"):
+    start = time.perf_counter()
+    title = extract_title(markdown) or fallback_title
+    if document is not None:
+        document.title = title
+    content = size_relative_images(render_content(markdown, source_hash, document, links), page_dir)
+    if images is not None:
+        content_images(content, images, page_dir)
+    values = {"Title": escape_text(title), "Content": content}
+    if io is not None:
+        html = template.render(values).encode("utf-8")
+        io.write(dest_path, html)
+        if profiling.active is not None:
+            profiling.active.stage_times[profiling.RENDER_STAGE] += time.perf_counter() - start
+        return len(html)
+
+    rendered = time.perf_counter()
+    with open_page(dest_path) as f:
+        template.write(f, values)
+    if profiling.active is not None:
+        profiling.active.stage_times[profiling.RENDER_STAGE] += rendered - start
+        profiling.active.stage_times["write"] += time.perf_counter() - rendered
+    return os.path.getsize(dest_path)
+
+def remove_output(public_dir, output):
+    dest_path = os.path.join(public_dir, output)
+    try:
+        os.remove(dest_path)
+    except FileNotFoundError:
+        pass
+
+    # Prune directories the page left empty, but never public_dir itself
+    dest_dir = os.path.dirname(dest_path)
+    while os.path.abspath(dest_dir) != os.path.abspath(public_dir):
+        try:
+            os.rmdir(dest_dir)
+        except OSError:
+            break
+        dest_dir = os.path.dirname(dest_dir)
+
+# Streams a memory-mapped source into dest_path block by block
+def render_mapped_page(mapped, template, fallback_title, dest_path, document=None, links=None, images=None,
+                       page_dir="/"):
+    start = time.perf_counter()
+    title = mmapinput.mapped_title(mapped) or fallback_title
+    blocks = mmapinput.iter_mapped_blocks(mapped)
+    if document is not None:
+        document.title = title
+        blocks = document.observe(blocks)
+    content = (size_relative_images(chunk, page_dir) for chunk in iter_blocks_html(blocks, cache_blocks=True))
+    if links is not None:
+        content = links.observe_html(content)
+    if images is not None:
+        content = observe_images(content, images, page_dir)
+    with open_page(dest_path) as f:
+        template.write(f, {"Title": escape_text(title), "Content": content})
+
+    if profiling.active is not None:
+        profiling.active.stage_times[profiling.RENDER_STAGE] += time.perf_counter() - start
+
+def process_mapped_page(job, template):
+    source_path, dest_path, old_hash, fallback_title, _, page_dir = job
+    start = time.perf_counter()
+    mapped = mmapinput.open_mapped(source_path)
+    if mapped is None:
+        # Emptied since it was stat'd
+        return process_page(job[:4] + (False, page_dir), template)
+    try:
+        source_hash = mmapinput.hash_mapped(mapped)
+        if source_hash == old_hash and os.path.exists(dest_path):
+            return source_hash, False, None, None, None
+        document = PageDocument() if _index_pages else None
+        links = PageLinks(mapped) if _collect_links else None
+        images = {}
+        render_mapped_page(mapped, template, fallback_title, dest_path, document, links, images, page_dir)
+    finally:
+        mapped.close()
+    if links is not None:
+        links.finish()
+
+    if profiling.active is not None:
+        profiling.active.add_page(source_path, time.perf_counter() - start,
+                                  os.path.getsize(source_path), os.path.getsize(dest_path))
+    return source_hash, True, document, links, images or None
+
+# Reads, hashes and (if its hash differs from old_hash) renders one page.
+# Returns (hash, built, document, links, images): the source's hash,
+# whether the page was built, when the build indexes pages or collects
+# links the built page's PageDocument and PageLinks (else None), and the
+# sizes written into its images (None if it has none), so nothing bigger
+# than that travels back from a worker process. data is the source when io
+# has already read it. With io the output is written behind instead of
+# before returning. Mapped sources go to process_mapped_page, which returns
+# the same.
+def process_page(job, template, data=None, io=None):
+    source_path, dest_path, old_hash, fallback_title, use_mmap, page_dir = job
+    if use_mmap:
+        return process_mapped_page(job, template)
+
+    start = time.perf_counter()
+    profile = profiling.active
+    if data is None:
+        data = read_file(source_path)
+        if profile is not None:
+            profile.stage_times["read"] += time.perf_counter() - start
+    source_hash = hash_bytes(data)
+
+    # Touched but unchanged, e.g. after a checkout
+    if source_hash == old_hash and os.path.exists(dest_path):
+        return source_hash, False, None, None, None
+
+    markdown = data.decode("utf-8")
+    document = PageDocument() if _index_pages else None
+    links = PageLinks(markdown) if _collect_links else None
+    images = {}
+    size = render_page(markdown, template, fallback_title, dest_path, source_hash, document, links, io, images,
+                       page_dir)
+    if profile is not None:
+        profile.add_page(source_path, time.perf_counter() - start, len(data), size)
+    return source_hash, True, document, None if links is None else links.finish(), images or None
+
+# The template is handed to each worker once instead of with every job
+_worker_template = None
+
+def _init_worker(template, block_cache_size, profile, render_cache_path, index_pages, collect_links,
+                 image_sizes):
+    global _worker_template, _index_pages, _collect_links
+    _worker_template = template
+    _index_pages = index_pages
+    _collect_links = collect_links
+    if block_cache_size is not None:
+        configure_block_cache(block_cache_size)
+    set_image_sizes(image_sizes)
+    # Each worker has its own connection to the render cache, flushed when
+    # the pool shuts the worker down
+    if open_render_cache(render_cache_path) is not None:
+        multiprocessing.util.Finalize(None, close_render_cache, exitpriority=10)
+    if profile:
+        profiling.enable()
+
+# When profiling, each page's numbers travel back with its result and are
+# merged into the parent's profile
+def _process_page_in_worker(job):
+    if profiling.active is None:
+        return process_page(job, _worker_template), None
+    profiling.active = profiling.BuildProfile()
+    return process_page(job, _worker_template), profiling.active
+
+# Renders on this thread while io reads the upcoming sources and writes the
+# finished pages. Mapped pages are left to process_mapped_page.
+def run_jobs_with_io(jobs, template, io):
+    sources = io.read_all(None if job[4] else job[0] for job in jobs)
+    return [process_page(job, template, data, io) for job, data in zip(jobs, sources)]
+
+def run_jobs(jobs, template, workers=1, chunksize=None, block_cache_size=None, render_cache_path=None,
+             index_pages=False, collect_links=False, image_sizes=None):
+    if workers <= 1 or len(jobs) <= 1:
+        return [process_page(job, template) for job in jobs]
+
+    if chunksize is None:
+        # A few batches per worker keeps them busy without a round trip per page
+        chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+    profile = profiling.active
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(template, block_cache_size, profile is not None, render_cache_path,
+                                       index_pages, collect_links, image_sizes)) as executor:
+        for result, page_profile in executor.map(_process_page_in_worker, jobs, chunksize=chunksize):
+            if page_profile is not None:
+                profile.merge(page_profile)
+            results.append(result)
+    return results
+
+# Converts every markdown file under content_dir into public_dir. Pages whose
+# source, template and generator version match the manifest are skipped;
+# a matching size and mtime is trusted without reading the source at all.
+# Outputs of sources that no longer exist are deleted. With workers > 1 the
+# pages are rendered on a process pool, each worker writing its own output
+# and keeping its own block cache. A serial build with io_threads > 0 reads
+# and writes pages on that many threads while it renders, and adds the
+# time it spent waiting on them to the stats as "io".
+#
+# render_cache_path names an SQLite file (see rendercache) keeping rendered
+# page content across builds, so that a cold checkout, e.g. in CI, only
+# renders sources the cache hasn't seen. It is trimmed to
+# render_cache_size bytes after each build.
+#
+# search_state_path enables the search index (see searchindex), kept in
+# public_dir/search and updated from the pages each build renders.
+#
+# image_sizes, from imagesize.scan_image_sizes, gives the width and height
+# written into the <img> tags of the site's images. Each page's manifest
+# entry keeps the sizes written into it, and a page is rebuilt when any of
+# them changes.
+#
+# collect_links keeps each page's links and heading anchors (see
+# linkcheck) in its manifest entry, for check_links to check the whole site
+# against once it is built.
+#
+# shard, an (index, count) pair, limits the build to the sources shard_of
+# assigns to that shard (see shards).
+#
+# changed, when given, is the set of sources (relative to content_dir) known
+# to have changed, e.g. by a file watcher. Every other source with a
+# manifest entry is trusted without a stat.
+def build_site(content_dir, public_dir, template_path=None, manifest_path=MANIFEST_PATH,
+               workers=1, chunksize=None, block_cache_size=None, changed=None,
+               mmap_threshold=MMAP_THRESHOLD, io_threads=0, render_cache_path=None,
+               render_cache_size=DEFAULT_RENDER_CACHE_SIZE, search_state_path=None, shard=None,
+               collect_links=False, image_sizes=None):
+    if not os.path.isdir(content_dir):
+        raise FileNotFoundError(f"Content directory not found: {content_dir}")
+
+    global _index_pages, _collect_links
+    if block_cache_size is not None:
+        configure_block_cache(block_cache_size)
+    template, template_hash = load_template(template_path)
+    set_image_sizes(image_sizes)
+    search_index = None if search_state_path is None else SearchIndex(public_dir, search_state_path)
+    old_manifest = load_manifest(manifest_path)
+    old_pages = old_manifest["pages"]
+    rebuild_all = (
+        old_manifest["generator_version"] != GENERATOR_VERSION
+        or old_manifest["template_hash"] != template_hash
+    )
+
+    scan_start = time.perf_counter()
+    pages = {}
+    stats = {"built": 0, "skipped": 0, "deleted": 0}
+    pending = []
+    jobs = []
+    for source in find_markdown_files(content_dir):
+        if shard is not None and shard_of(source, shard[1]) != shard[0]:
+            continue
+        old_entry = None if rebuild_all else old_pages.get(source)
+        if search_index is not None and source not in search_index:
+            # Built before the index was, so render it again to index it
+            old_entry = None
+        if collect_links and old_entry is not None and "links" not in old_entry:
+            old_entry = None
+        if old_entry is not None and "images" in old_entry and images_changed(old_entry["images"]):
+            # Shows an image whose size changed
+            old_entry = None
+        if changed is not None and old_entry is not None and source not in changed:
+            pages[source] = old_entry
+            stats["skipped"] += 1
+            continue
+
+        source_path = os.path.join(content_dir, source)
+        output = output_path_for(source)
+        dest_path = os.path.join(public_dir, output)
+        st = os.stat(source_path)
+
+        if (
+            old_entry is not None
+            and old_entry["mtime_ns"] == st.st_mtime_ns
+            and old_entry["size"] == st.st_size
+            and os.path.exists(dest_path)
+        ):
+            pages[source] = old_entry
+            stats["skipped"] += 1
+            continue
+
+        old_hash = None if old_entry is None else old_entry["hash"]
+        fallback_title = os.path.splitext(os.path.basename(source))[0]
+        pending.append((source, st, output))
+        use_mmap = mmap_threshold is not None and st.st_size >= max(mmap_threshold, 1)
+        # The page's directory on the site, which relative image srcs start from
+        page_dir = posixpath.join("/", posixpath.dirname(output.replace(os.sep, "/")), "")
+        jobs.append((source_path, dest_path, old_hash, fallback_title, use_mmap, page_dir))
+
+    if profiling.active is not None:
+        profiling.active.stage_times["scan"] += time.perf_counter() - scan_start
+
+    # Opened before any worker starts, so the database exists when they open it
+    render_cache = open_render_cache(render_cache_path, render_cache_size)
+    _index_pages = search_index is not None
+    _collect_links = collect_links
+    try:
+        if io_threads > 0 and workers <= 1 and len(jobs) > 1:
+            with PageIO(io_threads) as io:
+                results = run_jobs_with_io(jobs, template, io)
+            stats["io"] = io.report()
+            if profiling.active is not None:
+                profiling.active.stage_times["read"] += io.read_wait
+                profiling.active.stage_times["write"] += io.write_wait
+        else:
+            results = run_jobs(jobs, template, workers, chunksize, block_cache_size, render_cache_path,
+                               search_index is not None, collect_links, image_sizes)
+        if render_cache is not None:
+            # Hits and misses in worker processes aren't counted
+            stats["render_cache"] = {
+                "hits": render_cache.hits,
+                "misses": render_cache.misses,
+                "evicted": render_cache.evict(),
+            }
+    finally:
+        close_render_cache()
+        _index_pages = _collect_links = False
+    if collect_links:
+        stats["links"] = {"collected": 0, "seconds": 0.0}
+    for (source, st, output), (source_hash, built, document, links, images) in zip(pending, results):
+        pages[source] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "hash": source_hash, "output": output}
+        stats["built" if built else "skipped"] += 1
+        if images is not None:
+            pages[source]["images"] = images
+        elif not built and "images" in old_pages.get(source, {}):
+            # Touched but unchanged, and its images are the same size
+            pages[source]["images"] = old_pages[source]["images"]
+        if document is not None:
+            search_index.update(source, "/" + output.replace(os.sep, "/"), document)
+        if links is not None:
+            pages[source]["links"] = links.links
+            pages[source]["anchors"] = links.anchors
+            stats["links"]["collected"] += len(links.links)
+            stats["links"]["seconds"] += links.seconds
+        elif collect_links and source in old_pages and "links" in old_pages[source]:
+            # Touched but unchanged: its links are the same as last time
+            pages[source]["links"] = old_pages[source]["links"]
+            pages[source]["anchors"] = old_pages[source]["anchors"]
+
+    for source, old_entry in old_pages.items():
+        if source not in pages:
+            remove_output(public_dir, old_entry["output"])
+            stats["deleted"] += 1
+    if search_index is not None:
+        for source in list(search_index.pages):
+            if source not in pages:
+                search_index.remove(source)
+        search_index.write()
+        stats["search"] = search_index.report()
+
+    if rebuild_all or pages != old_pages:
+        save_manifest({
+            "generator_version": GENERATOR_VERSION,
+            "template_hash": template_hash,
+            "pages": pages,
+        }, manifest_path)
+    return stats
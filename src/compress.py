@@ -0,0 +1,103 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from assets import find_assets, hash_file, load_manifest
+from build import save_manifest, remove_output
+
+COMPRESS_MANIFEST_PATH = ".compress-manifest.json"
+
+# Outputs worth compressing ahead of time, and the size below which the
+# gzip header and a request for the .gz cost more than they save
+COMPRESS_EXTENSIONS = (".html", ".css")
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 9
+
+
+# Writes path.gz next to path and returns its size, or removes it and
+# returns None when compressing doesn't make the file smaller. The gzip
+# header carries no mtime so the same content always gives the same bytes.
+def gzip_file(path, level=COMPRESS_LEVEL):
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = gzip.compress(data, compresslevel=level, mtime=0)
+    gz_path = path + ".gz"
+    if len(compressed) >= len(data):
+        if os.path.exists(gz_path):
+            os.remove(gz_path)
+        return None
+
+    tmp_path = gz_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.replace(tmp_path, gz_path)
+    return len(compressed)
+
+def _gzip_job(job):
+    return gzip_file(*job)
+
+# Writes a .gz sibling for every .html and .css file in public_dir of at
+# least min_size bytes, so a server can send it as is instead of
+# compressing on each request. A file whose size and mtime match the
+# manifest is skipped without reading it; one that was rewritten with the
+# same content is skipped after hashing. Compression runs on a process
+# pool. .gz files this stage wrote are removed when their source goes
+# away or shrinks below min_size. workers=None uses one process per CPU.
+def compress_outputs(public_dir, manifest_path=COMPRESS_MANIFEST_PATH, min_size=COMPRESS_MIN_SIZE,
+                     level=COMPRESS_LEVEL, workers=None):
+    if not os.path.isdir(public_dir):
+        raise FileNotFoundError(f"Output directory not found: {public_dir}")
+
+    old_files = load_manifest(manifest_path)["files"]
+    files = {}
+    pending = []
+    stats = {"compressed": 0, "skipped": 0, "deleted": 0, "bytes_in": 0, "bytes_out": 0, "bytes_saved": 0}
+
+    for rel_path, path in find_assets(public_dir).items():
+        if not rel_path.endswith(COMPRESS_EXTENSIONS):
+            continue
+        st = os.stat(path)
+        if st.st_size < min_size:
+            continue
+
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old_entry = old_files.get(rel_path)
+        up_to_date = old_entry is not None and (
+            old_entry["gz_size"] is None or os.path.exists(path + ".gz")
+        )
+        if up_to_date and old_entry["size"] == st.st_size and old_entry["mtime_ns"] == st.st_mtime_ns:
+            entry["hash"] = old_entry["hash"]
+        else:
+            entry["hash"] = hash_file(path)
+            up_to_date = up_to_date and old_entry["hash"] == entry["hash"]
+
+        files[rel_path] = entry
+        if up_to_date:
+            entry["gz_size"] = old_entry["gz_size"]
+            stats["skipped"] += 1
+        else:
+            pending.append((rel_path, path))
+
+    jobs = [(path, level) for _, path in pending]
+    if workers == 1 or len(jobs) <= 1:
+        sizes = [gzip_file(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            sizes = list(executor.map(_gzip_job, jobs, chunksize=max(1, len(jobs) // 64)))
+    for (rel_path, _), gz_size in zip(pending, sizes):
+        entry = files[rel_path]
+        entry["gz_size"] = gz_size
+        stats["compressed"] += 1
+        stats["bytes_in"] += entry["size"]
+        stats["bytes_out"] += entry["size"] if gz_size is None else gz_size
+
+    for rel_path, old_entry in old_files.items():
+        if rel_path not in files and old_entry["gz_size"] is not None:
+            remove_output(public_dir, rel_path + ".gz")
+            stats["deleted"] += 1
+
+    # Saved by every .gz in public_dir, not just the ones written this time
+    stats["bytes_saved"] = sum(entry["size"] - entry["gz_size"] for entry in files.values()
+                               if entry["gz_size"] is not None)
+    save_manifest({"files": files}, manifest_path)
+    return stats
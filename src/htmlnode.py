@@ -1,59 +1,126 @@
+# Most text has nothing to escape, and checking for that is far cheaper
+# than running the replacements on every string
+def escape_text(text):
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+def escape_attribute(value):
+    value = str(value)
+    if "&" in value or "<" in value or ">" in value or "\"" in value:
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\"", "&quot;")
+    return value
 
 
 class HTMLNode():
-    def __init__(self, tag=None, value=None, children=None, props=None):
+    # Documents produce hundreds of thousands of nodes, so skip the
+    # per-instance __dict__. Each subclass adds the slot it uses, value or
+    # children, so no node carries an empty one.
+    __slots__ = ("tag", "props", "_props_html")
+
+    def __init__(self, tag=None, props=None):
         self.tag = tag
-        self.value = value
-        self.children = children
         self.props = props
+        self._props_html = None
 
     def to_html(self):
         raise NotImplementedError()
     
+    # Built on first use and kept, so props shouldn't change after a node
+    # has been rendered
     def props_to_html(self):
-        prop_str = ""
         if self.props == None:
             return ""
-        
-        for key in self.props:
-            prop_str += f" {key}=\"{self.props[key]}\""
-        return prop_str
+        if self._props_html is None:
+            self._props_html = "".join(
+                f" {key}=\"{escape_attribute(value)}\"" for key, value in self.props.items()
+            )
+        return self._props_html
 
     def __repr__(self):
-        return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
+        return f"HTMLNode({self.tag}, {self.props})"
     
 class LeafNode(HTMLNode):
+    __slots__ = ("value",)
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag, value, props=props)
+        super().__init__(tag, props)
+        self.value = value
+
+    def __repr__(self):
+        return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
     def to_html(self):
         if self.value == None:
             raise ValueError()
         if self.tag == None:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return escape_text(self.value)
+        return f"<{self.tag}{self.props_to_html()}>{escape_text(self.value)}</{self.tag}>"
+
+
+# Already-serialized HTML, such as a cached block, written out as is
+# without escaping
+class RawNode(HTMLNode):
+    __slots__ = ("value",)
+
+    def __init__(self, html):
+        super().__init__()
+        self.value = html
+
+    def to_html(self):
+        return self.value
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ("children",)
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag, children=children, props=props)
+        super().__init__(tag, props)
+        self.children = children
+
+    def __repr__(self):
+        return f"ParentNode({self.tag}, {self.children}, {self.props})"
 
     def to_html(self):
+        return "".join(iter_html(self))
+
+    def open_tag(self):
         if self.tag == None:
             raise ValueError()
         
         if self.children == None:
             raise ValueError("Must have children nodes/node")
-        
-        html = f"<{self.tag}>"
 
-        for child in self.children:
-            # print("\n***********************")
-            # print(f"Converting child: {child}")
-            # print("to HTML")
-            # print("***********************\n")
-            html += child.to_html()
+        return f"<{self.tag}{self.props_to_html()}>"
+
 
-        html += f"</{self.tag}>"
+# Walks the tree with an explicit stack instead of recursing, so deeply
+# nested trees don't hit the recursion limit. Closing tags are pushed as
+# plain strings ahead of the children they follow.
+def iter_html(node):
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, ParentNode):
+            yield item.open_tag()
+            stack.append(f"</{item.tag}>")
+            stack.extend(reversed(item.children))
+        else:
+            yield item.to_html()
 
-        return html
\ No newline at end of file
+# Writes the serialized tree to anything with a write() method, batching the
+# small chunks from iter_html so the sink isn't called once per tag.
+def write_html(node, sink, buffer_size=1 << 16):
+    buffer = []
+    buffered = 0
+    for chunk in iter_html(node):
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            sink.write("".join(buffer))
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        sink.write("".join(buffer))
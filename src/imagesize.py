@@ -0,0 +1,167 @@
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_SIZE_CACHE_PATH = ".image-size-cache.json"
+IMAGE_EXTENSIONS = {".png", ".gif", ".jpg", ".jpeg", ".webp"}
+
+# Bytes read up front: enough for the size of a PNG, GIF or WebP. A JPEG's
+# size comes after its other header segments, which are skipped over.
+HEADER_SIZE = 32
+
+# JPEG start-of-frame markers, which hold the image size (C4, C8 and CC
+# are other segments)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers with no length or payload after them
+_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+# Orientation (1-8) from the TIFF data of an Exif segment, or None.
+# Orientations 5-8 are rotated a quarter turn, so browsers show the image
+# with width and height swapped.
+def _exif_orientation(data):
+    if data[:4] == b"II*\0":
+        order = "<"
+    elif data[:4] == b"MM\0*":
+        order = ">"
+    else:
+        return None
+    (ifd,) = struct.unpack_from(order + "I", data, 4)
+    if ifd + 2 > len(data):
+        return None
+    (count,) = struct.unpack_from(order + "H", data, ifd)
+    for i in range(count):
+        entry = ifd + 2 + i * 12
+        if entry + 12 > len(data):
+            return None
+        tag, _, _, value = struct.unpack_from(order + "HHIH", data, entry)
+        if tag == 0x0112:
+            return value
+    return None
+
+def _jpeg_size(f):
+    f.seek(2)
+    rotated = False
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+        marker = f.read(1)
+        # Any number of fill bytes may come before a marker
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _STANDALONE_MARKERS:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        (length,) = struct.unpack(">H", header)
+        if code in _SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return (height, width) if rotated else (width, height)
+        if code == 0xE1:
+            segment = f.read(length - 2)
+            if segment[:6] == b"Exif\0\0":
+                rotated = (_exif_orientation(segment[6:]) or 1) >= 5
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+def _webp_size(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack_from("<HH", header, 26)
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and header[20] == 0x2F:
+        (bits,) = struct.unpack_from("<I", header, 21)
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    return None
+
+# (width, height) of a PNG, GIF, JPEG or WebP image, read from its header
+# without decoding it, or None for anything else
+def read_image_size(path):
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+                return struct.unpack_from(">II", header, 16)
+            if header[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack_from("<HH", header, 6)
+            if header[:4] == b"RIFF" and header[8:12] == b"WEBP" and len(header) >= 30:
+                return _webp_size(header)
+            if header[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def find_images(static_dir):
+    images = {}
+    for dirpath, _, filenames in os.walk(static_dir):
+        rel_dir = os.path.relpath(dirpath, static_dir)
+        prefix = "" if rel_dir == "." else rel_dir + os.sep
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                images[prefix + filename] = os.path.join(dirpath, filename)
+    return images
+
+def load_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"images": {}}
+
+# The size of every image under static_dir, keyed by the URL it is served
+# at ("/images/a.png" for static/images/a.png), leaving out images whose
+# size can't be read. The cache file keeps each image's size with its
+# mtime and size on disk, so an unchanged image is only stat'd; the others
+# are read on a pool of threads.
+def scan_image_sizes(static_dir, cache_path=IMAGE_SIZE_CACHE_PATH, workers=8):
+    start = time.perf_counter()
+    old_images = load_cache(cache_path)["images"]
+    images = {}
+    pending = []
+    for rel_path, path in find_images(static_dir).items():
+        st = os.stat(path)
+        old = old_images.get(rel_path)
+        if old is not None and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+            images[rel_path] = old
+        else:
+            pending.append((rel_path, path, st))
+
+    if pending:
+        with ThreadPoolExecutor(workers) as executor:
+            sizes = list(executor.map(read_image_size, [path for _, path, _ in pending]))
+        for (rel_path, _, st), size in zip(pending, sizes):
+            images[rel_path] = [st.st_mtime_ns, st.st_size] + (list(size) if size is not None else [None, None])
+
+    if images != old_images:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"images": images}, separators=(",", ":")))
+        os.replace(tmp_path, cache_path)
+
+    sizes = {}
+    for rel_path, (_, _, width, height) in images.items():
+        if width is not None:
+            sizes["/" + rel_path.replace(os.sep, "/")] = (width, height)
+    stats = {
+        "images": len(images),
+        "read": len(pending),
+        "cached": len(images) - len(pending),
+        "seconds": time.perf_counter() - start,
+    }
+    return sizes, stats
@@ -0,0 +1,140 @@
+from bisect import bisect_right
+
+from htmlnode import ParentNode
+from utils import block_to_html_node
+
+# A document kept parsed across edits, for live preview. The source is cut
+# where markdown_to_blocks cuts it, at each "\n\n" found scanning from the
+# left, and kept as the list of pieces between those separators. An edit
+# rescans only from the segment it starts in to the first old separator
+# after it that the new scan lands on too; from there on the scan would go
+# the same as before. Only the blocks in between are parsed again, and even
+# those are reused when their text didn't change (a paragraph split in two
+# keeps one half).
+#
+# Segment start positions are kept lazily: those before a pivot index count
+# from the start of the document and those after it from its end, so an
+# edit shifts none of them. Each edit moves the pivot to itself, converting
+# only the starts it passes over, along with the count of blocks before it.
+# What's left per edit is splicing the segment lists.
+
+
+class IncrementalDocument():
+    def __init__(self, markdown=""):
+        # The source between separators, so the document is "\n\n".join(self.raw)
+        self.raw = [""]
+        # Per segment, None if it's blank, else (block text, node, html)
+        self.segments = [None]
+        # Per segment, its start: before self.pivot as an offset from the
+        # start of the document, from self.pivot on minus its distance to the end
+        self.starts = [0]
+        self.pivot = 1
+        # Blocks in self.segments[:self.pivot]
+        self.pivot_block = 0
+        self.length = 0
+        self.parsed = 0
+        self.reused = 0
+        self.apply_edit(0, 0, markdown)
+
+    @property
+    def text(self):
+        return "\n\n".join(self.raw)
+
+    def move_pivot(self, index):
+        while self.pivot < index:
+            self.starts[self.pivot] += self.length
+            if self.segments[self.pivot] is not None:
+                self.pivot_block += 1
+            self.pivot += 1
+        while self.pivot > index:
+            self.pivot -= 1
+            self.starts[self.pivot] -= self.length
+            if self.segments[self.pivot] is not None:
+                self.pivot_block -= 1
+
+    def segment_start(self, index):
+        return self.starts[index] + (0 if index < self.pivot else self.length)
+
+    # The last segment starting at or before offset
+    def segment_at(self, offset):
+        if self.pivot < len(self.starts) and offset >= self.segment_start(self.pivot):
+            return bisect_right(self.starts, offset - self.length, self.pivot) - 1
+        return bisect_right(self.starts, offset, 0, self.pivot) - 1
+
+    # Replaces removed characters at offset with inserted and returns which
+    # blocks of the rendering changed, as (first, count, htmls): the count
+    # blocks from first were replaced by the blocks with these htmls
+    def apply_edit(self, offset, removed, inserted):
+        if offset < 0 or removed < 0 or offset + removed > self.length:
+            raise ValueError(f"Edit of {removed} characters at {offset} is outside the "
+                             f"{self.length} character document")
+        # Separators wholly before the edit stay where they are, so the
+        # rescan starts with the segment the edit starts in
+        first = self.segment_at(offset)
+        start = self.segment_start(first)
+        last = self.segment_at(offset + removed)
+        if offset + removed > self.segment_start(last) + len(self.raw[last]):
+            # The edit ends inside the separator after last
+            last += 1
+        region = "\n\n".join(self.raw[first:last + 1])
+        region = region[:offset - start] + inserted + region[offset + removed - start:]
+
+        # The old separator after the region is where the new scan lands,
+        # unless the region ends in a newline that pairs with its first one
+        parts = []
+        position = 0
+        following = last + 1
+        while True:
+            cut = region.find("\n\n", position)
+            if cut != -1:
+                parts.append(region[position:cut])
+                position = cut + 2
+            elif following < len(self.raw) and position < len(region) and region.endswith("\n"):
+                region += "\n\n" + self.raw[following]
+                following += 1
+            else:
+                parts.append(region[position:])
+                break
+
+        old_segments = self.segments[first:following]
+        known = {segment[0]: segment for segment in old_segments if segment is not None}
+        new_segments = []
+        new_starts = []
+        self.parsed = self.reused = 0
+        for part in parts:
+            new_starts.append(start)
+            start += len(part) + 2
+            block = part.strip()
+            if block == "":
+                new_segments.append(None)
+            elif block in known:
+                new_segments.append(known[block])
+                self.reused += 1
+            else:
+                node = block_to_html_node(block)
+                new_segments.append((block, node, node.to_html()))
+                self.parsed += 1
+
+        # Starts after the region count from the end, so they hold as they are
+        self.move_pivot(first)
+        block_index = self.pivot_block
+        removed_blocks = len(old_segments) - old_segments.count(None)
+        self.raw[first:following] = parts
+        self.segments[first:following] = new_segments
+        self.starts[first:following] = new_starts
+        self.length += len(inserted) - removed
+        self.pivot = first + len(parts)
+        new_htmls = [segment[2] for segment in new_segments if segment is not None]
+        self.pivot_block += len(new_htmls)
+        return block_index, removed_blocks, new_htmls
+
+    def blocks(self):
+        return [segment[0] for segment in self.segments if segment is not None]
+
+    # The same tree as markdown_to_html_node(self.text), sharing the block
+    # subtrees kept between edits
+    def to_html_node(self):
+        return ParentNode("div", [segment[1] for segment in self.segments if segment is not None])
+
+    def to_html(self):
+        return "<div>" + "".join(segment[2] for segment in self.segments if segment is not None) + "</div>"
@@ -0,0 +1,179 @@
+import os
+import posixpath
+import re
+import time
+from html import unescape
+from urllib.parse import unquote
+
+# A URL with a scheme (https:, mailto:, data:, ...) or a protocol-relative
+# one points off the site and isn't checked
+EXTERNAL = re.compile(r"(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+# Links, images and heading ids as the renderer writes them. Text inside
+# code is escaped, so it can't look like a tag.
+_URL = re.compile(r'<(?:a href|img src)="([^"]*)"')
+_HEADING_ID = re.compile(r'<h[1-6] id="([^"]*)"')
+
+
+# The links and images of one page, each with the line of the source it is
+# on, and the ids of its headings. They are read off the content HTML
+# rather than parsed again from the markdown: that is cheaper, covers
+# content from the block and render caches too, and checks exactly what is
+# published. source is the page's markdown, as a string or a memory map,
+# which each link is found in to number its line.
+class PageLinks():
+    def __init__(self, source):
+        self.source = source
+        self.position = 0
+        self.line = 1
+        self.links = []
+        self.anchors = []
+        self.seconds = 0.0
+
+    # Line of the link to url. Links come in source order, so each is
+    # searched for from the last one; one that can't be found (its URL
+    # broken over two lines, say) gets the last one's line.
+    def locate(self, url):
+        target = f"]({url})"
+        source = self.source
+        if isinstance(source, str):
+            found = source.find(target, self.position)
+            if found != -1:
+                self.line += source.count("\n", self.position, found)
+                self.position = found + len(target)
+        else:
+            target = target.encode("utf-8")
+            found = source.find(target, self.position)
+            if found != -1:
+                self.line += source[self.position:found].count(b"\n")
+                self.position = found + len(target)
+        return self.line
+
+    # Takes the links and headings from a piece of content HTML made of
+    # whole blocks
+    def add_html(self, html):
+        start = time.perf_counter()
+        if "<h" in html:
+            self.anchors.extend(_HEADING_ID.findall(html))
+        for url in _URL.findall(html):
+            if "&" in url:
+                url = unescape(url)
+            self.links.append([url, self.locate(url)])
+        self.seconds += time.perf_counter() - start
+
+    # Passes content HTML through, adding each piece on the way
+    def observe_html(self, chunks):
+        for chunk in chunks:
+            self.add_html(chunk)
+            yield chunk
+
+    # Lets go of the source once the page is rendered, so only the links
+    # travel back from a worker process
+    def finish(self):
+        self.source = None
+        return self
+
+
+_UNCHECKED = object()
+
+# Every file under public_dir, as a "/"-separated path relative to it
+def output_paths(public_dir):
+    paths = set()
+    for dirpath, _, filenames in os.walk(public_dir):
+        rel_dir = os.path.relpath(dirpath, public_dir)
+        prefix = "" if rel_dir == "." else rel_dir.replace(os.sep, "/") + "/"
+        paths.update(prefix + filename for filename in filenames)
+    return paths
+
+# What is wrong with a link to url from the page at output (both
+# "/"-separated), or None if it leads somewhere or off the site. Paths may
+# leave out ".html" or name a directory with an index.html.
+def link_problem(url, output, outputs, anchors):
+    if EXTERNAL.match(url):
+        return None
+    path, _, fragment = url.partition("#")
+    path = path.partition("?")[0]
+    if "%" in path:
+        path = unquote(path)
+    if path == "":
+        target = output
+    else:
+        if path.startswith("/"):
+            target = path.lstrip("/")
+        else:
+            directory = posixpath.dirname(output)
+            target = directory + "/" + path if directory else path
+        # Most links need no normalizing, and skipping it is much faster
+        if target == "" or target.endswith("/") or "//" in target or "/." in "/" + target:
+            target = posixpath.normpath(target)
+        if target == ".." or target.startswith("../"):
+            return "points outside the site"
+        if target == ".":
+            target = "index.html"
+        elif target not in outputs:
+            for candidate in (target + "/index.html", target + ".html"):
+                if candidate in outputs:
+                    target = candidate
+                    break
+            else:
+                return "no such page or file"
+    if fragment:
+        page_anchors = anchors.get(target)
+        if page_anchors is not None and unquote(fragment) not in page_anchors:
+            return f"no heading #{fragment} on {target}"
+    return None
+
+# Checks the links collected into the manifest's pages (see build_site's
+# collect_links) against the files in public_dir and the headings of the
+# pages, in one pass once the whole site is built. Returns the broken ones
+# as (source, line, url, problem), in source order.
+def check_links(public_dir, pages):
+    start = time.perf_counter()
+    outputs = output_paths(public_dir)
+    anchors = {}
+    for entry in pages.values():
+        if "anchors" in entry:
+            anchors[entry["output"].replace(os.sep, "/")] = set(entry["anchors"])
+
+    broken = []
+    link_count = 0
+    # Each link is resolved once: absolute ones once for the site, relative
+    # ones once per directory and those within the page once per page
+    absolute_problems = {}
+    problems_by_directory = {}
+    for source in sorted(pages):
+        entry = pages[source]
+        links = entry.get("links")
+        if not links:
+            continue
+        output = entry["output"].replace(os.sep, "/")
+        relative_problems = problems_by_directory.setdefault(posixpath.dirname(output), {})
+        page_problems = {}
+        link_count += len(links)
+        for url, line in links:
+            if url.startswith("/"):
+                problems = absolute_problems
+            elif url == "" or url.startswith(("#", "?")):
+                problems = page_problems
+            else:
+                problems = relative_problems
+            problem = problems.get(url, _UNCHECKED)
+            if problem is _UNCHECKED:
+                problem = problems[url] = link_problem(url, output, outputs, anchors)
+            if problem is not None:
+                broken.append((source, line, url, problem))
+    return {
+        "pages": len(pages),
+        "links": link_count,
+        "broken": broken,
+        "seconds": time.perf_counter() - start,
+    }
+
+# The report as lines for the terminal, with sources shown under
+# content_dir so editors can jump to them
+def report_lines(report, content_dir):
+    lines = [f"{os.path.join(content_dir, source)}:{line}: broken link {url}: {problem}"
+             for source, line, url, problem in report["broken"]]
+    lines.append(f"Links: {len(report['broken'])} broken of {report['links']} on {report['pages']} pages, "
+                 f"checked in {report['seconds']:.3f}s")
+    return lines
@@ -1,13 +1,230 @@
-from textnode import TextNode, TextType
-from htmlnode import LeafNode
+import argparse
+import os
+import sys
+import threading
+import time
 
-def main():
-    text = TextNode("This is some anchor text", TextType.LINK, "https://www.boot.dev")
-    print(text)
+import profiling
+import renderd
+from assets import sync_static, ASSET_MANIFEST_PATH
+from compress import compress_outputs, COMPRESS_MANIFEST_PATH, COMPRESS_MIN_SIZE
+from build import build_site, load_manifest, load_template, MANIFEST_PATH, MMAP_THRESHOLD
+from imagesize import scan_image_sizes, IMAGE_SIZE_CACHE_PATH
+from linkcheck import check_links, report_lines
+from watch import watch
+from rendercache import DEFAULT_RENDER_CACHE_SIZE
+from renderclient import DEFAULT_SOCKET
+from searchindex import SEARCH_STATE_PATH
+from shards import build_shard, build_all_shards, merge_shards, parse_shard, shard_path, SHARD_DIR
+from utils import block_cache_info, set_image_sizes, DEFAULT_BLOCK_CACHE_SIZE
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site from markdown content.")
+    parser.add_argument("--content", default="content", help="directory of markdown sources")
+    parser.add_argument("--public", default="public", help="output directory")
+    parser.add_argument("--template", default="template.html", help="page template ('' for none)")
+    parser.add_argument("--static", default="static", help="directory of static assets")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="build manifest file")
+    parser.add_argument("--asset-manifest", default=ASSET_MANIFEST_PATH, help="static asset manifest file")
+    parser.add_argument("--hash-assets", action="store_true", help="compare asset contents, not just size/mtime")
+    parser.add_argument("--hardlink-assets", action="store_true", help="hardlink assets into the output instead of copying")
+    parser.add_argument("--workers", type=int, default=1, help="render processes (0 = one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=None, help="pages handed to a worker at a time")
+    parser.add_argument("--io-threads", type=int, default=0,
+                        help="threads reading ahead and writing behind a serial render, "
+                             "for slow (e.g. network) filesystems; 0 does I/O inline")
+    parser.add_argument("--mmap-threshold", type=int, default=MMAP_THRESHOLD,
+                        help="sources of at least this many bytes are memory-mapped and streamed")
+    parser.add_argument("--block-cache", type=int, default=DEFAULT_BLOCK_CACHE_SIZE,
+                        help="rendered blocks kept for reuse across pages")
+    parser.add_argument("--render-cache", default=None,
+                        help="SQLite file keeping rendered pages across builds (e.g. a CI cache)")
+    parser.add_argument("--render-cache-size", type=int, default=DEFAULT_RENDER_CACHE_SIZE >> 20,
+                        help="size --render-cache is trimmed to, in MiB")
+    parser.add_argument("--search", action="store_true", help="build a search index into <public>/search")
+    parser.add_argument("--search-state", default=SEARCH_STATE_PATH, help="state kept to update the search index")
+    parser.add_argument("--image-sizes", action="store_true",
+                        help="give <img> tags of images under --static their width and height")
+    parser.add_argument("--image-size-cache", default=IMAGE_SIZE_CACHE_PATH,
+                        help="file keeping image sizes so unchanged images aren't read again")
+    parser.add_argument("--check-links", action="store_true",
+                        help="report internal links and images whose target isn't in the output (exits 1 if any)")
+    parser.add_argument("--shard", default=None, metavar="I/N",
+                        help="build only shard I of N (from 1) into --shard-dir, for one node of a sharded build")
+    parser.add_argument("--merge", action="store_true", help="merge the shards in --shard-dir into --public")
+    parser.add_argument("--local-shards", type=int, default=0, metavar="N",
+                        help="build N shards in N local processes, then merge them")
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="where shards are built and merged from")
+    parser.add_argument("--daemon", action="store_true",
+                        help="serve render requests on --socket instead of building (see renderclient)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket for --daemon")
+    parser.add_argument("--daemon-threads", type=int, default=renderd.DEFAULT_THREADS,
+                        help="connections --daemon handles at once")
+    parser.add_argument("--daemon-queue", type=int, default=renderd.DEFAULT_QUEUE_SIZE,
+                        help="connections --daemon queues before turning new ones away")
+    parser.add_argument("--daemon-idle-timeout", type=float, default=renderd.DEFAULT_IDLE_TIMEOUT,
+                        help="seconds --daemon keeps an idle connection open")
+    parser.add_argument("--compress", action="store_true", help="write .gz siblings of .html and .css outputs")
+    parser.add_argument("--compress-min-size", type=int, default=COMPRESS_MIN_SIZE,
+                        help="smallest output --compress compresses, in bytes")
+    parser.add_argument("--compress-manifest", default=COMPRESS_MANIFEST_PATH, help="compressed output manifest file")
+    parser.add_argument("--profile", action="store_true", help="print per-stage timings and write a JSON report")
+    parser.add_argument("--profile-out", default="build-profile.json", help="where --profile writes its report")
+    parser.add_argument("--slowest", type=int, default=10, help="slowest pages listed by --profile")
+    parser.add_argument("--watch", action="store_true", help="rebuild on changes and serve the output")
+    parser.add_argument("--port", type=int, default=8888, help="port for --watch to serve on (0 to not serve)")
+    return parser.parse_args(argv)
+
+def print_build_stats(stats, args, workers):
+    print(f"Built {stats['built']}, skipped {stats['skipped']}, deleted {stats['deleted']} pages")
+    if workers == 1:
+        cache = block_cache_info()
+        print(f"Block cache: {cache.hits} hits, {cache.misses} misses")
+    if "render_cache" in stats:
+        render_cache = stats["render_cache"]
+        print(f"Render cache: {render_cache['hits']} hits, {render_cache['misses']} misses, "
+              f"{render_cache['evicted']} evicted")
+    if "links" in stats:
+        print(f"Links: collected {stats['links']['collected']} in {stats['links']['seconds']:.3f}s")
+    if "io" in stats:
+        io = stats["io"]
+        print(f"I/O: {io['io_time']:.3f}s on {args.io_threads} threads; render thread spent "
+              f"{io['cpu_time']:.3f}s on CPU, waited {io['read_wait']:.3f}s for reads and {io['write_wait']:.3f}s for writes")
+
+def print_merge_stats(stats):
+    print(f"Merged {stats['pages']} pages from {len(stats['shards'])} shards: "
+          f"copied {stats['copied']} files, deleted {stats['deleted']} pages")
+    for index, shard in stats["shards"].items():
+        seconds = "?" if shard["seconds"] is None else f"{shard['seconds']:.2f}s"
+        print(f"  shard {index}: {shard['pages']} pages, built in {seconds}")
+
+def print_link_report(report, args):
+    print("\n".join(report_lines(report, args.content)))
+
+def run_daemon(args, image_sizes=None):
+    set_image_sizes(image_sizes)
+    try:
+        template, _ = load_template(args.template or None)
+        server = renderd.serve(args.socket, template, args.daemon_threads, args.daemon_queue,
+                               args.daemon_idle_timeout)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print(f"Rendering on {args.socket}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = server.histogram.to_dict()
+    print(f"{stats['requests']} requests, {server.rejected} turned away; mean {stats['mean_ms']:.2f} ms, "
+          f"p50 <= {stats['p50_ms']} ms, p99 <= {stats['p99_ms']} ms, max {stats['max_ms']:.2f} ms")
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    workers = args.workers or os.cpu_count() or 1
+    asset_options = {
+        "manifest_path": args.asset_manifest,
+        "use_hash": args.hash_assets,
+        "hardlink": args.hardlink_assets,
+    }
+    build_options = {
+        "workers": workers,
+        "chunksize": args.chunksize,
+        "block_cache_size": args.block_cache,
+        "mmap_threshold": args.mmap_threshold,
+        "io_threads": args.io_threads,
+        "render_cache_path": args.render_cache,
+        "render_cache_size": args.render_cache_size << 20,
+        "collect_links": args.check_links,
+    }
+    if args.image_sizes and os.path.isdir(args.static):
+        # Read once up front; --watch keeps these sizes until restarted
+        build_options["image_sizes"], image_stats = scan_image_sizes(args.static, args.image_size_cache)
+        print(f"Images: {image_stats['images']} found, {image_stats['read']} read, "
+              f"{image_stats['cached']} from cache in {image_stats['seconds']:.3f}s")
+    search_state_path = args.search_state if args.search else None
+    if args.watch:
+        try:
+            watch(args.content, args.public, args.template or None, args.static, args.port,
+                  asset_options=asset_options, manifest_path=args.manifest,
+                  search_state_path=search_state_path, **build_options)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.daemon:
+        run_daemon(args, build_options.get("image_sizes"))
+        return
+
+    if args.shard:
+        # One node's share of a sharded build; assets, the search index,
+        # compression and link checking are left to the merge
+        try:
+            index, count = parse_shard(args.shard)
+            stats = build_shard(args.content, args.shard_dir, index, count, args.template or None,
+                                args.search, **build_options)
+        except (FileNotFoundError, ValueError) as e:
+            print(e)
+            sys.exit(1)
+        print(f"Shard {index}/{count} in {shard_path(args.shard_dir, index, count)}")
+        print_build_stats(stats, args, workers)
+        return
+
+    if args.profile:
+        profiling.enable()
+    start = time.perf_counter()
+    sharded = args.merge or args.local_shards
+    try:
+        if args.local_shards:
+            build_all_shards(args.content, args.shard_dir, args.local_shards, args.template or None,
+                             args.search, **build_options)
+        if sharded:
+            stats = merge_shards(args.shard_dir, args.public, args.manifest, search_state_path,
+                                 hardlink=args.hardlink_assets)
+        if os.path.isdir(args.static):
+            asset_stats = sync_static(args.static, args.public, **asset_options)
+            print(f"Assets: copied {asset_stats['copied']} ({asset_stats['bytes_copied']} bytes), "
+                  f"skipped {asset_stats['skipped']}, deleted {asset_stats['deleted']}")
+        if not sharded:
+            stats = build_site(args.content, args.public, args.template or None, args.manifest,
+                               search_state_path=search_state_path, **build_options)
+        if args.compress:
+            compress_stats = compress_outputs(args.public, args.compress_manifest, args.compress_min_size,
+                                              workers=workers)
+        if args.check_links:
+            link_report = check_links(args.public, load_manifest(args.manifest)["pages"])
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        profile = profiling.disable()
+    if profile is not None:
+        profile.wall_time = time.perf_counter() - start
+    if sharded:
+        print_merge_stats(stats)
+    else:
+        print_build_stats(stats, args, workers)
+    if args.compress:
+        print(f"Compressed {compress_stats['compressed']} ({compress_stats['bytes_in']} -> "
+              f"{compress_stats['bytes_out']} bytes), skipped {compress_stats['skipped']}, "
+              f"deleted {compress_stats['deleted']}; .gz files save {compress_stats['bytes_saved']} bytes")
+    if "search" in stats:
+        search = stats["search"]
+        print(f"Search index: {search['pages']} pages, {search['bytes']} bytes, "
+              f"{search['seconds']:.3f}s spent indexing")
+    if profile is not None:
+        print(profile.summary(args.slowest))
+        profile.write_json(args.profile_out, args.slowest)
+        print(f"Wrote {args.profile_out}")
+    if args.check_links:
+        print_link_report(link_report, args)
+        if link_report["broken"]:
+            sys.exit(1)
 
-        
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
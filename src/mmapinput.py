@@ -0,0 +1,71 @@
+import hashlib
+import mmap
+import os
+import re
+
+# Reading a huge source with read() and splitting it keeps several copies
+# of it in memory. Mapping it instead lets the block scan run over the
+# file's pages directly; each block is decoded only when it is rendered,
+# and pages already scanned are handed back to the kernel, so resident
+# memory stays around the size of the largest block.
+
+RELEASE_EVERY = 8 << 20
+
+_TITLE = re.compile(rb"^# (.*)$", re.MULTILINE)
+
+
+def open_mapped(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+# Drops the pages of mapped[start:end] from memory; the kernel reads them
+# back from the file if they are touched again
+def release(mapped, start, end):
+    start -= start % mmap.PAGESIZE
+    if hasattr(mmap, "MADV_DONTNEED") and end > start:
+        mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+def hash_mapped(mapped):
+    digest = hashlib.sha256()
+    view = memoryview(mapped)
+    try:
+        for start in range(0, len(mapped), RELEASE_EVERY):
+            end = min(start + RELEASE_EVERY, len(mapped))
+            digest.update(view[start:end])
+            release(mapped, start, end)
+    finally:
+        view.release()
+    return digest.hexdigest()
+
+# extract_title over the mapping. Without a heading this touches the
+# whole file, so the pages are released again afterwards.
+def mapped_title(mapped):
+    match = _TITLE.search(mapped)
+    release(mapped, 0, len(mapped) if match is None else match.end())
+    if match is None:
+        return None
+    return match.group(1).decode("utf-8").strip()
+
+# The blocks of markdown_to_blocks, read from the mapping. "\n\n" can't
+# occur inside a multi-byte UTF-8 sequence, so it is safe to split the raw
+# bytes and decode block by block.
+def iter_mapped_blocks(mapped):
+    position = 0
+    released = 0
+    length = len(mapped)
+    while position <= length:
+        separator = mapped.find(b"\n\n", position)
+        if separator == -1:
+            separator = length
+        block = mapped[position:separator].decode("utf-8").strip()
+        if block != "":
+            yield block
+        position = separator + 2
+        if position - released >= RELEASE_EVERY:
+            release(mapped, released, position)
+            released = position - position % mmap.PAGESIZE
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_IO_THREADS = 8
+
+# How many sources may be read ahead of the page being rendered, and how
+# many finished pages may be waiting to be written, before the renderer
+# blocks. Together they bound the memory held by pages in flight.
+READ_AHEAD = 32
+WRITE_BEHIND = 64
+
+_END = object()
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def write_file(path, data):
+    dest_dir = os.path.dirname(path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+# Opens path for a page to be streamed into, as the inline write path of a
+# build does instead of write_file
+def open_page(path):
+    dest_dir = os.path.dirname(path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    return open(path, "w", encoding="utf-8")
+
+# Moves a build's page reads and writes onto a thread pool so that opening,
+# reading, writing and closing thousands of small files overlaps with
+# rendering on the calling thread. Used as a context manager; leaving it
+# waits for the last writes and raises the first write error, if any.
+class PageIO():
+    def __init__(self, threads=DEFAULT_IO_THREADS, read_ahead=READ_AHEAD, write_behind=WRITE_BEHIND):
+        self.executor = ThreadPoolExecutor(threads)
+        self.read_ahead = max(1, read_ahead)
+        self.write_slots = threading.BoundedSemaphore(max(1, write_behind))
+        self.errors = []
+        self.lock = threading.Lock()
+        # Time the calling thread spent blocked on reads and writes, the
+        # time spent in I/O on the pool (summed over its threads) and the
+        # CPU time of the calling thread while the layer was open
+        self.read_wait = 0.0
+        self.write_wait = 0.0
+        self.io_time = 0.0
+        self.cpu_time = 0.0
+        self.cpu_start = time.thread_time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+
+    def timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.io_time += elapsed
+
+    # Yields the contents of each path in order, keeping up to read_ahead
+    # reads in flight. A None path yields None, for pages read some other
+    # way.
+    def read_all(self, paths):
+        paths = iter(paths)
+        pending = deque()
+
+        def submit():
+            path = next(paths, _END)
+            if path is not _END:
+                pending.append(None if path is None else self.executor.submit(self.timed, read_file, path))
+
+        for _ in range(self.read_ahead):
+            submit()
+        while pending:
+            future = pending.popleft()
+            submit()
+            if future is None:
+                yield None
+                continue
+            start = time.perf_counter()
+            data = future.result()
+            self.read_wait += time.perf_counter() - start
+            yield data
+
+    # Queues data to be written to path, blocking only while write_behind
+    # writes are already waiting
+    def write(self, path, data):
+        start = time.perf_counter()
+        self.write_slots.acquire()
+        self.write_wait += time.perf_counter() - start
+        future = self.executor.submit(self.timed, write_file, path, data)
+        future.add_done_callback(self.write_done)
+
+    def write_done(self, future):
+        self.write_slots.release()
+        error = future.exception()
+        if error is not None:
+            self.errors.append(error)
+
+    def close(self, raise_errors=True):
+        start = time.perf_counter()
+        self.executor.shutdown(wait=True)
+        self.write_wait += time.perf_counter() - start
+        self.cpu_time = time.thread_time() - self.cpu_start
+        if raise_errors and self.errors:
+            raise self.errors[0]
+
+    def report(self):
+        return {
+            "read_wait": self.read_wait,
+            "write_wait": self.write_wait,
+            "io_time": self.io_time,
+            "cpu_time": self.cpu_time,
+        }
@@ -0,0 +1,124 @@
+import json
+import time
+from collections import Counter
+
+import utils
+
+# The profile of the build in progress, or None when profiling is off. The
+# pipeline functions are only wrapped while it is set, so a normal build
+# runs the plain functions with no extra cost.
+active = None
+
+# utils functions timed as their own stage while profiling
+PIPELINE_STAGES = {
+    "markdown_to_blocks": "split_blocks",
+    "block_to_block_type": "classify",
+    "scan_inline": "inline",
+    "inline_tokens_html": "inline_html",
+}
+
+# Stage timed by the page renderers in build that contains the pipeline
+# stages above
+RENDER_STAGE = "render"
+
+
+class BuildProfile():
+    def __init__(self):
+        self.stage_times = Counter()
+        self.block_types = Counter()
+        self.text_types = Counter()
+        self.page_times = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.wall_time = 0.0
+
+    def add_page(self, page, seconds, bytes_in, bytes_out):
+        self.page_times[page] = seconds
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def merge(self, other):
+        self.stage_times.update(other.stage_times)
+        self.block_types.update(other.block_types)
+        self.text_types.update(other.text_types)
+        self.page_times.update(other.page_times)
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+
+    def slowest_pages(self, count):
+        return sorted(self.page_times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    # Render time not spent in any of the pipeline stages: building the
+    # ParentNode tree or emitting block HTML, the block cache and so on
+    def tree_time(self):
+        pipeline = sum(self.stage_times[stage] for stage in PIPELINE_STAGES.values())
+        return max(0.0, self.stage_times[RENDER_STAGE] - pipeline)
+
+    def to_dict(self, slowest=10):
+        stages = dict(self.stage_times)
+        stages["tree"] = self.tree_time()
+        return {
+            "wall_time": self.wall_time,
+            "pages": len(self.page_times),
+            "stage_times": stages,
+            "block_types": dict(self.block_types),
+            "text_types": dict(self.text_types),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "slowest_pages": [{"page": page, "seconds": seconds} for page, seconds in self.slowest_pages(slowest)],
+        }
+
+    def summary(self, slowest=10):
+        lines = [f"Profiled {len(self.page_times)} pages in {self.wall_time:.3f}s wall, "
+                 f"{self.bytes_in} bytes in, {self.bytes_out} bytes out"]
+        lines.append("Stage times (summed over workers):")
+        for stage in ("scan", "read", RENDER_STAGE):
+            lines.append(f"  {stage:<16} {self.stage_times[stage]:>9.4f}s")
+        for stage in PIPELINE_STAGES.values():
+            lines.append(f"    {stage:<14} {self.stage_times[stage]:>9.4f}s")
+        lines.append(f"    {'tree':<14} {self.tree_time():>9.4f}s")
+        lines.append(f"  {'write':<16} {self.stage_times['write']:>9.4f}s")
+        lines.append("Blocks rendered (cache hits not counted): " + ", ".join(f"{name} {count}" for name, count in self.block_types.most_common()))
+        lines.append("Inline: " + ", ".join(f"{name} {count}" for name, count in self.text_types.most_common()))
+        lines.append(f"Slowest {slowest} pages:")
+        for page, seconds in self.slowest_pages(slowest):
+            lines.append(f"  {seconds * 1000:>9.2f} ms  {page}")
+        return "\n".join(lines)
+
+    def write_json(self, path, slowest=10):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(slowest), f, indent=2)
+
+
+def _timed(stage, func):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        active.stage_times[stage] += time.perf_counter() - start
+        if stage == "classify":
+            active.block_types[result.name] += 1
+        elif stage == "inline":
+            for token in result:
+                active.text_types[token[0].name] += 1
+        return result
+    wrapper.__wrapped__ = func
+    return wrapper
+
+def enable():
+    global active
+    if active is not None:
+        return active
+    active = BuildProfile()
+    for name, stage in PIPELINE_STAGES.items():
+        setattr(utils, name, _timed(stage, getattr(utils, name)))
+    return active
+
+def disable():
+    global active
+    if active is None:
+        return None
+    for name in PIPELINE_STAGES:
+        setattr(utils, name, getattr(utils, name).__wrapped__)
+    profile = active
+    active = None
+    return profile
@@ -0,0 +1,111 @@
+import sqlite3
+import time
+
+DEFAULT_RENDER_CACHE_SIZE = 256 << 20
+
+# New entries and recency updates are written in batches of this many, one
+# transaction each, rather than a transaction per page
+FLUSH_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    key TEXT PRIMARY KEY,
+    html BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used);
+"""
+
+
+# Rendered page content kept in an SQLite file across builds, keyed by the
+# source's hash and the generator version so a new renderer never serves
+# old output. Each process opens its own RenderCache on the same file: the
+# database is in WAL mode, so readers don't block the writer and writers
+# wait for each other instead of failing. Writes are batched, so an entry
+# may not be visible to other processes until flush() or close().
+# evict() trims the least recently used entries once the cache grows past
+# max_bytes.
+class RenderCache():
+    def __init__(self, path, version, max_bytes=DEFAULT_RENDER_CACHE_SIZE):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pending_puts = {}
+        self.pending_uses = {}
+        # Autocommit: each statement is its own short transaction
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def key(self, source_hash):
+        return f"{self.version}:{source_hash}"
+
+    def get(self, source_hash):
+        key = self.key(source_hash)
+        pending = self.pending_puts.get(key)
+        if pending is not None:
+            self.hits += 1
+            self.pending_puts[key] = (pending[0], time.time_ns())
+            return pending[0].decode("utf-8")
+        row = self.conn.execute("SELECT html FROM fragments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.pending_uses[key] = time.time_ns()
+        self.maybe_flush()
+        return row[0].decode("utf-8")
+
+    def put(self, source_hash, html):
+        data = html.encode("utf-8")
+        self.pending_puts[self.key(source_hash)] = (data, time.time_ns())
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if len(self.pending_puts) + len(self.pending_uses) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_puts and not self.pending_uses:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO fragments (key, html, size, used) VALUES (?, ?, ?, ?)",
+            [(key, data, len(data), used) for key, (data, used) in self.pending_puts.items()],
+        )
+        self.conn.executemany("UPDATE fragments SET used = ? WHERE key = ?",
+                              [(used, key) for key, used in self.pending_uses.items()])
+        self.conn.execute("COMMIT")
+        self.pending_puts.clear()
+        self.pending_uses.clear()
+
+    def total_size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+
+    # Deletes least recently used entries until the cache fits in max_bytes
+    # and returns how many went
+    def evict(self):
+        self.flush()
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return 0
+        keys = []
+        cursor = self.conn.execute("SELECT key, size FROM fragments ORDER BY used")
+        for key, size in cursor:
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany("DELETE FROM fragments WHERE key = ?", keys)
+        self.conn.execute("COMMIT")
+        return len(keys)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+
+# Client side of the render daemon (see renderd). It imports nothing from
+# the generator so that starting it costs no more than the interpreter.
+
+DEFAULT_SOCKET = ".render.sock"
+
+# Messages are JSON objects, each sent as a 4-byte big-endian length and
+# then that many bytes of UTF-8
+HEADER = struct.Struct(">I")
+MAX_MESSAGE = 64 << 20
+
+
+def send_message(sock, message):
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+def recv_exactly(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ConnectionError("Connection closed in the middle of a message")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+# The next message, or None once the other side has closed the connection
+def recv_message(sock):
+    header = recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ValueError(f"Message of {length} bytes is over the {MAX_MESSAGE} byte limit")
+    data = recv_exactly(sock, length)
+    if data is None:
+        raise ConnectionError("Connection closed in the middle of a message")
+    return json.loads(data)
+
+
+# One connection to the daemon, reusable for any number of requests. The
+# daemon closes connections left idle, so a request that finds its
+# connection closed is sent again once on a new one.
+class RenderClient():
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect()
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.connect(self.socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def exchange(self, message):
+        try:
+            send_message(self.sock, message)
+            return recv_message(self.sock)
+        except (BrokenPipeError, ConnectionResetError):
+            return None
+
+    def request(self, message):
+        response = self.exchange(message)
+        if response is None:
+            self.sock.close()
+            self.connect()
+            response = self.exchange(message)
+        if response is None:
+            raise ConnectionError("The render daemon closed the connection")
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    # Content HTML of markdown, or with page=True the whole page in the
+    # daemon's template. path names the page (for its fallback title) or,
+    # without markdown, the file the daemon should read.
+    def render(self, markdown=None, path=None, page=False):
+        message = {"page": page}
+        if markdown is not None:
+            message["markdown"] = markdown
+        if path is not None:
+            message["path"] = path
+        return self.request(message)["html"]
+
+    def stats(self):
+        return self.request({"stats": True})["stats"]
+
+    def close(self):
+        self.sock.close()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Render markdown with a running render daemon.")
+    parser.add_argument("files", nargs="*", metavar="FILE", help="markdown files (standard input if none)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="the daemon's socket")
+    parser.add_argument("--page", action="store_true", help="render whole pages in the daemon's template")
+    parser.add_argument("--path", help="page path for markdown read from standard input")
+    parser.add_argument("--stats", action="store_true", help="print the daemon's request statistics")
+    # Files may come before, after or between the options
+    return parser.parse_intermixed_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        with RenderClient(args.socket) as client:
+            if args.stats:
+                print(json.dumps(client.stats(), indent=2))
+                return
+            if not args.files:
+                sys.stdout.write(client.render(sys.stdin.read(), args.path, args.page))
+                return
+            for path in args.files:
+                with open(path, encoding="utf-8") as f:
+                    markdown = f.read()
+                sys.stdout.write(client.render(markdown, os.path.abspath(path), args.page))
+    except (OSError, RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
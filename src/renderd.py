@@ -0,0 +1,187 @@
+import bisect
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from htmlnode import escape_text
+from renderclient import DEFAULT_SOCKET, send_message, recv_message
+from template import DEFAULT_TEMPLATE
+from utils import markdown_to_html, extract_title
+
+DEFAULT_THREADS = 4
+DEFAULT_QUEUE_SIZE = 64
+# Seconds a connection may sit between requests before it is closed, so
+# that idle clients don't hold on to the threads
+DEFAULT_IDLE_TIMEOUT = 5.0
+
+# Upper bounds of the latency histogram's buckets, in milliseconds; the
+# last bucket takes everything slower
+LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class LatencyHistogram():
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.slowest = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        with self.lock:
+            self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+            self.total += ms
+            self.slowest = max(self.slowest, ms)
+
+    # Upper bound of the bucket holding the given fraction of requests
+    def percentile(self, fraction):
+        target = fraction * sum(self.counts)
+        seen = 0
+        for bound, count in zip(self.bounds + (None,), self.counts):
+            seen += count
+            if count and seen >= target:
+                return self.slowest if bound is None else bound
+        return 0.0
+
+    def to_dict(self):
+        with self.lock:
+            count = sum(self.counts)
+            buckets = {f"<={bound}ms": n for bound, n in zip(self.bounds, self.counts)}
+            buckets[f">{self.bounds[-1]}ms"] = self.counts[-1]
+            return {
+                "requests": count,
+                "mean_ms": self.total / count if count else 0.0,
+                "p50_ms": self.percentile(0.5),
+                "p99_ms": self.percentile(0.99),
+                "max_ms": self.slowest,
+                "buckets": buckets,
+            }
+
+
+class RenderHandler(socketserver.BaseRequestHandler):
+    # A connection may carry any number of requests, answered in order
+    def handle(self):
+        self.request.settimeout(self.server.idle_timeout)
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, TimeoutError, ValueError):
+                return
+            if request is None:
+                return
+            start = time.perf_counter()
+            response = self.server.respond(request)
+            self.server.histogram.record(time.perf_counter() - start)
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+# Renders markdown sent over a Unix socket, so that an editor preview or a
+# CMS hook pays for interpreter startup and imports once, not per document.
+# Connections are queued for a fixed set of threads; when queue_size are
+# already waiting, a new one is told the daemon is busy and closed. A thread
+# stays with its connection until the client closes it or sends nothing
+# for idle_timeout seconds.
+class RenderServer(socketserver.UnixStreamServer):
+    def __init__(self, socket_path=DEFAULT_SOCKET, template=DEFAULT_TEMPLATE,
+                 threads=DEFAULT_THREADS, queue_size=DEFAULT_QUEUE_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, RenderHandler)
+        self.template = template
+        self.idle_timeout = idle_timeout
+        self.histogram = LatencyHistogram()
+        self.rejected = 0
+        self.connections = queue.Queue(queue_size)
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(threads)]
+        for worker in self.workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self.connections.put_nowait((request, client_address))
+        except queue.Full:
+            self.rejected += 1
+            try:
+                send_message(request, {"error": "Render daemon busy, try again"})
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def work(self):
+        while True:
+            item = self.connections.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def respond(self, request):
+        if not isinstance(request, dict):
+            return {"error": "Request must be a JSON object"}
+        if request.get("stats"):
+            stats = self.histogram.to_dict()
+            stats["rejected"] = self.rejected
+            stats["queued"] = self.connections.qsize()
+            return {"stats": stats}
+
+        markdown = request.get("markdown")
+        path = request.get("path")
+        if not isinstance(markdown, (str, type(None))) or not isinstance(path, (str, type(None))):
+            return {"error": "Request markdown and path must be strings"}
+        try:
+            if markdown is None:
+                if path is None:
+                    return {"error": "Request needs markdown or a path"}
+                with open(path, encoding="utf-8") as f:
+                    markdown = f.read()
+            content = markdown_to_html(markdown, cache_blocks=True)
+        except (OSError, UnicodeDecodeError) as e:
+            return {"error": str(e)}
+
+        fallback_title = "" if path is None else os.path.splitext(os.path.basename(path))[0]
+        title = extract_title(markdown) or fallback_title
+        if not request.get("page"):
+            return {"html": content, "title": title}
+        return {"html": self.template.render({"Title": escape_text(title), "Content": content}), "title": title}
+
+    def server_close(self):
+        super().server_close()
+        for _ in self.workers:
+            self.connections.put(None)
+        try:
+            os.remove(self.server_address)
+        except FileNotFoundError:
+            pass
+
+# A socket file left by a daemon that died can be replaced; one that a
+# daemon is still listening on can't
+def remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+    else:
+        raise ValueError(f"A render daemon is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+def serve(socket_path=DEFAULT_SOCKET, template=DEFAULT_TEMPLATE, threads=DEFAULT_THREADS,
+          queue_size=DEFAULT_QUEUE_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    server = RenderServer(socket_path, template, threads, queue_size, idle_timeout)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
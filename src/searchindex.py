@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import shutil
+import time
+from collections import Counter
+
+from blocknode import BlockType
+from utils import block_to_block_type, block_to_inline_texts, find_heading_level
+
+SEARCH_STATE_PATH = ".search-index.json"
+# Where the index goes inside public_dir
+SEARCH_DIR = "search"
+
+# Words in an h1 count this many times over words in body text, with each
+# heading level below that counting one less
+HEADING_WEIGHT = 4
+TERM = re.compile(r"[^\W_]{2,32}")
+# The "](url)" of a link or image; its label or alt text is kept. Markup
+# characters never match TERM, so this is all a block needs stripped.
+LINK_URL = re.compile(r"\]\([^)]*\)")
+
+
+# Terms of one page with their weights, taken from the same blocks the
+# renderer works on
+class PageDocument():
+    def __init__(self):
+        self.title = None
+        self.terms = Counter()
+        self.seconds = 0.0
+
+    def add_text(self, text, weight=1):
+        terms = TERM.findall(LINK_URL.sub(" ", text).lower())
+        if weight == 1:
+            self.terms.update(terms)
+        else:
+            for term in terms:
+                self.terms[term] += weight
+
+    def add_block(self, block):
+        start = time.perf_counter()
+        block_type = block_to_block_type(block)
+        if block_type != BlockType.CODE:
+            weight = 1
+            if block_type == BlockType.HEADING:
+                weight = max(1, HEADING_WEIGHT + 1 - find_heading_level(block))
+            self.add_text(" ".join(block_to_inline_texts(block, block_type)), weight)
+        self.seconds += time.perf_counter() - start
+
+    def add_blocks(self, blocks):
+        for block in blocks:
+            self.add_block(block)
+
+    # Passes blocks through, adding each on the way
+    def observe(self, blocks):
+        for block in blocks:
+            self.add_block(block)
+            yield block
+
+
+# Shard the terms starting with term's first character go into; a client
+# looking a term up knows which file to fetch without a directory
+def shard_for(term):
+    first = term[0]
+    return first if first.isascii() and first.isalnum() else "_"
+
+# Compact JSON written through a temporary file, so a server never sees a
+# half-written shard
+def write_json(data, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, separators=(",", ":"), sort_keys=True))
+    os.replace(tmp_path, path)
+
+def load_state(state_path):
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"pages": {}, "free_ids": [], "next_id": 0}
+
+# An inverted index over the site, written to public_dir/search as
+# pages.json (a list of [url, title] indexed by page id, with null for
+# unused ids) and one <shard>.json per shard mapping each term to a flat
+# [id, weight, id, weight, ...] list. The state file keeps each page's id
+# and terms so a build that changed a few pages only rewrites the shards
+# their old and new terms fall in.
+class SearchIndex():
+    def __init__(self, public_dir, state_path=SEARCH_STATE_PATH):
+        self.public_dir = public_dir
+        self.state_path = state_path
+        self.index_dir = os.path.join(public_dir, SEARCH_DIR)
+        # Without its state an existing index can't be patched, only replaced
+        self.replace = not os.path.exists(state_path)
+        state = load_state(state_path)
+        self.pages = state["pages"]
+        self.free_ids = state["free_ids"]
+        self.next_id = state["next_id"]
+        # Old terms of each page changed since the last write, by id
+        self.changes = {}
+        self.seconds = 0.0
+
+    def __contains__(self, source):
+        return source in self.pages
+
+    def allocate_id(self):
+        if self.free_ids:
+            return self.free_ids.pop()
+        self.next_id += 1
+        return self.next_id - 1
+
+    def update(self, source, url, document):
+        old = self.pages.get(source)
+        page_id = self.allocate_id() if old is None else old["id"]
+        self.changes.setdefault(page_id, {} if old is None else old["terms"])
+        self.pages[source] = {"id": page_id, "url": url, "title": document.title, "terms": dict(document.terms)}
+        self.seconds += document.seconds
+
+    def remove(self, source):
+        old = self.pages.pop(source, None)
+        if old is None:
+            return
+        self.changes.setdefault(old["id"], old["terms"])
+        self.free_ids.append(old["id"])
+
+    def shard_path(self, shard):
+        return os.path.join(self.index_dir, f"{shard}.json")
+
+    def read_shard(self, shard):
+        try:
+            with open(self.shard_path(shard), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    # Writes the shards and page list touched by changes since the last
+    # write, then the state
+    def write(self):
+        if not self.changes and not self.replace and os.path.isdir(self.index_dir):
+            return
+        start = time.perf_counter()
+        if self.replace:
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            self.replace = False
+        os.makedirs(self.index_dir, exist_ok=True)
+        current = {page["id"]: page for page in self.pages.values()}
+
+        # Terms whose postings change, by shard, and the changed pages' new postings
+        dirty = {}
+        added = {}
+        for page_id, old_terms in self.changes.items():
+            for term in old_terms:
+                dirty.setdefault(shard_for(term), set()).add(term)
+            page = current.get(page_id)
+            if page is None:
+                continue
+            for term, weight in page["terms"].items():
+                dirty.setdefault(shard_for(term), set()).add(term)
+                added.setdefault(term, []).append((page_id, weight))
+
+        for shard, terms in dirty.items():
+            postings = self.read_shard(shard)
+            for term in terms:
+                kept = postings.get(term, [])
+                merged = [(kept[i], kept[i + 1]) for i in range(0, len(kept), 2) if kept[i] not in self.changes]
+                merged.extend(added.get(term, ()))
+                if merged:
+                    merged.sort()
+                    postings[term] = [value for posting in merged for value in posting]
+                else:
+                    postings.pop(term, None)
+            if postings:
+                write_json(postings, self.shard_path(shard))
+            elif os.path.exists(self.shard_path(shard)):
+                os.remove(self.shard_path(shard))
+
+        page_list = [None] * self.next_id
+        for page in current.values():
+            page_list[page["id"]] = [page["url"], page["title"]]
+        write_json(page_list, os.path.join(self.index_dir, "pages.json"))
+        write_json({"pages": self.pages, "free_ids": self.free_ids, "next_id": self.next_id}, self.state_path)
+        self.changes.clear()
+        self.seconds += time.perf_counter() - start
+
+    def size(self):
+        total = 0
+        for dirpath, _, filenames in os.walk(self.index_dir):
+            for filename in filenames:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+        return total
+
+    def report(self):
+        return {
+            "pages": len(self.pages),
+            "bytes": self.size(),
+            "seconds": self.seconds,
+        }
@@ -0,0 +1,180 @@
+import filecmp
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from assets import find_assets, copy_asset
+from build import build_site, load_manifest, save_manifest, remove_output, shard_of, MANIFEST_PATH
+from searchindex import SEARCH_DIR, PageDocument, SearchIndex, load_state
+
+SHARD_DIR = "shards"
+SHARD_NAME = re.compile(r"shard-(\d+)-of-(\d+)$")
+
+
+# "i/N" as given to --shard, numbered from 1
+def parse_shard(text):
+    match = re.fullmatch(r"(\d+)/(\d+)", text.strip())
+    if match is None:
+        raise ValueError(f"Shard must look like i/N, got {text!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index}/{count} out of range: i must be between 1 and N")
+    return index, count
+
+def shard_path(shard_dir, index, count):
+    return os.path.join(shard_dir, f"shard-{index}-of-{count}")
+
+# Builds the pages shard_of assigns to shard index of count into their own
+# directory under shard_dir, as one CI node would: the pages go to public/,
+# the partial manifest (the build manifest plus the shard and how long it
+# took) to manifest.json and, with search, the search state to search.json.
+# Kept between runs, the directory makes the shard's next build incremental.
+def build_shard(content_dir, shard_dir, index, count, template_path=None, search=False, **build_options):
+    root = shard_path(shard_dir, index, count)
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, "manifest.json")
+    start = time.perf_counter()
+    stats = build_site(content_dir, os.path.join(root, "public"), template_path, manifest_path,
+                       search_state_path=os.path.join(root, "search.json") if search else None,
+                       shard=(index, count), **build_options)
+    manifest = load_manifest(manifest_path)
+    manifest["shard"] = [index, count]
+    manifest["seconds"] = time.perf_counter() - start
+    save_manifest(manifest, manifest_path)
+    return stats
+
+def _build_shard_job(args):
+    content_dir, shard_dir, index, count, template_path, search, build_options = args
+    return build_shard(content_dir, shard_dir, index, count, template_path, search, **build_options)
+
+# Builds all count shards at once, one process each, standing in for count
+# CI nodes on one machine. shard_dir is this build's own, so shards left in
+# it by a build with a different count are removed rather than left to
+# fail the merge.
+def build_all_shards(content_dir, shard_dir, count, template_path=None, search=False, **build_options):
+    for (_, other_count), root in find_shards(shard_dir).items():
+        if other_count != count:
+            shutil.rmtree(root)
+    jobs = [(content_dir, shard_dir, index, count, template_path, search, build_options)
+            for index in range(1, count + 1)]
+    with ProcessPoolExecutor(count) as executor:
+        return list(executor.map(_build_shard_job, jobs))
+
+def find_shards(shard_dir):
+    shards = {}
+    if os.path.isdir(shard_dir):
+        for name in os.listdir(shard_dir):
+            match = SHARD_NAME.match(name)
+            if match is not None:
+                shards[int(match.group(1)), int(match.group(2))] = os.path.join(shard_dir, name)
+    return shards
+
+# The merged search index gets every shard's pages; a page whose entry is
+# the same as last merge's isn't touched, so unchanged shards of the index
+# aren't rewritten
+def merge_search(shard_roots, public_dir, search_state_path):
+    index = SearchIndex(public_dir, search_state_path)
+    merged = set()
+    for root in shard_roots:
+        for source, page in load_state(os.path.join(root, "search.json"))["pages"].items():
+            merged.add(source)
+            old = index.pages.get(source)
+            if old is not None and (old["url"], old["title"], old["terms"]) == (page["url"], page["title"], page["terms"]):
+                continue
+            document = PageDocument()
+            document.title = page["title"]
+            document.terms = Counter(page["terms"])
+            index.update(source, page["url"], document)
+    for source in list(index.pages):
+        if source not in merged:
+            index.remove(source)
+    index.write()
+    return index.report()
+
+# Combines the shards under shard_dir into one public_dir and one manifest,
+# from which later unsharded builds can carry on incrementally. Refuses
+# (with ValueError) to merge an incomplete set of shards, shards of
+# different builds, a page built by the wrong shard or two shards writing
+# different files to the same path. Each shard's own search index is
+# skipped; with search_state_path one index over all shards is written
+# instead. Pages a previous merge put in public_dir that no shard has any
+# more are deleted.
+def merge_shards(shard_dir, public_dir, manifest_path=MANIFEST_PATH, search_state_path=None,
+                 hardlink=False, workers=8):
+    shards = find_shards(shard_dir)
+    if not shards:
+        raise FileNotFoundError(f"No shards found in {shard_dir}")
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Shards of different builds in {shard_dir}: counts {sorted(counts)}")
+    count = counts.pop()
+    missing = [str(index) for index in range(1, count + 1) if (index, count) not in shards]
+    if missing:
+        raise ValueError(f"Missing shard(s) {', '.join(missing)} of {count} in {shard_dir}")
+
+    conflicts = []
+    pages = {}
+    builds = set()
+    stats = {"pages": 0, "copied": 0, "deleted": 0, "shards": {}}
+    roots = [shards[index, count] for index in range(1, count + 1)]
+    for index, root in enumerate(roots, 1):
+        manifest = load_manifest(os.path.join(root, "manifest.json"))
+        if manifest.get("shard") != [index, count]:
+            conflicts.append(f"{root}: manifest is not that of shard {index}/{count}")
+        builds.add((manifest["generator_version"], manifest["template_hash"]))
+        stats["shards"][index] = {"pages": len(manifest["pages"]), "seconds": manifest.get("seconds")}
+        for source, entry in manifest["pages"].items():
+            owner = shard_of(source, count)
+            if owner != index:
+                conflicts.append(f"{source}: built by shard {index} but belongs to shard {owner}")
+            elif source in pages:
+                conflicts.append(f"{source}: built by more than one shard")
+            pages[source] = entry
+    if len(builds) > 1:
+        conflicts.append("Shards were built with different generator versions or templates")
+
+    files = {}
+    search_prefix = SEARCH_DIR + os.sep
+    for root in roots:
+        for rel_path, src in find_assets(os.path.join(root, "public")).items():
+            if rel_path.startswith(search_prefix):
+                continue
+            other = files.get(rel_path)
+            if other is None:
+                files[rel_path] = src
+            elif not filecmp.cmp(other, src, shallow=False):
+                conflicts.append(f"{rel_path}: differs between {other} and {src}")
+    if conflicts:
+        raise ValueError("Cannot merge shards:\n  " + "\n  ".join(conflicts))
+
+    copies = []
+    for rel_path, src in files.items():
+        dest = os.path.join(public_dir, rel_path)
+        try:
+            src_st = os.stat(src)
+            dest_st = os.stat(dest)
+            if (src_st.st_size, src_st.st_mtime_ns) == (dest_st.st_size, dest_st.st_mtime_ns):
+                continue
+        except FileNotFoundError:
+            pass
+        copies.append((src, dest))
+    if copies:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(lambda job: copy_asset(*job, hardlink=hardlink), copies))
+    stats["copied"] = len(copies)
+
+    for source, old_entry in load_manifest(manifest_path)["pages"].items():
+        if source not in pages:
+            remove_output(public_dir, old_entry["output"])
+            stats["deleted"] += 1
+
+    generator_version, template_hash = builds.pop()
+    save_manifest({"generator_version": generator_version, "template_hash": template_hash, "pages": pages},
+                  manifest_path)
+    stats["pages"] = len(pages)
+    if search_state_path is not None:
+        stats["search"] = merge_search(roots, public_dir, search_state_path)
+    return stats
@@ -0,0 +1,161 @@
+import re
+from array import array
+
+from blocknode import BlockType
+from htmlnode import escape_text
+from textnode import TextType
+from utils import scan_inline, find_heading_level, heading_id, inline_tokens_html, BLOCK_TAGS
+
+# A parse that never copies the source. Blocks and inline tokens are
+# (start, end) offsets into one buffer, and text is only sliced out when
+# the HTML is written. Output matches markdown_to_html_node(...).to_html().
+
+_NON_SPACE = re.compile(r"\S")
+
+_HEADING_PREFIXES = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+
+
+# Tokens are stored packed, five machine ints per token, rather than as
+# tuples of int objects: (text type code, start, end, url start, url end)
+# with -1 for a missing url
+TEXT_TYPES = tuple(TextType)
+_TEXT_TYPE_CODES = {text_type: code for code, text_type in enumerate(TEXT_TYPES)}
+
+def pack_tokens(tokens):
+    packed = array("q")
+    for text_type, start, end, url_start, url_end in tokens:
+        if url_start is None:
+            url_start = url_end = -1
+        packed.extend((_TEXT_TYPE_CODES[text_type], start, end, url_start, url_end))
+    return packed
+
+def unpack_tokens(packed):
+    for i in range(0, len(packed), 5):
+        url_start = packed[i + 3]
+        yield (TEXT_TYPES[packed[i]], packed[i + 1], packed[i + 2],
+               None if url_start == -1 else url_start, None if url_start == -1 else packed[i + 4])
+
+
+# One block of the document. items holds the packed inline tokens of each
+# inline region (one per list item, one for everything else) as produced by
+# scan_inline over buffer. buffer is the source itself except for quotes,
+# whose lines are joined into a new string first.
+class SpanBlock():
+    __slots__ = ("block_type", "start", "end", "tag", "buffer", "items")
+
+    def __init__(self, block_type, start, end, tag, buffer, items):
+        self.block_type = block_type
+        self.start = start
+        self.end = end
+        self.tag = tag
+        self.buffer = buffer
+        self.items = items
+
+
+# Same blocks as markdown_to_blocks, as (start, end) offsets
+def block_spans(source):
+    position = 0
+    length = len(source)
+    while position <= length:
+        separator = source.find("\n\n", position)
+        if separator == -1:
+            separator = length
+        match = _NON_SPACE.search(source, position, separator)
+        if match is not None:
+            start = match.start()
+            end = separator
+            while source[end - 1].isspace():
+                end -= 1
+            yield start, end
+        position = separator + 2
+
+def line_spans(source, start, end):
+    lines = []
+    while True:
+        newline = source.find("\n", start, end)
+        if newline == -1:
+            lines.append((start, end))
+            return lines
+        lines.append((start, newline))
+        start = newline + 1
+
+# block_to_block_type without slicing the block out of the source
+def span_block_type(source, start, end):
+    if source.startswith(_HEADING_PREFIXES, start, end):
+        return BlockType.HEADING
+    if source.startswith("```", start, end) and source.endswith("```", start, end):
+        return BlockType.CODE
+    if source.startswith(">", start, end):
+        for line_start, line_end in line_spans(source, start, end):
+            if not source.startswith(">", line_start, line_end):
+                return BlockType.PARAGRAPH
+        return BlockType.QUOTE
+    if source.startswith("- ", start, end):
+        for line_start, line_end in line_spans(source, start, end):
+            if not source.startswith("- ", line_start, line_end):
+                return BlockType.PARAGRAPH
+        return BlockType.UO_LIST
+    if source.startswith("1. ", start, end):
+        for i, (line_start, line_end) in enumerate(line_spans(source, start, end), 1):
+            if not source.startswith(f"{i}. ", line_start, line_end):
+                return BlockType.PARAGRAPH
+        return BlockType.O_LIST
+    return BlockType.PARAGRAPH
+
+def parse_block(source, start, end):
+    block_type = span_block_type(source, start, end)
+    match block_type:
+        case BlockType.CODE:
+            code_start = start + 3
+            while code_start < end - 3 and source[code_start] == "\n":
+                code_start += 1
+            tokens = [(TextType.TEXT, code_start, max(code_start, end - 3), None, None)]
+            return SpanBlock(block_type, start, end, "pre", source, [pack_tokens(tokens)])
+        case BlockType.HEADING:
+            level = find_heading_level(source[start:start + 7])
+            return SpanBlock(block_type, start, end, f"h{level}", source,
+                             [pack_tokens(scan_inline(source, start + level + 1, end))])
+        case BlockType.QUOTE:
+            text = " ".join(source[line_start:line_end].lstrip(">").strip()
+                            for line_start, line_end in line_spans(source, start, end)
+                            if line_start != line_end)
+            return SpanBlock(block_type, start, end, BLOCK_TAGS[block_type], text, [pack_tokens(scan_inline(text))])
+        case BlockType.UO_LIST | BlockType.O_LIST:
+            prefix = 2 if block_type == BlockType.UO_LIST else 3
+            items = [pack_tokens(scan_inline(source, line_start + prefix, line_end))
+                     for line_start, line_end in line_spans(source, start, end)
+                     if line_start != line_end]
+            return SpanBlock(block_type, start, end, BLOCK_TAGS[block_type], source, items)
+        case _:
+            return SpanBlock(block_type, start, end, BLOCK_TAGS[block_type], source,
+                             [pack_tokens(scan_inline(source, start, end))])
+
+def parse_spans(source):
+    return [parse_block(source, start, end) for start, end in block_spans(source)]
+
+
+def iter_span_html(blocks):
+    yield "<div>"
+    for block in blocks:
+        if block.block_type == BlockType.CODE:
+            start, end = block.items[0][1:3]
+            yield f"<pre><code>{escape_text(block.buffer[start:end])}</code></pre>"
+        elif block.block_type in (BlockType.UO_LIST, BlockType.O_LIST):
+            yield f"<{block.tag}>"
+            for tokens in block.items:
+                yield f"<li>{inline_tokens_html(block.buffer, unpack_tokens(tokens))}</li>"
+            yield f"</{block.tag}>"
+        elif block.block_type == BlockType.HEADING:
+            content = inline_tokens_html(block.buffer, unpack_tokens(block.items[0]))
+            slug = heading_id(content)
+            if slug:
+                yield f"<{block.tag} id=\"{slug}\">{content}</{block.tag}>"
+            else:
+                yield f"<{block.tag}>{content}</{block.tag}>"
+        else:
+            newline_to_space = block.block_type == BlockType.PARAGRAPH
+            yield f"<{block.tag}>{inline_tokens_html(block.buffer, unpack_tokens(block.items[0]), newline_to_space)}</{block.tag}>"
+    yield "</div>"
+
+def markdown_to_html_spans(source):
+    return "".join(iter_span_html(parse_spans(source)))
@@ -0,0 +1,90 @@
+import random
+
+from blocknode import BlockType
+
+WORDS = (
+    "the static site generator turns markdown into html pages with lists quotes "
+    "code headings links images and plain paragraphs of text for docs blogs and "
+    "reference material that grows over time"
+).split()
+
+DEFAULT_MIX = {
+    BlockType.PARAGRAPH: 5,
+    BlockType.HEADING: 1,
+    BlockType.CODE: 1,
+    BlockType.QUOTE: 1,
+    BlockType.UO_LIST: 1,
+    BlockType.O_LIST: 1,
+}
+
+# Parses "p=5,hdg=1,ul=2" (BlockType values) into a mix dict
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, weight = item.split("=")
+        mix[BlockType(name.strip())] = float(weight)
+    return mix
+
+
+class MarkdownGenerator():
+    def __init__(self, seed=0, inline_density=0.1, links=1, images=0, words=30):
+        self.rng = random.Random(seed)
+        self.inline_density = inline_density
+        self.links = links
+        self.images = images
+        self.words = words
+
+    def inline_text(self, word_count, links=0, images=0):
+        rng = self.rng
+        parts = []
+        for _ in range(word_count):
+            word = rng.choice(WORDS)
+            if rng.random() < self.inline_density:
+                match rng.randrange(3):
+                    case 0:
+                        word = f"**{word}**"
+                    case 1:
+                        word = f"_{word}_"
+                    case 2:
+                        word = f"`{word}`"
+            parts.append(word)
+        for _ in range(links):
+            word = rng.choice(WORDS)
+            parts.insert(rng.randrange(len(parts) + 1), f"[{word}](/{word}/{rng.randrange(1000)}.html)")
+        for _ in range(images):
+            word = rng.choice(WORDS)
+            parts.insert(rng.randrange(len(parts) + 1), f"![{word}](/images/{word}{rng.randrange(100)}.png)")
+        return " ".join(parts)
+
+    def block(self, block_type):
+        rng = self.rng
+        match block_type:
+            case BlockType.PARAGRAPH:
+                lines = [self.inline_text(self.words // 3) for _ in range(2)]
+                lines.append(self.inline_text(self.words // 3, self.links, self.images))
+                return "\n".join(lines)
+            case BlockType.HEADING:
+                return "#" * rng.randint(1, 6) + " " + self.inline_text(rng.randint(2, 6))
+            case BlockType.CODE:
+                lines = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(rng.randint(2, 8))]
+                return "```\n" + "\n".join(lines) + "\n```"
+            case BlockType.QUOTE:
+                return "\n".join("> " + self.inline_text(8) for _ in range(rng.randint(1, 4)))
+            case BlockType.UO_LIST:
+                return "\n".join("- " + self.inline_text(6, self.links and 1) for _ in range(rng.randint(2, 6)))
+            case BlockType.O_LIST:
+                return "\n".join(f"{i}. " + self.inline_text(6) for i in range(1, rng.randint(2, 9) + 1))
+
+    def document(self, blocks, mix=None):
+        mix = mix or DEFAULT_MIX
+        block_types = list(mix)
+        weights = [mix[block_type] for block_type in block_types]
+        chosen = self.rng.choices(block_types, weights, k=blocks)
+        return "\n\n".join(self.block(block_type) for block_type in chosen) + "\n"
+
+
+# Deterministic markdown for benchmarks: the same arguments always give the
+# same document
+def synthetic_markdown(blocks=1000, mix=None, inline_density=0.1, links=1, images=0, words=30, seed=0):
+    generator = MarkdownGenerator(seed, inline_density, links, images, words)
+    return generator.document(blocks, mix)
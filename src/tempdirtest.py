@@ -0,0 +1,27 @@
+import os
+import tempfile
+import unittest
+
+
+# A test case with a temporary directory, self.tmp, removed after each test,
+# and helpers for the files the tests put in it
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    # Writes text (as UTF-8) or bytes to path, creating its directories
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def read_bytes(self, path):
+        with open(path, "rb") as f:
+            return f.read()
@@ -0,0 +1,60 @@
+import re
+
+from htmlnode import HTMLNode, write_html
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+# A page template compiled once into its literal segments plus the slots
+# where values go, e.g. "<title>{{ Title }}</title>" becomes
+# ["<title>", None, "</title>"] with slot (1, "Title"). Rendering a page
+# fills a copy of the segment list; the template text is never searched
+# again.
+class Template():
+    def __init__(self, text):
+        self.segments = []
+        self.slots = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.segments.append(text[position:match.start()])
+            self.slots.append((len(self.segments), match.group(1)))
+            self.segments.append(None)
+            position = match.end()
+        self.segments.append(text[position:])
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(f.read())
+
+    def names(self):
+        return {name for _, name in self.slots}
+
+    def fill(self, values):
+        chunks = self.segments.copy()
+        for index, name in self.slots:
+            chunks[index] = values[name]
+        return chunks
+
+    def render(self, values):
+        return "".join(self.fill(values))
+
+    # Writes the page to sink. Values may be strings, HTMLNode trees or
+    # iterables of string chunks; trees and iterables are streamed instead
+    # of being rendered to a string first.
+    def write(self, sink, values):
+        pending = []
+        for chunk in self.fill(values):
+            if isinstance(chunk, str):
+                pending.append(chunk)
+                continue
+            sink.writelines(pending)
+            pending.clear()
+            if isinstance(chunk, HTMLNode):
+                write_html(chunk, sink)
+            else:
+                sink.writelines(chunk)
+        sink.writelines(pending)
+
+
+DEFAULT_TEMPLATE = Template("<html><body>{{ Content }}</body></html>")
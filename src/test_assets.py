@@ -0,0 +1,73 @@
+import os
+import unittest
+
+import assets
+from tempdirtest import TempDirTestCase
+
+
+class TestSyncStatic(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "assets.json")
+        self.write(os.path.join(self.static, "styles.css"), b"body {}")
+        self.write(os.path.join(self.static, "images", "logo.png"), os.urandom(300000))
+
+    def sync(self, **options):
+        return assets.sync_static(self.static, self.public, self.manifest, **options)
+
+    def assert_mirrored(self):
+        for rel_path in ("styles.css", os.path.join("images", "logo.png")):
+            self.assertEqual(self.read_bytes(os.path.join(self.static, rel_path)),
+                             self.read_bytes(os.path.join(self.public, rel_path)))
+
+    def test_copies_then_skips(self):
+        self.assertEqual(self.sync(), {"copied": 2, "skipped": 0, "deleted": 0, "bytes_copied": 300007})
+        self.assert_mirrored()
+        self.assertEqual(self.sync(), {"copied": 0, "skipped": 2, "deleted": 0, "bytes_copied": 0})
+
+    def test_changed_file_copied(self):
+        self.sync()
+        self.write(os.path.join(self.static, "styles.css"), b"body { color: red; }")
+        self.assertEqual(self.sync()["copied"], 1)
+        self.assert_mirrored()
+
+    def test_touched_file_skipped_with_hash(self):
+        self.sync(use_hash=True)
+        path = os.path.join(self.static, "styles.css")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(self.sync(use_hash=True)["copied"], 0)
+
+    def test_orphans_deleted(self):
+        self.sync()
+        page = os.path.join(self.public, "index.html")
+        self.write(page, b"<p>page</p>")
+        os.remove(os.path.join(self.static, "images", "logo.png"))
+        self.assertEqual(self.sync()["deleted"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(page))
+
+    def test_hardlink(self):
+        self.sync(hardlink=True)
+        self.assert_mirrored()
+        src = os.stat(os.path.join(self.static, "styles.css"))
+        dest = os.stat(os.path.join(self.public, "styles.css"))
+        self.assertEqual(src.st_ino, dest.st_ino)
+
+    def test_asset_named_like_a_temp_file(self):
+        self.write(os.path.join(self.static, "styles.css.tmp"), b"kept")
+        self.sync()
+        self.write(os.path.join(self.static, "styles.css"), b"body { color: red; }")
+        self.sync()
+        self.assert_mirrored()
+        self.assertEqual(self.read_bytes(os.path.join(self.public, "styles.css.tmp")), b"kept")
+        self.assertEqual(sorted(os.listdir(self.public)), ["images", "styles.css", "styles.css.tmp"])
+
+    def test_missing_static_dir(self):
+        self.assertRaises(FileNotFoundError, assets.sync_static, os.path.join(self.tmp.name, "nope"), self.public)
+
+
+if __name__ == "__main__":
+    unittest.main()
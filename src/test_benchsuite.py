@@ -0,0 +1,36 @@
+import unittest
+
+import benchsuite
+import utils
+from blocknode import BlockType
+from synthetic import synthetic_markdown, parse_mix
+
+
+class TestSyntheticMarkdown(unittest.TestCase):
+    def test_deterministic(self):
+        self.assertEqual(synthetic_markdown(50, seed=7), synthetic_markdown(50, seed=7))
+        self.assertNotEqual(synthetic_markdown(50, seed=7), synthetic_markdown(50, seed=8))
+
+    def test_mix(self):
+        md = synthetic_markdown(30, mix=parse_mix("ul=1"))
+        block_types = {utils.block_to_block_type(block) for block in utils.markdown_to_blocks(md)}
+        self.assertEqual(block_types, {BlockType.UO_LIST})
+
+    def test_link_count(self):
+        md = synthetic_markdown(20, mix={BlockType.PARAGRAPH: 1}, links=3, images=2)
+        self.assertEqual(len(utils.extract_markdown_images(md)), 40)
+        self.assertEqual(md.count("]("), 100)
+
+
+class TestFindRegressions(unittest.TestCase):
+    def report(self, **best):
+        return {"stages": {stage: {"best": best.get(stage, 1.0)} for stage in benchsuite.STAGES}}
+
+    def test_flags_slower_stages(self):
+        baseline = self.report()
+        current = self.report(to_html=1.5, markdown_to_blocks=1.05)
+        self.assertEqual(benchsuite.find_regressions(baseline, current, 0.1), [("to_html", 0.5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import tempfile
+import unittest
+
+import build
+from template import Template
+
+
+class TestBuildSite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "manifest.json")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **home**")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nA post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def build(self):
+        return build.build_site(self.content, self.public, self.template, self.manifest)
+
+    def test_builds_pages(self):
+        self.assertEqual(self.build(), {"built": 2, "skipped": 0, "deleted": 0})
+        self.assertEqual(
+            self.read(os.path.join(self.public, "index.html")),
+            '<title>Home</title><div><h1 id="home">Home</h1><p>Welcome <b>home</b></p></div>',
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+
+    def test_noop_rebuild_skips(self):
+        self.build()
+        self.assertEqual(self.build(), {"built": 0, "skipped": 2, "deleted": 0})
+
+    def test_changed_source_rebuilds(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged text")
+        self.assertEqual(self.build(), {"built": 1, "skipped": 1, "deleted": 0})
+        self.assertIn("Changed text", self.read(os.path.join(self.public, "index.html")))
+
+    def test_touched_source_skips(self):
+        self.build()
+        source = os.path.join(self.content, "index.md")
+        st = os.stat(source)
+        os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(self.build(), {"built": 0, "skipped": 2, "deleted": 0})
+
+    def test_template_change_rebuilds_all(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(self.build(), {"built": 2, "skipped": 0, "deleted": 0})
+
+    def test_unknown_placeholder(self):
+        self.write(self.template, "{{ Title }}{{ Sidebar }}{{ Content }}")
+        self.assertRaises(ValueError, self.build)
+
+    def test_stale_output_deleted(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(), {"built": 0, "skipped": 1, "deleted": 1})
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+    def test_missing_output_rebuilds(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.assertEqual(self.build(), {"built": 1, "skipped": 1, "deleted": 0})
+
+    def test_mmap_matches_read(self):
+        self.write(os.path.join(self.content, "big.md"), "intro & more\n\n# Big <One>\n\n" + "- item\n- **x**\n\n" * 50)
+        self.build()
+        mapped_public = os.path.join(self.tmp.name, "mapped")
+        stats = build.build_site(self.content, mapped_public, self.template,
+                                 os.path.join(self.tmp.name, "mapped.json"), mmap_threshold=1)
+        self.assertEqual(stats["built"], 3)
+        for output in ("index.html", "big.html", os.path.join("blog", "post.html")):
+            self.assertEqual(self.read(os.path.join(self.public, output)),
+                             self.read(os.path.join(mapped_public, output)))
+
+        stats = build.build_site(self.content, mapped_public, self.template,
+                                 os.path.join(self.tmp.name, "mapped.json"), mmap_threshold=1)
+        self.assertEqual(stats["built"], 0)
+
+    def test_parallel_matches_serial(self):
+        for i in range(20):
+            self.write(os.path.join(self.content, "many", f"p{i}.md"), f"# Page {i}\n\n- **{i}**\n- [x](/p{i})")
+        self.build()
+        parallel_public = os.path.join(self.tmp.name, "parallel")
+        parallel_manifest = os.path.join(self.tmp.name, "parallel.json")
+        stats = build.build_site(self.content, parallel_public, self.template, parallel_manifest,
+                                 workers=2, chunksize=3)
+        self.assertEqual(stats, {"built": 22, "skipped": 0, "deleted": 0})
+
+        for dirpath, _, filenames in os.walk(self.public):
+            for filename in filenames:
+                serial_path = os.path.join(dirpath, filename)
+                parallel_path = os.path.join(parallel_public, os.path.relpath(serial_path, self.public))
+                with open(serial_path, "rb") as a, open(parallel_path, "rb") as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_io_threads_match_serial(self):
+        self.write(os.path.join(self.content, "big.md"), "# Big\n\n" + "text\n\n" * 20)
+        for i in range(20):
+            self.write(os.path.join(self.content, "many", f"p{i}.md"), f"# Page {i}\n\n- **{i}**")
+        self.build()
+        io_public = os.path.join(self.tmp.name, "io")
+        stats = build.build_site(self.content, io_public, self.template, os.path.join(self.tmp.name, "io.json"),
+                                 io_threads=3, mmap_threshold=100)
+        self.assertEqual(stats["built"], 23)
+        self.assertGreater(stats["io"]["io_time"], 0)
+
+        for dirpath, _, filenames in os.walk(self.public):
+            for filename in filenames:
+                serial_path = os.path.join(dirpath, filename)
+                io_path = os.path.join(io_public, os.path.relpath(serial_path, self.public))
+                with open(serial_path, "rb") as a, open(io_path, "rb") as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_serial_build_streams_pages(self):
+        # Without io the template writes straight into the output file
+        class StreamOnly(Template):
+            def render(self, values):
+                raise AssertionError("page rendered whole")
+
+        template = StreamOnly("<title>{{ Title }}</title>{{ Content }}")
+        dest_path = os.path.join(self.public, "index.html")
+        job = (os.path.join(self.content, "index.md"), dest_path, None, "index", False, "/")
+        self.assertTrue(build.process_page(job, template)[1])
+        self.assertEqual(self.read(dest_path),
+                         '<title>Home</title><div><h1 id="home">Home</h1><p>Welcome <b>home</b></p></div>')
+
+    def test_render_cache_reused_by_cold_build(self):
+        cache_path = os.path.join(self.tmp.name, "render.sqlite")
+        for i in range(6):
+            self.write(os.path.join(self.content, "many", f"p{i}.md"), f"# Page {i}\n\n- **{i}**")
+        stats = build.build_site(self.content, self.public, self.template, self.manifest,
+                                 render_cache_path=cache_path)
+        self.assertEqual(stats["render_cache"], {"hits": 0, "misses": 8, "evicted": 0})
+
+        # A fresh checkout: no output, no manifest, only the cache
+        cold_public = os.path.join(self.tmp.name, "cold")
+        stats = build.build_site(self.content, cold_public, self.template, os.path.join(self.tmp.name, "cold.json"),
+                                 render_cache_path=cache_path)
+        self.assertEqual(stats["render_cache"], {"hits": 8, "misses": 0, "evicted": 0})
+        self.assertEqual(self.read(os.path.join(cold_public, "index.html")),
+                         self.read(os.path.join(self.public, "index.html")))
+
+        parallel_public = os.path.join(self.tmp.name, "parallel")
+        self.write(os.path.join(self.content, "new.md"), "# New")
+        build.build_site(self.content, parallel_public, self.template, os.path.join(self.tmp.name, "p.json"),
+                         workers=2, render_cache_path=cache_path)
+        stats = build.build_site(self.content, os.path.join(self.tmp.name, "again"), self.template,
+                                 os.path.join(self.tmp.name, "again.json"), render_cache_path=cache_path)
+        self.assertEqual(stats["render_cache"]["hits"], 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
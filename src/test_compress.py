@@ -0,0 +1,66 @@
+import gzip
+import os
+import time
+import unittest
+
+import compress
+from tempdirtest import TempDirTestCase
+
+
+class TestCompressOutputs(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "compress.json")
+        self.page = os.path.join(self.public, "blog", "post.html")
+        self.write(self.page, b"<p>hello</p>" * 200)
+        self.write(os.path.join(self.public, "styles.css"), b"body { margin: 0 }\n" * 100)
+        self.write(os.path.join(self.public, "small.html"), b"<p>hi</p>")
+        self.write(os.path.join(self.public, "logo.png"), os.urandom(4000))
+
+    def compress(self, **options):
+        return compress.compress_outputs(self.public, self.manifest, min_size=100, **options)
+
+    def test_compresses_text_outputs(self):
+        stats = self.compress()
+        self.assertEqual(stats["compressed"], 2)
+        self.assertEqual(gzip.decompress(self.read_bytes(self.page + ".gz")), b"<p>hello</p>" * 200)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "styles.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "small.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "logo.png.gz")))
+        self.assertEqual(stats["bytes_in"], 2400 + 1900)
+        self.assertEqual(stats["bytes_saved"], stats["bytes_in"] - stats["bytes_out"])
+
+    def test_unchanged_skipped(self):
+        self.compress()
+        stats = self.compress()
+        self.assertEqual((stats["compressed"], stats["skipped"]), (0, 2))
+        self.assertGreater(stats["bytes_saved"], 0)
+
+    def test_rewritten_with_same_content_skipped(self):
+        self.compress()
+        time.sleep(0.01)
+        self.write(self.page, b"<p>hello</p>" * 200)
+        self.assertEqual(self.compress()["compressed"], 0)
+
+        self.write(self.page, b"<p>changed</p>" * 200)
+        self.assertEqual(self.compress()["compressed"], 1)
+        self.assertEqual(gzip.decompress(self.read_bytes(self.page + ".gz")), b"<p>changed</p>" * 200)
+
+    def test_removed_output_deletes_gz(self):
+        self.compress()
+        os.remove(self.page)
+        stats = self.compress()
+        self.assertEqual(stats["deleted"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+    def test_process_pool_matches_inline(self):
+        self.compress(workers=2)
+        pooled = self.read_bytes(self.page + ".gz")
+        os.remove(self.manifest)
+        self.compress(workers=1)
+        self.assertEqual(self.read_bytes(self.page + ".gz"), pooled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,22 +1,29 @@
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+import io
+
+from htmlnode import HTMLNode, LeafNode, ParentNode, RawNode, iter_html, write_html
 
 class TestHTMLNode(unittest.TestCase):
     def test_prop_string(self):
-        node = HTMLNode("p", "Some P text", props={"href":"somelink", "color":"someColor"})
+        node = HTMLNode("p", props={"href":"somelink", "color":"someColor"})
         prop_string = " href=\"somelink\" color=\"someColor\""
         self.assertEqual(node.props_to_html(), prop_string)
 
     def test_no_props_string(self):
-        node = HTMLNode("p", "some text without props")
+        node = HTMLNode("p")
         prop_string = ""
         self.assertEqual(node.props_to_html(), prop_string)
 
     def test_to_HTML_Error(self):
-        node = HTMLNode("a", "A Link, WOW", props={"href":"https://www.hellowworld.com"})
+        node = HTMLNode("a", props={"href":"https://www.hellowworld.com"})
         self.assertRaises(NotImplementedError, node.to_html)
 
+    def test_slots(self):
+        self.assertFalse(hasattr(LeafNode("b", "x"), "children"))
+        self.assertFalse(hasattr(ParentNode("p", []), "value"))
+        self.assertFalse(hasattr(RawNode("<p>x</p>"), "__dict__"))
+
 
 class TestLeafNode(unittest.TestCase):
     def test_leaf_to_html_p(self):
@@ -31,6 +38,22 @@ class TestLeafNode(unittest.TestCase):
         node = LeafNode("b", "BOLD TEXT")
         self.assertEqual(node.to_html(), "<b>BOLD TEXT</b>")
 
+    def test_leaf_escapes_value(self):
+        node = LeafNode("code", "if a < b && c > d")
+        self.assertEqual(node.to_html(), "<code>if a &lt; b &amp;&amp; c &gt; d</code>")
+        self.assertEqual(LeafNode(None, "<script>").to_html(), "&lt;script&gt;")
+
+    def test_leaf_escapes_props(self):
+        node = LeafNode("img", "", {"src": "/a.png?x=1&y=2", "alt": "say \"hi\""})
+        self.assertEqual(node.to_html(), "<img src=\"/a.png?x=1&amp;y=2\" alt=\"say &quot;hi&quot;\"></img>")
+
+    def test_props_string_cached(self):
+        node = LeafNode("a", "link", {"href": "/x"})
+        self.assertIs(node.props_to_html(), node.props_to_html())
+
+    def test_raw_node_not_escaped(self):
+        self.assertEqual(RawNode("<p>a &amp; b</p>").to_html(), "<p>a &amp; b</p>")
+
 
 class TestParentNode(unittest.TestCase):
     def test_to_html_with_children(self):
@@ -53,4 +76,30 @@ class TestParentNode(unittest.TestCase):
 
     def test_error_with_no_tag(self):
         parent_node = ParentNode(None, None)
-        self.assertRaises(ValueError, parent_node.to_html)
\ No newline at end of file
+        self.assertRaises(ValueError, parent_node.to_html)
+
+    def test_deeply_nested(self):
+        node = LeafNode("b", "deep")
+        for _ in range(10000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertTrue(html.endswith("</span></span>"))
+        self.assertEqual(html.count("<span>"), 10000)
+
+    def test_parent_props(self):
+        parent_node = ParentNode("div", [LeafNode(None, "text")], {"class": "box"})
+        self.assertEqual(parent_node.to_html(), "<div class=\"box\">text</div>")
+
+
+class TestWriteHTML(unittest.TestCase):
+    def test_write_matches_to_html(self):
+        children = [ParentNode("p", [LeafNode("b", f"item {i}"), LeafNode(None, " text")]) for i in range(100)]
+        node = ParentNode("div", children)
+        sink = io.StringIO()
+        write_html(node, sink, buffer_size=64)
+        self.assertEqual(sink.getvalue(), node.to_html())
+
+    def test_iter_html_chunks(self):
+        node = ParentNode("div", [LeafNode("b", "bold"), LeafNode(None, "text")])
+        self.assertListEqual(list(iter_html(node)), ["<div>", "<b>bold</b>", "text", "</div>"])
@@ -0,0 +1,159 @@
+import os
+import struct
+import unittest
+
+import build
+import utils
+from imagesize import read_image_size, scan_image_sizes
+from tempdirtest import TempDirTestCase
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x08\x06\0\0\0" + b"\0" * 64
+
+def gif(width, height):
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\0" * 64
+
+def jpeg(width, height, orientation=None):
+    data = b"\xff\xd8"
+    data += b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0"
+    if orientation is not None:
+        tiff = b"MM\0*" + struct.pack(">I", 8) + struct.pack(">H", 1) + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0)
+        exif = b"Exif\0\0" + tiff
+        data += b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    data += b"\xff\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\0"
+    return data + b"\xff\xda" + b"\0" * 64
+
+def webp(chunk, payload):
+    body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class TestReadImageSize(TempDirTestCase):
+    def size(self, data):
+        path = os.path.join(self.tmp.name, "image")
+        self.write(path, data)
+        return read_image_size(path)
+
+    def test_formats(self):
+        self.assertEqual(self.size(png(640, 480)), (640, 480))
+        self.assertEqual(self.size(gif(32, 16)), (32, 16))
+        self.assertEqual(self.size(jpeg(400, 300)), (400, 300))
+        self.assertEqual(self.size(webp(b"VP8 ", b"\0\0\0\x9d\x01\x2a" + struct.pack("<HH", 150, 100) + b"\0" * 8)),
+                         (150, 100))
+        bits = (150 - 1) | (100 - 1) << 14
+        self.assertEqual(self.size(webp(b"VP8L", b"\x2f" + struct.pack("<I", bits) + b"\0" * 8)), (150, 100))
+        self.assertEqual(self.size(webp(b"VP8X", b"\0" * 4 + (1999).to_bytes(3, "little")
+                                        + (999).to_bytes(3, "little") + b"\0" * 8)), (2000, 1000))
+
+    def test_rotated_jpeg(self):
+        self.assertEqual(self.size(jpeg(400, 300, orientation=1)), (400, 300))
+        self.assertEqual(self.size(jpeg(400, 300, orientation=6)), (300, 400))
+
+    def test_not_an_image(self):
+        self.assertIsNone(self.size(b"<svg></svg>"))
+        self.assertIsNone(self.size(b"\xff\xd8\xff\xe0\0"))
+        self.assertIsNone(self.size(b""))
+        self.assertIsNone(read_image_size(os.path.join(self.tmp.name, "missing.png")))
+
+
+class TestImageSizes(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.cache = os.path.join(self.tmp.name, "cache.json")
+        self.write(os.path.join(self.static, "images", "a.png"), png(10, 20))
+        self.write(os.path.join(self.static, "b.gif"), gif(3, 4))
+        self.write(os.path.join(self.static, "broken.jpg"), b"nope")
+        self.write(os.path.join(self.static, "styles.css"), b"body {}")
+
+    def tearDown(self):
+        utils.set_image_sizes(None)
+
+    def test_cached_by_mtime_and_size(self):
+        sizes, stats = scan_image_sizes(self.static, self.cache)
+        self.assertEqual(sizes, {"/images/a.png": (10, 20), "/b.gif": (3, 4)})
+        self.assertEqual((stats["images"], stats["read"]), (3, 3))
+
+        sizes, stats = scan_image_sizes(self.static, self.cache)
+        self.assertEqual(sizes, {"/images/a.png": (10, 20), "/b.gif": (3, 4)})
+        self.assertEqual(stats["read"], 0)
+
+        self.write(os.path.join(self.static, "b.gif"), gif(30, 40) + b"!")
+        sizes, stats = scan_image_sizes(self.static, self.cache)
+        self.assertEqual(sizes["/b.gif"], (30, 40))
+        self.assertEqual(stats["read"], 1)
+
+    def test_sizes_in_html(self):
+        utils.set_image_sizes({"/images/a.png": (10, 20)})
+        md = "![a](/images/a.png) and ![b](/images/b.png)"
+        html = ('<div><p><img src="/images/a.png" alt="a" width="10" height="20"></img> and '
+                '<img src="/images/b.png" alt="b"></img></p></div>')
+        self.assertEqual(utils.markdown_to_html(md), html)
+        self.assertEqual(utils.markdown_to_html_node(md).to_html(), html)
+
+    def test_build_rebuilds_pages_whose_sizes_change(self):
+        content = os.path.join(self.tmp.name, "content")
+        public = os.path.join(self.tmp.name, "public")
+        manifest = os.path.join(self.tmp.name, "manifest.json")
+        render_cache = os.path.join(self.tmp.name, "render.sqlite")
+        self.write(os.path.join(content, "index.md"), b"![a](/images/a.png)")
+        self.write(os.path.join(content, "gif.md"), b"![b](/b.gif) ![c](/c.png)")
+        self.write(os.path.join(content, "other.md"), b"text")
+
+        def build_with_sizes(**options):
+            sizes, _ = scan_image_sizes(self.static, self.cache)
+            return build.build_site(content, public, manifest_path=manifest, image_sizes=sizes,
+                                    render_cache_path=render_cache, **options)["built"]
+
+        self.assertEqual(build_with_sizes(), 3)
+        self.assertIn('width="10" height="20"', self.read(os.path.join(public, "index.html")))
+        self.assertEqual(build.load_manifest(manifest)["pages"]["gif.md"]["images"],
+                         {"/b.gif": [3, 4], "/c.png": None})
+        self.assertEqual(build_with_sizes(), 0)
+
+        # Only the pages showing a resized or newly added image are rebuilt
+        self.write(os.path.join(self.static, "images", "a.png"), png(11, 20))
+        self.assertEqual(build_with_sizes(workers=2), 1)
+        self.assertIn('width="11" height="20"', self.read(os.path.join(public, "index.html")))
+        self.write(os.path.join(self.static, "c.png"), png(5, 6))
+        self.assertEqual(build_with_sizes(), 1)
+
+        # The render cache doesn't hand back a page with the old sizes
+        os.remove(manifest)
+        self.write(os.path.join(self.static, "images", "a.png"), png(12, 20))
+        self.assertEqual(build_with_sizes(), 3)
+        self.assertIn('width="12" height="20"', self.read(os.path.join(public, "index.html")))
+
+    def test_relative_srcs_sized_per_page(self):
+        content = os.path.join(self.tmp.name, "content")
+        public = os.path.join(self.tmp.name, "public")
+        manifest = os.path.join(self.tmp.name, "manifest.json")
+        self.write(os.path.join(self.static, "blog", "c.png"), png(7, 8))
+        # The same block on pages in two directories
+        self.write(os.path.join(content, "index.md"), b"![a](images/a.png) ![c](c.png)")
+        self.write(os.path.join(content, "blog", "post.md"), b"![a](images/a.png) ![c](c.png)")
+        self.write(os.path.join(content, "blog", "big.md"), b"![up](../images/a.png)")
+        sizes, _ = scan_image_sizes(self.static, self.cache)
+        build.build_site(content, public, manifest_path=manifest, image_sizes=sizes, mmap_threshold=23)
+
+        def read(output):
+            return self.read(os.path.join(public, output))
+        self.assertIn('<img src="images/a.png" alt="a" width="10" height="20"></img> <img src="c.png" alt="c"></img>',
+                      read("index.html"))
+        self.assertIn('<img src="images/a.png" alt="a"></img> <img src="c.png" alt="c" width="7" height="8"></img>',
+                      read(os.path.join("blog", "post.html")))
+        self.assertIn('<img src="../images/a.png" alt="up" width="10" height="20"></img>',
+                      read(os.path.join("blog", "big.html")))
+        pages = build.load_manifest(manifest)["pages"]
+        self.assertEqual(pages[os.path.join("blog", "big.md")]["images"], {"/images/a.png": [10, 20]})
+
+        self.write(os.path.join(self.static, "blog", "c.png"), png(9, 8))
+        sizes, _ = scan_image_sizes(self.static, self.cache)
+        stats = build.build_site(content, public, manifest_path=manifest, image_sizes=sizes)
+        self.assertEqual(stats["built"], 1)
+        self.assertIn('width="9" height="8"', read(os.path.join("blog", "post.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import random
+import unittest
+
+import utils
+from incremental import IncrementalDocument
+
+
+class TestIncrementalDocument(unittest.TestCase):
+    def assertMatchesFullParse(self, doc):
+        self.assertEqual(doc.to_html(), utils.markdown_to_html_node(doc.text).to_html())
+        self.assertEqual(doc.to_html_node().to_html(), doc.to_html())
+        self.assertEqual(doc.blocks(), utils.markdown_to_blocks(doc.text))
+        text = doc.text
+        for index, raw in enumerate(doc.raw):
+            start = doc.segment_start(index)
+            self.assertEqual(text[start:start + len(raw)], raw)
+
+    def test_initial_parse(self):
+        doc = IncrementalDocument("# Title\n\nSome **bold**\n\n\n\n- a\n- b")
+        self.assertEqual(doc.parsed, 3)
+        self.assertMatchesFullParse(doc)
+        self.assertEqual(IncrementalDocument().to_html(), "<div></div>")
+
+    def test_edit_reparses_only_its_block(self):
+        md = "\n\n".join(f"Paragraph {i} with _text_" for i in range(100))
+        doc = IncrementalDocument(md)
+        tree = doc.to_html_node()
+        offset = md.index("Paragraph 50") + len("Paragraph 50")
+        self.assertEqual(doc.apply_edit(offset, 0, "!"), (50, 1, ["<p>Paragraph 50! with <i>text</i></p>"]))
+        self.assertEqual(doc.parsed, 1)
+        self.assertMatchesFullParse(doc)
+        # Untouched blocks keep their subtrees
+        new_tree = doc.to_html_node()
+        self.assertIs(new_tree.children[49], tree.children[49])
+        self.assertIs(new_tree.children[51], tree.children[51])
+        self.assertIsNot(new_tree.children[50], tree.children[50])
+
+    def test_split_and_join_blocks(self):
+        doc = IncrementalDocument("# Title\n\nfirst line\nsecond line\n\nlast")
+        offset = doc.text.index("\nsecond")
+        self.assertEqual(doc.apply_edit(offset, 0, "\n"), (1, 1, ["<p>first line</p>", "<p>second line</p>"]))
+        self.assertEqual(doc.parsed, 2)
+        self.assertMatchesFullParse(doc)
+
+        self.assertEqual(doc.apply_edit(offset, 1, ""), (1, 2, ["<p>first line second line</p>"]))
+        self.assertMatchesFullParse(doc)
+
+        # Joining the title to the paragraph leaves "last" alone
+        doc.apply_edit(doc.text.index("\n\nfirst"), 2, " ")
+        self.assertEqual(doc.reused, 0)
+        self.assertEqual(doc.blocks(), ["# Title first line\nsecond line", "last"])
+        self.assertMatchesFullParse(doc)
+
+    def test_edit_inside_separator_run(self):
+        doc = IncrementalDocument("a\n\n\n\nb\n\nc")
+        doc.apply_edit(3, 1, "")
+        self.assertMatchesFullParse(doc)
+        doc.apply_edit(2, 0, "x")
+        self.assertMatchesFullParse(doc)
+
+    def test_code_fence_spanning_blocks(self):
+        doc = IncrementalDocument("```\ncode\n\nmore\n```\n\ntext")
+        self.assertMatchesFullParse(doc)
+        doc.apply_edit(doc.text.index("\n\nmore"), 2, "\n")
+        self.assertEqual(doc.blocks()[0], "```\ncode\nmore\n```")
+        self.assertMatchesFullParse(doc)
+
+    def test_out_of_range_edit(self):
+        doc = IncrementalDocument("abc")
+        with self.assertRaises(ValueError):
+            doc.apply_edit(2, 2, "")
+        with self.assertRaises(ValueError):
+            doc.apply_edit(-1, 0, "x")
+
+    def test_random_edits(self):
+        pieces = ["\n", "\n\n", "\n\n\n", "# h", "- a\n- b", "1. x", "**b**", "`c`", "```\ncode\n```",
+                  "> q", "text ", "[l](u)", " "]
+        rng = random.Random(7)
+        for _ in range(300):
+            doc = IncrementalDocument("".join(rng.choice(pieces) for _ in range(rng.randint(0, 12))))
+            for _ in range(5):
+                offset = rng.randint(0, len(doc.text))
+                removed = rng.randint(0, len(doc.text) - offset) if rng.random() < 0.5 else 0
+                before = [segment[2] for segment in doc.segments if segment is not None]
+                first, count, htmls = doc.apply_edit(
+                    offset, removed, "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3))))
+                self.assertMatchesFullParse(doc)
+                after = [segment[2] for segment in doc.segments if segment is not None]
+                self.assertEqual(before[:first] + htmls + before[first + count:], after)
+
+
+if __name__ == "__main__":
+    unittest.main()
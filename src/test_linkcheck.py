@@ -0,0 +1,105 @@
+import os
+import unittest
+
+import build
+import utils
+from linkcheck import PageLinks, check_links, link_problem
+from tempdirtest import TempDirTestCase
+
+
+def page_links(markdown, source=None):
+    links = PageLinks(markdown if source is None else source)
+    links.add_html(utils.markdown_to_html(markdown))
+    return links
+
+
+class TestPageLinks(unittest.TestCase):
+    def test_links_with_lines(self):
+        md = ("# Title\n\nSee [one](/one)\nand ![pic](img.png)\n\n\n\n"
+              "```\n[not](/code)\n```\n\n**[bold](/not-a-link)** `[code](/x)`\n\n"
+              "- item\n- [two](two.html?a=1&b=2)\n\n> quote\n> [three](#three)")
+        links = page_links(md)
+        self.assertEqual(links.links, [["/one", 3], ["img.png", 4], ["two.html?a=1&b=2", 15], ["#three", 18]])
+
+    def test_repeated_url(self):
+        md = "# T\n\n[a](/x)\n\n\n\n[b](/x) and [c](/x)"
+        self.assertEqual(page_links(md).links, [["/x", 3], ["/x", 7], ["/x", 7]])
+        self.assertEqual(page_links(md, md.encode("utf-8")).links, [["/x", 3], ["/x", 7], ["/x", 7]])
+
+    def test_mapped_source(self):
+        md = "# Ünïcode\n\n\n\ntext\n\n[link](/l)"
+        self.assertEqual(page_links(md, md.encode("utf-8")).links, [["/l", 7]])
+
+    def test_anchors(self):
+        links = page_links("# Hello, **World** & co!\n\n## [Linked](/x) title\n\n## Again\n\n## Again")
+        self.assertEqual(links.anchors, ["hello-world--co", "linked-title", "again", "again"])
+
+
+class TestLinkProblem(unittest.TestCase):
+    outputs = {"index.html", "blog/index.html", "blog/post.html", "styles.css", "docs/a b.html"}
+    anchors = {"index.html": {"home"}, "blog/post.html": {"intro"}}
+
+    def problem(self, url, output="blog/post.html"):
+        return link_problem(url, output, self.outputs, self.anchors)
+
+    def test_resolves(self):
+        for url in ("/", "/index.html", "../index.html", "/blog/", "/blog", "post", "./post.html",
+                    "/styles.css", "/blog/post.html#intro", "#intro", "../index.html#home",
+                    "/docs/a%20b", "?page=2", "/styles.css#anything"):
+            self.assertIsNone(self.problem(url), url)
+
+    def test_broken(self):
+        self.assertEqual(self.problem("/nope"), "no such page or file")
+        self.assertEqual(self.problem("missing.html"), "no such page or file")
+        self.assertEqual(self.problem("../../up"), "points outside the site")
+        self.assertEqual(self.problem("#outro"), "no heading #outro on blog/post.html")
+
+
+class TestCheckLinks(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "manifest.json")
+        self.write(os.path.join(self.content, "index.md"),
+                   "# Home\n\n[post](blog/post) [gone](/gone.html) [ext](https://example.com/x)")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n## Intro\n\n[back](../#home)\n\n[self](#intro)")
+
+    def build(self, **options):
+        stats = build.build_site(self.content, self.public, manifest_path=self.manifest, collect_links=True,
+                                 **options)
+        return stats, check_links(self.public, build.load_manifest(self.manifest)["pages"])
+
+    def test_reports_broken_links(self):
+        stats, report = self.build()
+        self.assertEqual(stats["links"]["collected"], 5)
+        self.assertEqual(report["links"], 5)
+        self.assertEqual(report["broken"], [("index.md", 3, "/gone.html", "no such page or file")])
+        self.assertIn('<h2 id="intro">Intro</h2>', self.read(os.path.join(self.public, "blog", "post.html")))
+
+    def test_skipped_pages_keep_their_links(self):
+        self.build()
+        os.utime(os.path.join(self.content, "index.md"))
+        self.write(os.path.join(self.content, "gone.md"), "# Gone")
+        stats, report = self.build()
+        self.assertEqual(stats["built"], 1)
+        self.assertEqual(report["links"], 5)
+        self.assertEqual(report["broken"], [])
+
+    def test_pages_built_without_links_are_rebuilt(self):
+        build.build_site(self.content, self.public, manifest_path=self.manifest)
+        stats, report = self.build()
+        self.assertEqual(stats["built"], 2)
+        self.assertEqual(len(report["broken"]), 1)
+
+    def test_parallel_and_mapped_builds_collect_the_same(self):
+        _, serial = self.build()
+        for options in ({"workers": 2}, {"mmap_threshold": 1}):
+            os.remove(self.manifest)
+            _, report = self.build(**options)
+            self.assertEqual(report["broken"], serial["broken"], options)
+            self.assertEqual(report["links"], serial["links"], options)
+
+
+if __name__ == "__main__":
+    unittest.main()
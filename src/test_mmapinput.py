@@ -0,0 +1,54 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+import mmapinput
+import utils
+
+
+class TestMappedBlocks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def mapped(self, text):
+        path = os.path.join(self.tmp.name, "doc.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return mmapinput.open_mapped(path)
+
+    def test_matches_markdown_to_blocks(self):
+        md = "\n\n# Título\n\n\n\npara ünïcode\nline two \n \n- a\n- b\n\n\n"
+        mapped = self.mapped(md)
+        try:
+            self.assertEqual(list(mmapinput.iter_mapped_blocks(mapped)), utils.markdown_to_blocks(md))
+        finally:
+            mapped.close()
+
+    def test_title_and_hash(self):
+        md = "intro\n\n# The Title \n\ntext"
+        mapped = self.mapped(md)
+        try:
+            self.assertEqual(mmapinput.mapped_title(mapped), utils.extract_title(md))
+            self.assertEqual(mmapinput.hash_mapped(mapped), hashlib.sha256(md.encode()).hexdigest())
+        finally:
+            mapped.close()
+
+    def test_empty_file(self):
+        self.assertIsNone(self.mapped(""))
+
+    def test_blocks_html_matches_tree(self):
+        md = "# T\n\nsome **b** & <c>\n\n```\ncode\n```"
+        mapped = self.mapped(md)
+        try:
+            html = "".join(utils.iter_blocks_html(mmapinput.iter_mapped_blocks(mapped)))
+        finally:
+            mapped.close()
+        self.assertEqual(html, utils.markdown_to_html_node(md).to_html())
+
+
+if __name__ == "__main__":
+    unittest.main()
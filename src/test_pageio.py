@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from pageio import PageIO
+
+
+class TestPageIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_reads_in_order(self):
+        for i in range(10):
+            with open(self.path(f"{i}.md"), "wb") as f:
+                f.write(str(i).encode())
+        paths = [self.path(f"{i}.md") for i in range(10)]
+        paths.insert(3, None)
+        with PageIO(threads=3, read_ahead=2) as io:
+            contents = list(io.read_all(paths))
+        self.assertEqual(contents, [b"0", b"1", b"2", None] + [str(i).encode() for i in range(3, 10)])
+
+    def test_writes_behind(self):
+        with PageIO(threads=2, write_behind=1) as io:
+            for i in range(5):
+                io.write(self.path(os.path.join("out", f"{i}.html")), f"page {i}".encode())
+        for i in range(5):
+            with open(self.path(os.path.join("out", f"{i}.html")), "rb") as f:
+                self.assertEqual(f.read(), f"page {i}".encode())
+        self.assertGreater(io.report()["io_time"], 0)
+
+    def test_write_error_raised_on_close(self):
+        with open(self.path("file"), "w"):
+            pass
+        with self.assertRaises(OSError):
+            with PageIO(threads=2) as io:
+                io.write(self.path(os.path.join("file", "page.html")), b"x")
+
+    def test_read_error(self):
+        with PageIO() as io:
+            with self.assertRaises(FileNotFoundError):
+                list(io.read_all([self.path("missing.md")]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import build
+import profiling
+import utils
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+
+    def test_disable_restores_functions(self):
+        original = utils.block_to_block_type
+        profiling.enable()
+        self.assertIsNot(utils.block_to_block_type, original)
+        profiling.disable()
+        self.assertIs(utils.block_to_block_type, original)
+        self.assertIsNone(profiling.active)
+
+    def test_counts_nodes(self):
+        profile = profiling.enable()
+        utils.markdown_to_html_node("# Title\n\nSome **bold** and [a](/b)\n\n- one\n- two")
+        self.assertEqual(profile.block_types, {"HEADING": 1, "PARAGRAPH": 1, "UO_LIST": 1})
+        self.assertEqual(profile.text_types, {"TEXT": 5, "BOLD": 1, "LINK": 1})
+        self.assertGreater(profile.stage_times["inline"], 0)
+
+    def test_profiles_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(content)
+            for name in ("a", "b", "c"):
+                with open(os.path.join(content, f"{name}.md"), "w", encoding="utf-8") as f:
+                    f.write(f"# {name}\n\ntext")
+            profile = profiling.enable()
+            build.build_site(content, os.path.join(tmp, "public"), manifest_path=os.path.join(tmp, "m.json"))
+
+            report = profile.to_dict(slowest=2)
+            self.assertEqual(report["pages"], 3)
+            self.assertEqual(len(report["slowest_pages"]), 2)
+            self.assertEqual(report["bytes_in"], 3 * len("# a\n\ntext"))
+            self.assertGreater(report["bytes_out"], 0)
+            self.assertIn("write", report["stage_times"])
+            # Every pipeline stage runs in a build; none is left empty
+            for stage in profiling.PIPELINE_STAGES.values():
+                self.assertGreater(report["stage_times"][stage], 0, stage)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from rendercache import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_put(self):
+        cache = RenderCache(self.path, "1")
+        self.assertIsNone(cache.get("abc"))
+        cache.put("abc", "<p>é</p>")
+        self.assertEqual(cache.get("abc"), "<p>é</p>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_shared_between_connections(self):
+        writer = RenderCache(self.path, "1")
+        reader = RenderCache(self.path, "1")
+        writer.put("abc", "<p>x</p>")
+        self.assertIsNone(reader.get("abc"))
+        writer.flush()
+        self.assertEqual(reader.get("abc"), "<p>x</p>")
+        writer.close()
+        reader.close()
+
+    def test_version_isolates_entries(self):
+        old = RenderCache(self.path, "1")
+        old.put("abc", "<p>old</p>")
+        old.close()
+        new = RenderCache(self.path, "2")
+        self.assertIsNone(new.get("abc"))
+        new.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(self.path, "1", max_bytes=250)
+        for name in ("a", "b", "c"):
+            cache.put(name, "x" * 100)
+        cache.get("a")
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.total_size(), 200)
+        self.assertEqual(cache.evict(), 0)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
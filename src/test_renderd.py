@@ -0,0 +1,121 @@
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import unittest
+
+import renderd
+import utils
+from renderclient import RenderClient, parse_args, recv_message
+from template import Template
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = renderd.LatencyHistogram()
+        for ms in (0.2, 0.7, 3, 3, 2000):
+            histogram.record(ms / 1000)
+        stats = histogram.to_dict()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["buckets"]["<=0.5ms"], 1)
+        self.assertEqual(stats["buckets"]["<=4ms"], 2)
+        self.assertEqual(stats["buckets"][">1024ms"], 1)
+        self.assertEqual(stats["p50_ms"], 4)
+        self.assertAlmostEqual(stats["max_ms"], 2000)
+
+
+class TestParseArgs(unittest.TestCase):
+    def test_parse(self):
+        args = parse_args(["--page", "a.md", "--socket", "s.sock", "b.md"])
+        self.assertEqual(args.files, ["a.md", "b.md"])
+        self.assertEqual(args.socket, "s.sock")
+        self.assertTrue(args.page)
+        self.assertFalse(args.stats)
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            parse_args(["--path"])
+
+
+class TestRenderServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "render.sock")
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.tmp.cleanup()
+
+    def serve(self, **options):
+        server = renderd.serve(self.socket_path, **options)
+        self.servers.append(server)
+        return server
+
+    def test_renders(self):
+        self.serve(template=Template("<title>{{ Title }}</title>{{ Content }}"))
+        md = "# Hello <you>\n\nSome **bold** text"
+        page_path = os.path.join(self.tmp.name, "about.md")
+        with open(page_path, "w", encoding="utf-8") as f:
+            f.write("no title here")
+        with RenderClient(self.socket_path) as client:
+            self.assertEqual(client.render(md), utils.markdown_to_html(md))
+            self.assertEqual(client.render(md, page=True),
+                             "<title>Hello &lt;you&gt;</title>" + utils.markdown_to_html(md))
+            self.assertEqual(client.render(path=page_path, page=True), "<title>about</title><div><p>no title here</p></div>")
+            with self.assertRaises(RuntimeError):
+                client.render(path=os.path.join(self.tmp.name, "missing.md"))
+            stats = client.stats()
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(sum(stats["buckets"].values()), 4)
+
+    def test_malformed_requests(self):
+        self.serve()
+        with RenderClient(self.socket_path) as client:
+            for request in (["markdown"], "markdown", {"markdown": 3}, {"path": ["a.md"]}):
+                self.assertIn("error", client.exchange(request))
+            self.assertEqual(client.render("hi"), "<div><p>hi</p></div>")
+
+    def test_busy_when_queue_full(self):
+        server = self.serve(threads=1, queue_size=1)
+        # The only thread is busy with this connection...
+        first = RenderClient(self.socket_path)
+        self.assertEqual(first.render("a"), "<div><p>a</p></div>")
+        # ...so this one waits in the queue...
+        second = RenderClient(self.socket_path)
+        # ...and this one is turned away
+        third = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        third.connect(self.socket_path)
+        self.assertIn("busy", recv_message(third)["error"])
+        third.close()
+        self.assertEqual(server.rejected, 1)
+
+        first.close()
+        self.assertEqual(second.render("b"), "<div><p>b</p></div>")
+        second.close()
+
+    def test_idle_connections_closed(self):
+        self.serve(threads=1, idle_timeout=0.1)
+        idle = RenderClient(self.socket_path)
+        self.assertEqual(idle.render("a"), "<div><p>a</p></div>")
+        # The only thread is freed once the first client goes quiet
+        with RenderClient(self.socket_path, timeout=5) as client:
+            self.assertEqual(client.render("b"), "<div><p>b</p></div>")
+        # and the first client reconnects on its next request
+        self.assertEqual(idle.render("c"), "<div><p>c</p></div>")
+        idle.close()
+
+    def test_stale_socket_replaced(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+        self.serve()
+        with RenderClient(self.socket_path) as client:
+            self.assertEqual(client.render("x"), "<div><p>x</p></div>")
+        with self.assertRaises(ValueError):
+            renderd.RenderServer(self.socket_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import unittest
+
+import build
+from searchindex import PageDocument, SearchIndex, shard_for, HEADING_WEIGHT
+
+
+def document(title, markdown):
+    page = PageDocument()
+    page.title = title
+    page.add_blocks(markdown.split("\n\n"))
+    return page
+
+
+class TestPageDocument(unittest.TestCase):
+    def test_terms(self):
+        page = document("t", "# Big Title\n\nSome **bold** [link text](/x) and ![alt words](/i.png)\n\n```\nskipped code\n```")
+        self.assertEqual(page.terms["big"], HEADING_WEIGHT)
+        self.assertEqual(page.terms["bold"], 1)
+        self.assertEqual(page.terms["link"], 1)
+        self.assertEqual(page.terms["alt"], 1)
+        self.assertNotIn("skipped", page.terms)
+        self.assertNotIn("x", page.terms)
+
+    def test_lower_headings_weigh_less(self):
+        page = document("t", "## two\n\n#### four")
+        self.assertEqual(page.terms["two"], HEADING_WEIGHT - 1)
+        self.assertEqual(page.terms["four"], 1)
+
+    def test_observe_passes_blocks_through(self):
+        page = PageDocument()
+        self.assertEqual(list(page.observe(["one", "two"])), ["one", "two"])
+        self.assertEqual(set(page.terms), {"one", "two"})
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.state = os.path.join(self.tmp.name, "search.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, name):
+        with open(os.path.join(self.public, "search", name), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_incremental_updates(self):
+        index = SearchIndex(self.public, self.state)
+        index.update("a.md", "/a.html", document("A", "apple banana"))
+        index.update("b.md", "/b.html", document("B", "banana cherry"))
+        index.write()
+        self.assertEqual(self.read("pages.json"), [["/a.html", "A"], ["/b.html", "B"]])
+        self.assertEqual(self.read("b.json")["banana"], [0, 1, 1, 1])
+        self.assertEqual(self.read("a.json"), {"apple": [0, 1]})
+
+        cherry_mtime = os.path.getmtime(os.path.join(self.public, "search", "c.json"))
+        index = SearchIndex(self.public, self.state)
+        index.update("a.md", "/a.html", document("A", "banana banana"))
+        index.write()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "search", "a.json")))
+        self.assertEqual(self.read("b.json")["banana"], [0, 2, 1, 1])
+        self.assertEqual(os.path.getmtime(os.path.join(self.public, "search", "c.json")), cherry_mtime)
+
+        index = SearchIndex(self.public, self.state)
+        index.remove("b.md")
+        index.update("d.md", "/d.html", document("D", "date"))
+        index.write()
+        self.assertEqual(self.read("pages.json"), [["/a.html", "A"], ["/d.html", "D"]])
+        self.assertEqual(self.read("b.json")["banana"], [0, 2])
+        self.assertEqual(self.read("d.json")["date"], [1, 1])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "search", "c.json")))
+
+    def test_missing_state_replaces_index(self):
+        os.makedirs(os.path.join(self.public, "search"))
+        with open(os.path.join(self.public, "search", "z.json"), "w") as f:
+            f.write('{"zebra": [7, 1]}')
+        index = SearchIndex(self.public, self.state)
+        index.update("a.md", "/a.html", document("A", "apple"))
+        index.write()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.public, "search"))), ["a.json", "pages.json"])
+
+    def test_shard_for(self):
+        self.assertEqual(shard_for("apple"), "a")
+        self.assertEqual(shard_for("9lives"), "9")
+        self.assertEqual(shard_for("émigré"), "_")
+
+
+class TestBuildIndex(unittest.TestCase):
+    def test_build_updates_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            public = os.path.join(tmp, "public")
+            os.makedirs(os.path.join(content, "blog"))
+            for name, text in (("index.md", "# Home\n\nwelcome"), (os.path.join("blog", "post.md"), "# Post\n\nwelcome back")):
+                with open(os.path.join(content, name), "w", encoding="utf-8") as f:
+                    f.write(text)
+            manifest = os.path.join(tmp, "manifest.json")
+            state = os.path.join(tmp, "search.json")
+            # Built once without the index: enabling it renders the pages again
+            build.build_site(content, public, manifest_path=manifest)
+            stats = build.build_site(content, public, manifest_path=manifest, search_state_path=state)
+            self.assertEqual(stats["built"], 2)
+            self.assertEqual(stats["search"]["pages"], 2)
+            self.assertGreater(stats["search"]["bytes"], 0)
+            with open(os.path.join(public, "search", "w.json"), encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)["welcome"]), 4)
+
+            os.remove(os.path.join(content, "index.md"))
+            stats = build.build_site(content, public, manifest_path=manifest, search_state_path=state, workers=2)
+            self.assertEqual(stats["search"]["pages"], 1)
+            with open(os.path.join(public, "search", "pages.json"), encoding="utf-8") as f:
+                pages = json.load(f)
+            self.assertEqual([page for page in pages if page], [["/blog/post.html", "Post"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
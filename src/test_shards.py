@@ -0,0 +1,100 @@
+import json
+import os
+import unittest
+
+import build
+import shards
+from tempdirtest import TempDirTestCase
+
+
+class TestShardOf(unittest.TestCase):
+    def test_stable_and_spread(self):
+        self.assertEqual(build.shard_of(os.path.join("blog", "post.md"), 4), build.shard_of("blog/post.md", 4))
+        counts = [0] * 4
+        for i in range(400):
+            shard = build.shard_of(f"page{i}.md", 4)
+            self.assertEqual(shard, build.shard_of(f"page{i}.md", 4))
+            counts[shard - 1] += 1
+        self.assertTrue(all(count > 60 for count in counts))
+
+    def test_parse_shard(self):
+        self.assertEqual(shards.parse_shard("2/3"), (2, 3))
+        for text in ("0/3", "4/3", "2", "a/b"):
+            with self.assertRaises(ValueError):
+                shards.parse_shard(text)
+
+
+class TestShardedBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.shard_dir = os.path.join(self.tmp.name, "shards")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "manifest.json")
+        for i in range(12):
+            self.write(os.path.join(self.content, f"s{i % 3}", f"p{i}.md"), f"# Page {i}\n\nword{i} shared")
+
+    def merge(self, **options):
+        return shards.merge_shards(self.shard_dir, self.public, self.manifest, **options)
+
+    def test_merge_matches_unsharded_build(self):
+        shards.build_all_shards(self.content, self.shard_dir, 3, search=True)
+        search_state = os.path.join(self.tmp.name, "search.json")
+        stats = self.merge(search_state_path=search_state)
+        self.assertEqual(stats["pages"], 12)
+        self.assertEqual(sum(shard["pages"] for shard in stats["shards"].values()), 12)
+        self.assertEqual(stats["search"]["pages"], 12)
+
+        reference = os.path.join(self.tmp.name, "reference")
+        build.build_site(self.content, reference, manifest_path=os.path.join(self.tmp.name, "ref.json"))
+        for i in range(12):
+            output = os.path.join(f"s{i % 3}", f"p{i}.html")
+            self.assertEqual(self.read(os.path.join(self.public, output)), self.read(os.path.join(reference, output)))
+        with open(os.path.join(self.public, "search", "s.json"), encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)["shared"]), 24)
+
+        # The merged manifest carries an unsharded build on incrementally
+        stats = build.build_site(self.content, self.public, manifest_path=self.manifest)
+        self.assertEqual(stats["built"], 0)
+
+    def test_removed_page_deleted_on_merge(self):
+        shards.build_all_shards(self.content, self.shard_dir, 2)
+        self.merge()
+        os.remove(os.path.join(self.content, "s0", "p0.md"))
+        shards.build_shard(self.content, self.shard_dir, build.shard_of(os.path.join("s0", "p0.md"), 2), 2)
+        self.assertEqual(self.merge()["deleted"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "s0", "p0.html")))
+
+    def test_local_shards_with_new_count(self):
+        shards.build_all_shards(self.content, self.shard_dir, 2)
+        self.merge()
+        shards.build_all_shards(self.content, self.shard_dir, 3)
+        self.assertEqual(set(shards.find_shards(self.shard_dir)), {(1, 3), (2, 3), (3, 3)})
+        self.assertEqual(self.merge()["pages"], 12)
+
+    def test_missing_shard(self):
+        shards.build_shard(self.content, self.shard_dir, 1, 2)
+        with self.assertRaisesRegex(ValueError, "Missing shard"):
+            self.merge()
+
+    def test_conflicting_files(self):
+        shards.build_all_shards(self.content, self.shard_dir, 2)
+        for index in (1, 2):
+            self.write(os.path.join(shards.shard_path(self.shard_dir, index, 2), "public", "extra.txt"), str(index))
+        with self.assertRaisesRegex(ValueError, "extra.txt: differs"):
+            self.merge()
+
+    def test_page_in_wrong_shard(self):
+        shards.build_all_shards(self.content, self.shard_dir, 2)
+        manifest_path = os.path.join(shards.shard_path(self.shard_dir, 1, 2), "manifest.json")
+        manifest = build.load_manifest(manifest_path)
+        other = build.load_manifest(os.path.join(shards.shard_path(self.shard_dir, 2, 2), "manifest.json"))
+        source, entry = next(iter(other["pages"].items()))
+        manifest["pages"][source] = entry
+        build.save_manifest(manifest, manifest_path)
+        with self.assertRaisesRegex(ValueError, "belongs to shard 2"):
+            self.merge()
+
+
+if __name__ == "__main__":
+    unittest.main()
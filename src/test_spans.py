@@ -0,0 +1,53 @@
+import unittest
+
+import spans
+import utils
+from blocknode import BlockType
+from synthetic import synthetic_markdown
+from textnode import TextType
+
+
+class TestBlockSpans(unittest.TestCase):
+    def test_matches_markdown_to_blocks(self):
+        md = "\n\n  # Heading  \n\n\n\npara one\npara two\n \n- a\n- b\n\n\n"
+        blocks = [md[start:end] for start, end in spans.block_spans(md)]
+        self.assertEqual(blocks, utils.markdown_to_blocks(md))
+
+    def test_block_types(self):
+        for block in ("# H", "```x```", "> a\n> b", "> a\nb", "- a\n- b", "1. a\n2. b", "1. a\n3. b", "text"):
+            md = "xx\n\n" + block
+            start, end = list(spans.block_spans(md))[1]
+            self.assertEqual(spans.span_block_type(md, start, end), utils.block_to_block_type(block), block)
+
+
+class TestParseSpans(unittest.TestCase):
+    def test_tokens_reference_source(self):
+        md = "# Title\n\nSome **bold** and [a link](/url)"
+        blocks = spans.parse_spans(md)
+        self.assertEqual([block.block_type for block in blocks], [BlockType.HEADING, BlockType.PARAGRAPH])
+        self.assertIs(blocks[1].buffer, md)
+        tokens = list(spans.unpack_tokens(blocks[1].items[0]))
+        self.assertEqual(
+            [(text_type, md[start:end]) for text_type, start, end, _, _ in tokens],
+            [(TextType.TEXT, "Some "), (TextType.BOLD, "bold"), (TextType.TEXT, " and "), (TextType.LINK, "a link")],
+        )
+        _, _, _, url_start, url_end = tokens[-1]
+        self.assertEqual(md[url_start:url_end], "/url")
+
+    def test_matches_node_tree_output(self):
+        md = "# A <title>\n\ntext\nwrapped & **bold**\n\n> quote _x_\n> more\n\n- [l](/a?b=1&c=2)\n- ![i](/i.png)\n\n1. one\n2. two\n\n```\ncode <b>\n```"
+        self.assertEqual(spans.markdown_to_html_spans(md), utils.markdown_to_html_node(md).to_html())
+
+    def test_url_across_line_break(self):
+        md = "see [a](/x\ny) and ![b](/i\nj.png)"
+        self.assertEqual(spans.markdown_to_html_spans(md), utils.markdown_to_html_node(md).to_html())
+        self.assertIn('href="/x y"', spans.markdown_to_html_spans(md))
+
+    def test_matches_node_tree_on_synthetic(self):
+        for seed in range(5):
+            md = synthetic_markdown(100, seed=seed, links=2, images=1, inline_density=0.3)
+            self.assertEqual(spans.markdown_to_html_spans(md), utils.markdown_to_html_node(md).to_html())
+
+
+if __name__ == "__main__":
+    unittest.main()
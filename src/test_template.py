@@ -0,0 +1,40 @@
+import io
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compiles_segments(self):
+        template = Template("<title>{{ Title }}</title><main>{{Content}}</main>")
+        self.assertEqual(template.segments, ["<title>", None, "</title><main>", None, "</main>"])
+        self.assertEqual(template.slots, [(1, "Title"), (3, "Content")])
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}<p>{{ Title }}</p>")
+        self.assertEqual(template.render({"Title": "Hi", "Content": "<p>x</p>"}), "<h1>Hi</h1><p>x</p><p>Hi</p>")
+
+    def test_values_are_not_rescanned(self):
+        template = Template("{{ Title }}|{{ Content }}")
+        self.assertEqual(template.render({"Title": "{{ Content }}", "Content": "c"}), "{{ Content }}|c")
+
+    def test_no_placeholders(self):
+        template = Template("static page")
+        self.assertEqual(template.segments, ["static page"])
+        self.assertEqual(template.render({}), "static page")
+
+    def test_write_streams_nodes(self):
+        template = Template("<body>{{ Content }}</body>")
+        content = ParentNode("div", [LeafNode("b", "bold")])
+        sink = io.StringIO()
+        template.write(sink, {"Content": content})
+        self.assertEqual(sink.getvalue(), "<body><div><b>bold</b></div></body>")
+
+    def test_missing_value(self):
+        template = Template("{{ Title }}")
+        self.assertRaises(KeyError, template.render, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 import utils
 
@@ -133,6 +134,27 @@ class TestTextToTextNodes(unittest.TestCase):
             node_list
         )
 
+    def test_unclosed_delimiters_stay_text(self):
+        node_list = utils.text_to_textnodes("a ** b _ c ` d [e](f")
+        self.assertListEqual([TextNode("a ** b _ c ` d [e](f", TextType.TEXT)], node_list)
+
+    def test_link_url_with_underscores(self):
+        node_list = utils.text_to_textnodes("see [my_page](https://a.dev/my_page_1) now")
+        self.assertListEqual(
+            [
+                TextNode("see ", TextType.TEXT),
+                TextNode("my_page", TextType.LINK, "https://a.dev/my_page_1"),
+                TextNode(" now", TextType.TEXT),
+            ],
+            node_list
+        )
+
+    def test_many_links(self):
+        text = " ".join(f"[l{i}](u{i})" for i in range(1000))
+        node_list = utils.text_to_textnodes(text)
+        self.assertEqual(len(node_list), 1999)
+        self.assertEqual(node_list[-1], TextNode("l999", TextType.LINK, "u999"))
+
 class TestMarkdownToBlocks(unittest.TestCase):
         def test_markdown_to_blocks(self):
             md = """
@@ -154,6 +176,30 @@ This is the same paragraph on a new line
                 ],
             )
 
+class TestIterMarkdownBlocks(unittest.TestCase):
+    def test_file_matches_markdown_to_blocks(self):
+        md = """
+This is **bolded** paragraph
+
+
+
+This is another paragraph with _italic_ text and `code` here
+This is the same paragraph on a new line
+  
+- This is a list
+- with items"""
+        blocks = list(utils.iter_markdown_blocks(io.StringIO(md)))
+        self.assertEqual(blocks, utils.markdown_to_blocks(md))
+
+    def test_lines_without_newlines(self):
+        lines = ["# Heading", "", "para line 1", "para line 2", "", ""]
+        blocks = list(utils.iter_markdown_blocks(lines))
+        self.assertEqual(blocks, ["# Heading", "para line 1\npara line 2"])
+
+    def test_is_lazy(self):
+        blocks = utils.iter_markdown_blocks(iter(["one\n", "\n", "two\n"]))
+        self.assertEqual(next(blocks), "one")
+
 class TestBlockToBlockType(unittest.TestCase):
     def test_heading_type(self):
         heading_1 = "# Heading"
@@ -250,3 +296,71 @@ the **same** even with inline stuff
             html,
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
+
+    def test_from_file_object(self):
+        md = "# Title\n\nSome **bold** text\n\n- one\n- two\n"
+        self.assertEqual(
+            utils.markdown_to_html_node(io.StringIO(md)).to_html(),
+            utils.markdown_to_html_node(md).to_html(),
+        )
+
+    def test_escapes_text(self):
+        md = "Use <b> & **bold <i>**\n\n```\nif (a < b) {}\n```"
+        self.assertEqual(
+            utils.markdown_to_html_node(md).to_html(),
+            "<div><p>Use &lt;b&gt; &amp; <b>bold &lt;i&gt;</b></p><pre><code>if (a &lt; b) {}\n</code></pre></div>",
+        )
+
+
+class TestMarkdownToHTML(unittest.TestCase):
+    def test_matches_tree(self):
+        from synthetic import synthetic_markdown
+        md = synthetic_markdown(300, inline_density=0.3, links=2, images=1)
+        md += "\n\n> quoted <b> & [x](/a?b=1&c=\"2\")\n> more\n\n1. one\n2. `two`\n\n```\n<code>\n```"
+        self.assertEqual(utils.markdown_to_html(md), utils.markdown_to_html_node(md).to_html())
+
+    def test_block_matches_tree(self):
+        for block in ("### Heading *not* _it_", "- a **b**\n- ![i](/i.png)", "```\nx < y\n```"):
+            self.assertEqual(utils.block_to_html(block), utils.block_to_html_node(block).to_html())
+
+    def test_from_file_object(self):
+        md = "# Title\n\nSome **bold** text\n\n- one\n- two\n"
+        self.assertEqual(utils.markdown_to_html(io.StringIO(md)), utils.markdown_to_html(md))
+
+    def test_image_alt_quote_escaped(self):
+        block = 'A ![cat "x" onerror="y"](/a.png)'
+        self.assertEqual(utils.block_to_html(block), utils.block_to_html_node(block).to_html())
+        self.assertIn('alt="cat &quot;x&quot; onerror=&quot;y&quot;"', utils.block_to_html(block))
+
+    def test_heading_ids(self):
+        self.assertEqual(utils.block_to_html("## Don't _Stop_-Now"), '<h2 id="dont-stop-now">Don\'t <i>Stop</i>-Now</h2>')
+        self.assertEqual(utils.block_to_html("# A & ![b](/b.png)"), '<h1 id="a">A &amp; <img src="/b.png" alt="b"></img></h1>')
+        self.assertEqual(utils.block_to_html("# !!"), "<h1>!!</h1>")
+        for block in ("## Don't _Stop_-Now", "# !!"):
+            self.assertEqual(utils.block_to_html_node(block).to_html(), utils.block_to_html(block))
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        utils.configure_block_cache(2)
+
+    def tearDown(self):
+        utils.configure_block_cache(utils.DEFAULT_BLOCK_CACHE_SIZE)
+
+    def test_cached_matches_uncached(self):
+        md = "# Title\n\nSome **bold** text\n\n- one\n- two\n\n```\ncode\n```"
+        self.assertEqual(
+            utils.markdown_to_html_node(md, cache_blocks=True).to_html(),
+            utils.markdown_to_html_node(md).to_html(),
+        )
+
+    def test_hits_and_eviction(self):
+        utils.markdown_to_html_node("one\n\ntwo\n\none", cache_blocks=True)
+        info = utils.block_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+
+        utils.markdown_to_html_node("three\n\ntwo", cache_blocks=True)
+        utils.markdown_to_html_node("one", cache_blocks=True)
+        info = utils.block_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 5, 2))
+
@@ -0,0 +1,148 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+
+import watch
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(self.content)
+        self.write("index.md", "# Home")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.content, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_poll_reports_changes(self):
+        watcher = watch.Watcher([self.content])
+        self.assertEqual(watcher.poll(), set())
+        added = self.write("new.md", "# New")
+        os.remove(os.path.join(self.content, "index.md"))
+        self.assertEqual(watcher.poll(), {added, os.path.join(self.content, "index.md")})
+
+    def test_changes_are_coalesced(self):
+        watcher = watch.Watcher([self.content], interval=0.01, debounce=0.05)
+
+        def burst():
+            for i in range(20):
+                self.write(f"p{i}.md", "x")
+                time.sleep(0.005)
+        thread = threading.Thread(target=burst)
+        thread.start()
+        changed = watcher.wait_for_changes()
+        thread.join()
+        self.assertEqual(len(changed), 20)
+
+    @unittest.skipIf(watch._load_inotify() is None, "inotify not available")
+    def test_inotify_reports_changes(self):
+        watcher = watch.make_watcher([self.content])
+        self.assertIsInstance(watcher, watch.InotifyWatcher)
+        try:
+            edited = self.write("index.md", "# Edited")
+            os.makedirs(os.path.join(self.content, "sub"))
+            nested = os.path.join(self.content, "sub", "page.md")
+            with open(nested, "w") as f:
+                f.write("x")
+            self.assertEqual(watcher.poll(), {edited, nested})
+
+            with open(nested, "a") as f:
+                f.write("y")
+            self.assertEqual(watcher.poll(), {nested})
+        finally:
+            watcher.close()
+
+    @unittest.skipIf(watch._load_inotify() is None, "inotify not available")
+    def test_inotify_overflow_asks_for_rescan(self):
+        watcher = watch.make_watcher([self.content])
+        try:
+            os.makedirs(os.path.join(self.content, "sub"))
+            read_events = watcher.read_events
+            # As if the queue overflowed: the kernel drops every event and
+            # reports that instead
+            watcher.read_events = lambda: [(-1, watch.IN_Q_OVERFLOW, "")] if read_events() else []
+            self.assertEqual(watcher.poll(), {watch.RESCAN})
+            self.assertIn(os.path.join(self.content, "sub"), watcher.watches.values())
+        finally:
+            watcher.close()
+
+    def test_changed_sources(self):
+        changed = {os.path.join(self.content, "a.md"), os.path.join(self.content, "b", "c.md")}
+        self.assertEqual(watch.changed_sources(changed, self.content), {"a.md", os.path.join("b", "c.md")})
+        self.assertIsNone(watch.changed_sources(changed | {"template.html"}, self.content))
+        static_file = os.path.join(self.tmp.name, "static", "styles.css")
+        self.assertEqual(watch.changed_sources({static_file}, self.content, os.path.join(self.tmp.name, "static")), set())
+
+    def test_rebuilds_on_change(self):
+        stop = threading.Event()
+        builds = []
+
+        def on_build(stats):
+            builds.append(stats)
+            stop.set()
+
+        thread = threading.Thread(target=watch.watch, args=(self.content, self.public), kwargs={
+            "port": 0, "interval": 0.01, "debounce": 0.02, "stop": stop, "on_build": on_build,
+            "manifest_path": os.path.join(self.tmp.name, "m.json"),
+        })
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            thread.start()
+            while not os.path.exists(os.path.join(self.public, "index.html")):
+                time.sleep(0.01)
+            self.write("other.md", "# Other")
+            thread.join(5)
+        self.assertIn("1 changed: built 1, deleted 0", out.getvalue())
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(builds, [{"built": 1, "skipped": 1, "deleted": 0}])
+
+    def test_checks_links_after_each_build(self):
+        stop = threading.Event()
+        builds = []
+
+        def on_build(stats):
+            builds.append(stats)
+            stop.set()
+
+        self.write("index.md", "# Home\n\n[other](other.html)")
+        thread = threading.Thread(target=watch.watch, args=(self.content, self.public), kwargs={
+            "port": 0, "interval": 0.01, "debounce": 0.02, "stop": stop, "on_build": on_build,
+            "manifest_path": os.path.join(self.tmp.name, "m.json"), "collect_links": True,
+        })
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            thread.start()
+            while not os.path.exists(os.path.join(self.public, "index.html")):
+                time.sleep(0.01)
+            self.write("other.md", "# Other\n\n[gone](/gone)")
+            thread.join(5)
+        self.assertIn("other.md:3: broken link /gone", out.getvalue())
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(builds[0]["link_check"]["broken"], [("other.md", 3, "/gone", "no such page or file")])
+
+    def test_serve(self):
+        os.makedirs(self.public)
+        with open(os.path.join(self.public, "index.html"), "w") as f:
+            f.write("<p>hi</p>")
+        server = watch.serve(self.public, 0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/index.html") as response:
+                self.assertEqual(response.read(), b"<p>hi</p>")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,55 @@
 import re
 import functools
+import posixpath
+from html import unescape
 
 from textnode import TextNode, TextType
-from htmlnode import LeafNode, ParentNode
+from htmlnode import LeafNode, ParentNode, RawNode, escape_text, escape_attribute
 from blocknode import BlockType
 
+# Width and height of the site's images by URL (see imagesize), written
+# into the <img> tags of images that have one
+_image_sizes = {}
+
+def set_image_sizes(sizes):
+    global _image_sizes
+    sizes = {} if sizes is None else sizes
+    if sizes != _image_sizes:
+        _image_sizes = sizes
+        # Blocks rendered with the old sizes can't be reused
+        _cached_render_block.cache_clear()
+
+def image_size(url):
+    return _image_sizes.get(url)
+
+_SCHEME = re.compile(r"[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+# The site URL an image src points at from a page in page_dir ("/" or
+# "/blog/"). Only relative srcs depend on the page; others are kept as is.
+def image_url(src, page_dir):
+    if src.startswith("/") or _SCHEME.match(src):
+        return src
+    return posixpath.normpath(page_dir + src)
+
+# Images whose src is relative to the page, written without a size since
+# the same block can be on pages in different directories
+_RELATIVE_IMG = re.compile(r'<img src="(?![a-zA-Z][a-zA-Z0-9+.-]*:|/)([^"]*)" alt="([^"]*)"></img>')
+
+# Gives the relative images in content HTML for a page in page_dir their
+# sizes. Run on each page's content after the block and render caches,
+# which are shared between pages.
+def size_relative_images(html, page_dir):
+    if not _image_sizes or "<img" not in html:
+        return html
+
+    def sized(match):
+        src, alt = match.groups()
+        size = _image_sizes.get(image_url(unescape(src), page_dir))
+        if size is None:
+            return match.group(0)
+        return f"<img src=\"{src}\" alt=\"{alt}\" width=\"{size[0]}\" height=\"{size[1]}\"></img>"
+    return _RELATIVE_IMG.sub(sized, html)
+
 def text_node_to_html_node(text_node):
     match text_node.text_type:
         case TextType.TEXT:
@@ -18,7 +63,11 @@ def text_node_to_html_node(text_node):
         case TextType.LINK:
             return LeafNode("a", text_node.text, {"href": text_node.url})
         case TextType.IMAGE:
-            return LeafNode("img", "", {"src":text_node.url, "alt":text_node.text})
+            props = {"src":text_node.url, "alt":text_node.text}
+            size = _image_sizes.get(text_node.url)
+            if size is not None:
+                props["width"], props["height"] = size
+            return LeafNode("img", "", props)
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_node_list = []
@@ -47,62 +96,145 @@ def split_nodes_image(old_nodes):
     new_node_list = []
     for node in old_nodes:
         if node.text_type == TextType.TEXT:
-            extracted_images = extract_markdown_images(node.text)
+            extracted_images = iter(extract_markdown_images(node.text))
             split_node = re.split(r"\!\[.*?\]\(.*?\)", node.text)
             for text in split_node:
-                if text == "":
-                    try:
-                        image = extracted_images.pop(0)
-                        new_node_list.append(TextNode(image[0], TextType.IMAGE, image[1]))
-                    except IndexError:
-                        pass
-
-                else:
+                if text != "":
                     new_node_list.append(TextNode(text, TextType.TEXT))
-                    try:
-                        image = extracted_images.pop(0)
-                        new_node_list.append(TextNode(image[0], TextType.IMAGE, image[1]))
-                    except IndexError:
-                        pass
+                image = next(extracted_images, None)
+                if image is not None:
+                    new_node_list.append(TextNode(image[0], TextType.IMAGE, image[1]))
         else:
             new_node_list.append(node)
     return new_node_list
 
 
-
 def split_nodes_link(old_nodes):
     new_node_list = []
     for node in old_nodes:
         if node.text_type == TextType.TEXT:
-            extracted_links = extract_markdown_links(node.text)
+            extracted_links = iter(extract_markdown_links(node.text))
             split_node = re.split(r"\[.*?\]\(.*?\)", node.text)
             for text in split_node:
-                if text == "":
-                    try:
-                        link = extracted_links.pop(0)
-                        new_node_list.append(TextNode(link[0], TextType.LINK, link[1]))
-                    except IndexError:
-                        pass
-
-                else:
+                if text != "":
                     new_node_list.append(TextNode(text, TextType.TEXT))
-                    try:
-                        link = extracted_links.pop(0)
-                        new_node_list.append(TextNode(link[0], TextType.LINK, link[1]))
-                    except IndexError:
-                        pass
+                link = next(extracted_links, None)
+                if link is not None:
+                    new_node_list.append(TextNode(link[0], TextType.LINK, link[1]))
         else:
             new_node_list.append(node)
     return new_node_list
 
+# Matches anything that could open an inline token. "![" has to be tried
+# before "[" so images aren't picked up as links.
+_INLINE_OPENER = re.compile(r"\*\*|!\[|[_`\[]")
+
+_DELIMITER_TYPES = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
+# Tokenizes text[start:end] in one left-to-right pass. Returns a list of
+# (text_type, start, end, url_start, url_end) tuples holding offsets into text;
+# the url offsets are None for everything but links and images. Unclosed
+# delimiters are kept as plain text.
+def scan_inline(text, start=0, end=None):
+    if end is None:
+        end = len(text)
+
+    tokens = []
+    # Next known position of each closing marker. Searches for a marker only
+    # ever move forward, so a cached hit (or miss) stays valid until the scan
+    # passes it, which keeps the whole scan linear.
+    next_closer = {}
+
+    def find_closer(marker, pos):
+        cached = next_closer.get(marker)
+        if cached is not None and (cached == -1 or cached >= pos):
+            return cached
+        found = text.find(marker, pos, end)
+        next_closer[marker] = found
+        return found
+
+    plain_start = start
+    pos = start
+    while True:
+        match = _INLINE_OPENER.search(text, pos, end)
+        if match is None:
+            break
+        opener = match.group()
+        content_start = match.end()
+
+        if opener == "[" or opener == "![":
+            label_end = find_closer("](", content_start)
+            url_end = -1 if label_end == -1 else find_closer(")", label_end + 2)
+            if url_end == -1:
+                pos = content_start
+                continue
+            if plain_start < match.start():
+                tokens.append((TextType.TEXT, plain_start, match.start(), None, None))
+            text_type = TextType.IMAGE if opener == "![" else TextType.LINK
+            tokens.append((text_type, content_start, label_end, label_end + 2, url_end))
+            pos = plain_start = url_end + 1
+        else:
+            closer = find_closer(opener, content_start)
+            if closer == -1:
+                pos = content_start
+                continue
+            if plain_start < match.start():
+                tokens.append((TextType.TEXT, plain_start, match.start(), None, None))
+            tokens.append((_DELIMITER_TYPES[opener], content_start, closer, None, None))
+            pos = plain_start = closer + len(opener)
+
+    if plain_start < end:
+        tokens.append((TextType.TEXT, plain_start, end, None, None))
+    return tokens
+
 def text_to_textnodes(text):
-    base_node = TextNode(text, TextType.TEXT)
-    bold_list = split_nodes_delimiter([base_node], "**", TextType.BOLD)
-    bold_italic_list = split_nodes_delimiter(bold_list, "_", TextType.ITALIC)
-    bold_italic_code_list = split_nodes_delimiter(bold_italic_list, "`", TextType.CODE)
-    bold_italic_code_image_list = split_nodes_image(bold_italic_code_list)
-    final_list = split_nodes_link(bold_italic_code_image_list)
-    return final_list
+    node_list = []
+    for text_type, start, end, url_start, url_end in scan_inline(text):
+        url = None if url_start is None else text[url_start:url_end]
+        node_list.append(TextNode(text[start:end], text_type, url))
+    return node_list
+
+_INLINE_TAGS = {
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+
+# The HTML text_node_to_html_node would give for each scan_inline token,
+# written straight from the offsets without making TextNodes or LeafNodes.
+# newline_to_space turns line breaks kept in the source, in text and URLs
+# alike, into the spaces the lines of a paragraph are joined with.
+def inline_tokens_html(buffer, tokens, newline_to_space=False):
+    chunks = []
+    for text_type, start, end, url_start, url_end in tokens:
+        text = buffer[start:end]
+        if newline_to_space:
+            text = text.replace("\n", " ")
+        if url_start is not None:
+            url = buffer[url_start:url_end]
+            if newline_to_space:
+                url = url.replace("\n", " ")
+        if text_type == TextType.IMAGE:
+            size = _image_sizes.get(url)
+            size_html = "" if size is None else f" width=\"{size[0]}\" height=\"{size[1]}\""
+            chunks.append(f"<img src=\"{escape_attribute(url)}\" alt=\"{escape_attribute(text)}\"{size_html}></img>")
+            continue
+        text = escape_text(text)
+        if text_type == TextType.TEXT:
+            chunks.append(text)
+        elif text_type == TextType.LINK:
+            chunks.append(f"<a href=\"{escape_attribute(url)}\">{text}</a>")
+        else:
+            tag = _INLINE_TAGS[text_type]
+            chunks.append(f"<{tag}>{text}</{tag}>")
+    return "".join(chunks)
+
+def text_to_html(text):
+    return inline_tokens_html(text, scan_inline(text))
 
 def markdown_to_blocks(markdown):
     block_split = markdown.split("\n\n")
@@ -110,6 +242,27 @@ def markdown_to_blocks(markdown):
     remove_empty_blocks = [x for x in strip_blocks if x != ""]
     return remove_empty_blocks
 
+# Streaming version of markdown_to_blocks. Takes a file object or any
+# iterable of lines and yields the same blocks one at a time, holding only
+# the lines of the current block. A blank line is exactly where the whole
+# text would contain "\n\n".
+def iter_markdown_blocks(lines):
+    block_lines = []
+    for line in lines:
+        if not line.endswith("\n"):
+            line += "\n"
+        if line == "\n":
+            block = "".join(block_lines).strip()
+            block_lines.clear()
+            if block != "":
+                yield block
+        else:
+            block_lines.append(line)
+
+    block = "".join(block_lines).strip()
+    if block != "":
+        yield block
+
 def block_to_block_type(block):
     lines = block.split("\n")
 
@@ -147,12 +300,14 @@ def find_heading_level(text):
             break
     return heading_level
 
-def text_to_children(block_text, block_type):
+# The inline text(s) of a block with the block markup removed: one string
+# per list item, a single string for everything else
+def block_to_inline_texts(block_text, block_type):
     process_text = []
 
     match block_type:
         case BlockType.PARAGRAPH:
-            process_text = [block_text]
+            process_text = [" ".join(block_text.split("\n"))]
 
         case BlockType.HEADING:
             heading_level = find_heading_level(block_text)
@@ -164,8 +319,8 @@ def text_to_children(block_text, block_type):
         case BlockType.QUOTE:
             split_block_text = block_text.split("\n")
 
-            # Remove "> " from the start of each line
-            process_text = [item[2:] for item in split_block_text if item != ""]
+            # Remove ">" from the start of each line and join them into one
+            process_text = [" ".join(item.lstrip(">").strip() for item in split_block_text if item != "")]
 
         case BlockType.UO_LIST:
             split_block_text = block_text.split("\n")
@@ -179,57 +334,137 @@ def text_to_children(block_text, block_type):
             # Remove "#. " from the start of each line
             process_text = [item[3:] for item in split_block_text if item != ""]
 
-    if len(process_text) > 1:
-        child_list = []
-        for text in process_text:
-            child_nodes = text_to_textnodes(text)
-            html_nodes = list(map(text_node_to_html_node, child_nodes))
-            child_list.append(html_nodes)
-        return child_list
-    else:
-        child_nodes = text_to_textnodes(process_text[0])
-        child_html_nodes = list(map(text_node_to_html_node, child_nodes))
-        return [child_html_nodes]
-
-
-
-def markdown_to_html_node(markdown):
-    text_blocks = markdown_to_blocks(markdown)
-    header_node = ParentNode("header", [])
-    body_node_children = [header_node]
-
-    
-    for block in text_blocks:
-        # Determine the type of block
-        block_type = block_to_block_type(block)
-
-        # Get a list of lists of child nodes
-        child_nodes = text_to_children(block, block_type)
-
-        if (block_type == BlockType.O_LIST) or (block_type == BlockType.UO_LIST):
-            list_items = []
-            for child_list in child_nodes:
-                new_li = ParentNode("li", child_list)
-                list_items.append(new_li)
-            list_parent = ParentNode(block_type, list_items)
-            div_wrap = ParentNode("div", [list_parent])
-            body_node_children.append(div_wrap)
-        elif block_type == BlockType.HEADING:
-            hdg_level = find_heading_level(block)
-            hdg_parent = ParentNode(f"h{hdg_level}", child_nodes[0])
-            div_wrap = ParentNode("div", [hdg_parent])
-            body_node_children.append(div_wrap)
-        elif block_type == BlockType.CODE:
-            code_node = ParentNode("code", child_nodes[0])
-            pre_wrap = ParentNode("pre", [code_node])
-            div_wrap = ParentNode("div", [pre_wrap])
-            body_node_children.append(div_wrap)
-        else:
-            new_node = ParentNode(block_type, child_nodes[0])
-            div_wrap = ParentNode("div", [new_node])
-            body_node_children.append(div_wrap)
+    return process_text
 
+def text_to_children(block_text, block_type):
+    child_list = []
+    for text in block_to_inline_texts(block_text, block_type):
+        child_nodes = text_to_textnodes(text)
+        html_nodes = list(map(text_node_to_html_node, child_nodes))
+        child_list.append(html_nodes)
+    return child_list
+
+
+
+BLOCK_TAGS = {
+    BlockType.PARAGRAPH: "p",
+    BlockType.QUOTE: "blockquote",
+    BlockType.UO_LIST: "ul",
+    BlockType.O_LIST: "ol",
+}
+
+_TAG = re.compile(r"<[^>]*>")
+_SLUG_DROP = re.compile(r"[^\w\- ]")
+
+# The id of a heading with this visible text: lowercased, punctuation
+# dropped and spaces turned into hyphens, the way GitHub and most markdown
+# renderers make heading ids. Blocks are rendered (and cached) one at a
+# time, so repeated headings on a page share an id rather than getting
+# GitHub's -1, -2 suffixes.
+def slugify(text):
+    return _SLUG_DROP.sub("", text.lower()).strip().replace(" ", "-")
+
+def heading_id(content_html):
+    return slugify(unescape(_TAG.sub("", content_html)))
+
+def block_to_html_node(block):
+    # Determine the type of block
+    block_type = block_to_block_type(block)
+
+    if block_type == BlockType.CODE:
+        # Code is kept verbatim, minus the fences and the newline after the opening one
+        code_node = LeafNode("code", block[3:-3].lstrip("\n"))
+        return ParentNode("pre", [code_node])
+
+    # Get a list of lists of child nodes
+    child_nodes = text_to_children(block, block_type)
+
+    if (block_type == BlockType.O_LIST) or (block_type == BlockType.UO_LIST):
+        list_items = []
+        for child_list in child_nodes:
+            new_li = ParentNode("li", child_list)
+            list_items.append(new_li)
+        return ParentNode(BLOCK_TAGS[block_type], list_items)
+    if block_type == BlockType.HEADING:
+        hdg_level = find_heading_level(block)
+        slug = heading_id("".join(node.to_html() for node in child_nodes[0]))
+        return ParentNode(f"h{hdg_level}", child_nodes[0], {"id": slug} if slug else None)
+    return ParentNode(BLOCK_TAGS[block_type], child_nodes[0])
+
+# The HTML of block_to_html_node(block), emitted directly. Builds only need
+# the string, so they skip making the subtree and walking it again.
+def block_to_html(block):
+    block_type = block_to_block_type(block)
+
+    if block_type == BlockType.CODE:
+        code = block[3:-3].lstrip("\n")
+        return f"<pre><code>{escape_text(code)}</code></pre>"
+
+    texts = block_to_inline_texts(block, block_type)
+
+    if (block_type == BlockType.O_LIST) or (block_type == BlockType.UO_LIST):
+        tag = BLOCK_TAGS[block_type]
+        items = "".join(f"<li>{text_to_html(text)}</li>" for text in texts)
+        return f"<{tag}>{items}</{tag}>"
+    content = text_to_html(texts[0])
+    if block_type == BlockType.HEADING:
+        tag = f"h{find_heading_level(block)}"
+        slug = heading_id(content)
+        if slug:
+            return f"<{tag} id=\"{slug}\">{content}</{tag}>"
+    else:
+        tag = BLOCK_TAGS[block_type]
+    return f"<{tag}>{content}</{tag}>"
+
+render_block = block_to_html
+
+# Rendered HTML of recently seen blocks, keyed by the block text. Pages tend
+# to share blocks (notices, lists, code samples) so a build keeps this
+# around across pages.
+DEFAULT_BLOCK_CACHE_SIZE = 4096
+_cached_render_block = functools.lru_cache(maxsize=DEFAULT_BLOCK_CACHE_SIZE)(render_block)
+
+def configure_block_cache(maxsize):
+    global _cached_render_block
+    _cached_render_block = functools.lru_cache(maxsize=maxsize)(render_block)
+
+def block_cache_info():
+    return _cached_render_block.cache_info()
+
+# Accepts the whole document as a string, or a file object / iterable of
+# lines which is split into blocks lazily. With cache_blocks each block
+# becomes a RawNode holding its cached HTML instead of a subtree.
+def markdown_to_html_node(markdown, cache_blocks=False):
+    if isinstance(markdown, str):
+        text_blocks = markdown_to_blocks(markdown)
+    else:
+        text_blocks = iter_markdown_blocks(markdown)
 
-    body_node = ParentNode("body", body_node_children)
-    html_node = ParentNode("html", [body_node])
-    return html_node
+    if cache_blocks:
+        block_nodes = [RawNode(_cached_render_block(block)) for block in text_blocks]
+    else:
+        block_nodes = [block_to_html_node(block) for block in text_blocks]
+    return ParentNode("div", block_nodes)
+
+# The HTML of markdown_to_html_node(...) for an iterable of blocks, produced
+# one block at a time without building the tree
+def iter_blocks_html(blocks, cache_blocks=False):
+    render = _cached_render_block if cache_blocks else render_block
+    yield "<div>"
+    for block in blocks:
+        yield render(block)
+    yield "</div>"
+
+# markdown_to_html_node(markdown).to_html() without the tree
+def markdown_to_html(markdown, cache_blocks=False):
+    if isinstance(markdown, str):
+        text_blocks = markdown_to_blocks(markdown)
+    else:
+        text_blocks = iter_markdown_blocks(markdown)
+    return "".join(iter_blocks_html(text_blocks, cache_blocks))
+
+def extract_title(markdown):
+    for line in markdown.split("\n"):
+        if line.startswith("# "):
+            return line[2:].strip()
+    return None
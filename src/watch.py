@@ -0,0 +1,286 @@
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from assets import sync_static
+from build import build_site, load_manifest, MANIFEST_PATH
+from linkcheck import check_links, report_lines
+
+
+# Maps every file under the given files/directories to (mtime_ns, size)
+def snapshot(paths):
+    files = {}
+    stack = [path for path in paths if path]
+    while stack:
+        path = stack.pop()
+        try:
+            if os.path.isdir(path):
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            st = entry.stat()
+                            files[entry.path] = (st.st_mtime_ns, st.st_size)
+            else:
+                st = os.stat(path)
+                files[path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+    return files
+
+def changed_paths(old, new):
+    changed = {path for path, stat in new.items() if old.get(path) != stat}
+    changed.update(path for path in old if path not in new)
+    return changed
+
+
+class Watcher():
+    def __init__(self, paths, interval=0.1, debounce=0.05):
+        self.paths = paths
+        self.interval = interval
+        self.debounce = debounce
+        self.files = snapshot(paths)
+
+    def poll(self):
+        files = snapshot(self.paths)
+        changed = changed_paths(self.files, files)
+        self.files = files
+        return changed
+
+    # Blocks until something changes, then keeps collecting until the tree
+    # has been quiet for `debounce` seconds, so a checkout that touches
+    # thousands of files comes back as one batch
+    def wait_for_changes(self, stop=None):
+        while stop is None or not stop.is_set():
+            changed = self.poll()
+            if changed:
+                while True:
+                    time.sleep(self.debounce)
+                    more = self.poll()
+                    if not more:
+                        return changed
+                    changed |= more
+            time.sleep(self.interval)
+        return set()
+
+    def close(self):
+        pass
+
+
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# In place of paths when the kernel's event queue overflowed and events
+# were lost, so what changed is unknown
+RESCAN = "<rescan>"
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+# Same interface as Watcher, but the kernel reports changes so nothing is
+# rescanned. Each directory gets its own watch; new directories are added
+# as they appear.
+class InotifyWatcher(Watcher):
+    def __init__(self, libc, paths, interval=0.1, debounce=0.05):
+        self.libc = libc
+        self.interval = interval
+        self.debounce = debounce
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # wd -> directory, and the wds whose whole directory is watched
+        self.watches = {}
+        self.trees = set()
+        self.roots = []
+        self.files = set()
+        for path in paths:
+            if path and os.path.isdir(path):
+                self.roots.append(path)
+                self.add_tree(path)
+            elif path and os.path.exists(path):
+                # Editors often replace a file rather than write it, so
+                # watch its directory and filter on the name
+                self.add_watch(os.path.dirname(path) or ".")
+                self.files.add(path)
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.watches[wd] = directory
+        return wd
+
+    def add_tree(self, root):
+        for dirpath, _, _ in os.walk(root):
+            self.trees.add(self.add_watch(dirpath))
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def poll(self):
+        changed = set()
+        while True:
+            events = self.read_events()
+            if not events:
+                return changed
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # Directories made since may have no watch yet
+                    for root in self.roots:
+                        self.add_tree(root)
+                    changed.add(RESCAN)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if wd not in self.trees:
+                    if path in self.files:
+                        changed.add(path)
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self.add_tree(path)
+                        # Files may have landed before the watch was added
+                        changed.update(snapshot([path]))
+                else:
+                    changed.add(path)
+
+    def wait_for_changes(self, stop=None):
+        while stop is None or not stop.is_set():
+            ready, _, _ = select.select([self.fd], [], [], self.interval)
+            if ready:
+                changed = self.poll()
+                if changed:
+                    while True:
+                        time.sleep(self.debounce)
+                        more = self.poll()
+                        if not more:
+                            return changed
+                        changed |= more
+        return set()
+
+    def close(self):
+        os.close(self.fd)
+
+# An inotify watcher where the platform has one, otherwise polling
+def make_watcher(paths, interval=0.1, debounce=0.05):
+    libc = _load_inotify()
+    if libc is not None:
+        try:
+            return InotifyWatcher(libc, paths, interval, debounce)
+        except OSError:
+            pass
+    return Watcher(paths, interval, debounce)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve(public_dir, port=8888):
+    handler = functools.partial(QuietHandler, directory=public_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+# Turns watched paths into the `changed` hint for build_site. Static files
+# don't affect pages; anything else outside content_dir (the template) can
+# affect every page, so those batches get a normal incremental build.
+def changed_sources(changed, content_dir, static_dir=None):
+    content_prefix = os.path.join(content_dir, "")
+    static_prefix = os.path.join(static_dir, "") if static_dir else None
+    sources = set()
+    for path in changed:
+        if path.startswith(content_prefix):
+            sources.add(path[len(content_prefix):])
+        elif static_prefix is None or not path.startswith(static_prefix):
+            return None
+    return sources
+
+def watch(content_dir, public_dir, template_path=None, static_dir=None, port=8888,
+          interval=0.1, debounce=0.05, stop=None, on_build=None, asset_options=None, **build_options):
+    watcher = make_watcher([content_dir, template_path, static_dir], interval, debounce)
+    static_prefix = os.path.join(static_dir, "") if static_dir else None
+
+    def rebuild(changed=None):
+        if changed is not None and RESCAN in changed:
+            changed = None
+        if static_dir and os.path.isdir(static_dir) and (
+            changed is None or any(path.startswith(static_prefix) for path in changed)
+        ):
+            sync_static(static_dir, public_dir, **(asset_options or {}))
+        sources = None if changed is None else changed_sources(changed, content_dir, static_dir)
+        stats = build_site(content_dir, public_dir, template_path, changed=sources, **build_options)
+        # With collect_links the whole site is checked after every build, as
+        # a one-off build would; a broken link is reported, not fatal
+        if build_options.get("collect_links"):
+            manifest_path = build_options.get("manifest_path", MANIFEST_PATH)
+            stats["link_check"] = check_links(public_dir, load_manifest(manifest_path)["pages"])
+            print("\n".join(report_lines(stats["link_check"], content_dir)))
+        return stats
+
+    rebuild()
+    server = serve(public_dir, port) if port else None
+    if server is not None:
+        print(f"Serving {public_dir} on http://127.0.0.1:{server.server_port}/")
+
+    try:
+        while stop is None or not stop.is_set():
+            changed = watcher.wait_for_changes(stop)
+            if not changed:
+                continue
+            start = time.perf_counter()
+            stats = rebuild(changed)
+            elapsed = time.perf_counter() - start
+            print(f"{len(changed)} changed: built {stats['built']}, deleted {stats['deleted']} "
+                  f"in {elapsed * 1000:.0f} ms")
+            if on_build is not None:
+                on_build(stats)
+    finally:
+        watcher.close()
+        if server is not None:
+            server.shutdown()
+            server.server_close()